@@ -1,38 +1,39 @@
 # --- main.py (Refactored Concept) ---
 
 # +++ ADDED IMPORTS +++
+# Heavy, optional-at-startup modules (RealtimeSTT pulls in torch and Whisper) are imported
+# where they are first used, so constructing Alfred stays fast; see load_stt.
 import pyaudio
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, BaseMessage, ToolMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, ToolMessage, RemoveMessage, message_chunk_to_message
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 from typing import TypedDict, Annotated, Sequence
-import operator
-import asyncio
-import websockets
-import json
-import base64
-import pyaudio
-from RealtimeSTT import AudioToTextRecorder
-import torch  # Import the torch library
-import pickle
-import re
 import asyncio
+import time
+import uuid
 import os
-import python_weather
-import googlemaps # Added for travel duration
-from datetime import datetime # Added for travel duration
 from dotenv import load_dotenv # Added for API key loading
-from googleapiclient.errors import HttpError
-from langgraph.graph import StateGraph, END
 from datetime import date
+from text_segmenter import SentenceSegmenter
+from tts_session import ElevenLabsSession
+from conversation_memory import ConversationMemory
+from checkpointer import SqliteCheckpointer
+from tool_cache import ToolCache
+from speculative_tools import SPECULATIVE_TOOLS, SpeculativeToolRunner
+from intent_router import IntentRouter
+from wake_word import WAKE_WORD_ENGINE, WakeWordDetector, WakeWordGate
+from endpointing import ENDPOINTING, EarlyEndpointer
+from audio_output import OUTPUT_SINK, AudioOutput, AudioQueue
+from tracing import Tracer, current_turn
 
 # (Your other imports like asyncio, websockets, pyaudio remain)
 
 # (Your langchain_tools.py would contain the @tool decorated functions)
 from langchain_tools import (
     get_current_location, get_weather,
-    get_travel_duration, list_unread_messages, send_email,
+    get_travel_duration, get_travel_matrix, list_unread_messages, send_email,
     brave_search, navigate_to_url, extract_page_text, list_calendar_events, create_calendar_event, startup_browser, shutdown_browser
 )
 
@@ -40,20 +41,47 @@ load_dotenv()
 
 VOICE_ID = 'nct9BC7xtGbUtQlT3ptu'
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+TTS_URI = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000"
 
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
 # SEND_SAMPLE_RATE = 16000 # Keep if used by RealtimeSTT or other input processing
-RECEIVE_SAMPLE_RATE = 24000 # For ElevenLabs output
-CHUNK_SIZE = 1024
+# Playback format (24 kHz 16-bit mono, ElevenLabs pcm_24000) and buffering live in audio_output.py
+# Bounds for the text segments streamed to ElevenLabs while the LLM is still generating
+TTS_MIN_FLUSH_CHARS = 12
+TTS_MAX_FLUSH_CHARS = 220
+# Approximate token budget for the conversation history kept in the graph state
+HISTORY_TOKEN_BUDGET = 6000
+# Where the graph's checkpoints live: "sqlite" (durable, on disk) or "memory" (in-process MemorySaver)
+CHECKPOINTER_BACKEND = os.getenv("ALFRED_CHECKPOINTER", "sqlite")
+CHECKPOINT_DB_PATH = os.getenv("ALFRED_CHECKPOINT_DB", "alfred_checkpoints.db")
+# Start read-only tools while the model is still streaming their arguments ("0" turns it off)
+SPECULATIVE_TOOLS_ENABLED = os.getenv("ALFRED_SPECULATIVE_TOOLS", "1") != "0"
+# Answer simple requests (weather, location, calendar...) from local patterns and templates, without the LLM
+FAST_PATH_ENABLED = os.getenv("ALFRED_FAST_PATH", "1") != "0"
+# Barge-in: how long an interrupted turn may take to unwind before the new one starts anyway (seconds)
+BARGE_IN_TIMEOUT = 0.5
 today = date.today().strftime("%Y-%m-%d")
 
 # +++ NEW: DEFINE AGENT STATE FOR LANGGRAPH +++
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    # add_messages (rather than operator.add) lets the memory node remove and replace messages by id
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+    summary: str
+
+def build_llm():
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0.6, stream_usage=True) # Using a capable model
+
+def build_checkpointer():
+    """Returns the checkpointer selected by CHECKPOINTER_BACKEND."""
+    if CHECKPOINTER_BACKEND == "memory":
+        return MemorySaver()
+    print(f"Using SQLite checkpointer at '{CHECKPOINT_DB_PATH}'.")
+    return SqliteCheckpointer(CHECKPOINT_DB_PATH)
 
 class Alfred:
-    def __init__(self):
+    def __init__(self, llm=None, tools=None, tts_uri=TTS_URI, audio_sink=OUTPUT_SINK, thread_id="main_thread",
+                 checkpointer=None, tool_cache=None, turn_slots=None):
+        # The defaults are the real services; replay_benchmark.py passes fakes to run Alfred headless,
+        # and server.py passes the pieces its sessions share (model client, checkpointer, tool cache, turn slots).
         print("initializing...")
         self.system_prompt = f"""
 Your name is Alfred. You are my personal butler, confidant, and assistant, modeled after Alfred Pennyworth from Batman.
@@ -76,48 +104,169 @@ Whenever you need to reference the date, know that it is {today}.
 """
 
     # --- LLM and Tool Setup ---
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.6) # Using a capable model
+        self.llm = llm or build_llm()
+        self.memory = ConversationMemory(self.llm, token_budget=HISTORY_TOKEN_BUDGET)
     
     # Define the complete list of tools available to the agent
-        tools_list = [
+        tools_list = tools or [
         get_current_location, get_weather,
-        get_travel_duration, list_unread_messages, send_email,
+        get_travel_duration, get_travel_matrix, list_unread_messages, send_email,
         brave_search, navigate_to_url, extract_page_text, list_calendar_events, create_calendar_event # <-- ADD NEW TOOLS
     ]
     
     # Create a dictionary mapping tool names to their functions for easy lookup
         self.tool_map = {tool.name: tool for tool in tools_list}
+        # Idempotent lookups (weather, search, travel times...) are served from a short-lived cache
+        self.tool_cache = tool_cache or ToolCache()
+        self.speculation = SpeculativeToolRunner(self.tool_map, self.tool_cache.ainvoke)
+        self.router = IntentRouter(self.tool_map, self.tool_cache.ainvoke)
         self.llm_with_tools = self.llm.bind_tools(tools_list)
 
     # --- Build LangGraph ---
-        self.graph = self._build_graph()
+        self.graph = self._build_graph(checkpointer)
 
     # --- Initialize Queues ---
+    # Items are (turn id, payload); anything from a turn other than the current one is dropped
         self.input_queue = asyncio.Queue()
         self.response_queue = asyncio.Queue()
-        self.audio_queue = asyncio.Queue()
-
-    # --- Initialize Audio I/O ---
-        self.pya = pyaudio.PyAudio()
+        # Bounded by bytes: when playback falls behind, the TTS listener stops reading the socket
+        self.audio_queue = AudioQueue()
+        self.graph_config = {"configurable": {"thread_id": thread_id}}
+        self.turn_id = 0
+        # Per-turn latency spans; a turn is complete once its first sample reaches the speaker
+        self.tracer = Tracer(complete_on="first_sample_played")
+        self._turn_task = None
+        self._wake_interrupt = None
+        # Optional semaphore bounding how many turns run the graph at once (shared across server sessions)
+        self.turn_slots = turn_slots
+        # Called with (turn id, status, reply text) when a turn's graph run ends
+        self.on_turn_end = None
+        # Early endpointing: a turn started on a partial transcript stays silent (and runs only read-only
+        # tools) until the final transcript confirms it
+        self.endpointer = EarlyEndpointer() if ENDPOINTING == "adaptive" else None
+        self._turn_confirmed = asyncio.Event()
+        self._turn_confirmed.set()
+        self._speculative = None  # (turn id, partial transcript) of a turn started early and not yet confirmed
+        self._forget = None  # turn id of a false start whose messages the next turn removes from the thread
+        # User messages get ids unique to this instance and turn, so a false start can be found and removed
+        self._message_prefix = f"human-{uuid.uuid4().hex[:12]}"
+        self._endpoint_timer = None
+        self._loop = None
+
+    # --- Audio I/O and TTS ---
+    # Created by the warm-up methods below, which main.py runs concurrently at start-up;
+    # each task that needs one also awaits it, so nothing depends on start-up order.
+        self.pya = None
+        self.audio_output = None
+        self.recorder = None
+        self.wake_gate = None
+        self.tts_session = None
+        self.tts_uri = tts_uri
+        self.audio_sink = audio_sink
+        self._warmups = {}
+
+    # --- Warm-up ---
+    def _warm(self, name, factory):
+        """Runs a warm-up step once; every caller awaits the same attempt (a failed one is retried)."""
+        task = self._warmups.get(name)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.ensure_future(factory())
+            self._warmups[name] = task
+        return asyncio.shield(task)
+
+    async def load_stt(self):
+        """Loads the speech-to-text model (the slowest start-up step) in a worker thread."""
+        self._loop = asyncio.get_running_loop()  # recorder callbacks come back to it from RealtimeSTT's threads
+        await self._warm("stt", lambda: asyncio.to_thread(self._create_recorder))
+
+    def _create_recorder(self):
+        # Imported here: RealtimeSTT pulls in torch and faster-whisper, which take seconds to import
+        from RealtimeSTT import AudioToTextRecorder
+        detector = None
+        if WAKE_WORD_ENGINE == "openwakeword":
+            try:
+                detector = WakeWordDetector()
+            except Exception as e:
+                print(f"Wake-word model could not be loaded ({e}); falling back to transcript matching.")
+        early = {}
+        if self.endpointer is not None:
+            # Realtime partials and silence start/stop drive the early start; the end-of-turn silence adapts
+            early = dict(
+                enable_realtime_transcription=True,
+                realtime_model_type="tiny.en",
+                realtime_processing_pause=0.1,
+                post_speech_silence_duration=self.endpointer.pace.end_of_turn_silence(),
+                on_recording_start=lambda: self._from_recorder(self._on_speech_start),
+                on_realtime_transcription_update=lambda text: self._from_recorder(self._on_partial, text),
+                on_turn_detection_start=lambda: self._from_recorder(self._on_pause),
+                on_turn_detection_stop=lambda: self._from_recorder(self._on_resume),
+            )
+        # With a detector, the gate owns the microphone and only feeds Whisper the audio after a wake word
         self.recorder = AudioToTextRecorder(
-    model="base.en",
-    language="en",
-    spinner=False,
-    # These parameters WILL be recognized after the library upgrade
-    #wake_word_engine="openwakeword",
-    #wake_words="alfred"
-)
+            model="base.en",
+            language="en",
+            spinner=False,
+            use_microphone=detector is None,
+            **early,
+        )
+        if detector is not None:
+            self.wake_gate = WakeWordGate(detector, self.recorder)
+            self.wake_gate.start()
+
+    async def open_audio_output(self):
+        """Initializes PyAudio and opens the playback stream."""
+        await self._warm("audio_output", self._open_audio_output)
+
+    async def _open_audio_output(self):
+        output = AudioOutput()
+        if self.audio_sink in ("memory", "null"):
+            output.open_memory(keep=self.audio_sink == "memory")
+        else:
+            if self.pya is None:
+                self.pya = await asyncio.to_thread(pyaudio.PyAudio)
+            await asyncio.to_thread(output.open, self.pya)
+        # The audio thread hands the moment a turn becomes audible back to the event loop
+        loop = asyncio.get_running_loop()
+        output.on_first_audio = lambda turn_id, at: loop.call_soon_threadsafe(
+            self.tracer.event, "first_sample_played", turn_id, at
+        )
+        self.audio_output = output
+
+    async def connect_tts(self):
+        """Opens the ElevenLabs session so the first reply does not pay for the handshake."""
+        await self._warm("tts", self._connect_tts)
+
+    async def _connect_tts(self):
+        session = ElevenLabsSession(
+            self.tts_uri,
+            ELEVENLABS_API_KEY,
+            self.audio_queue,
+            voice_settings={"stability": 0.4, "similarity_boost": 0.8, "speed": 1.1},
+        )
+        print("Starting ElevenLabs session...")
+        await session.start()
+        self.tts_session = session
 
     # +++ NEW: METHOD TO BUILD THE GRAPH +++
-    def _build_graph(self):
+    def _build_graph(self, checkpointer=None):
         workflow = StateGraph(AgentState)
 
         # Define nodes
+        workflow.add_node("router", self._route)
+        workflow.add_node("memory", self.memory.manage)
         workflow.add_node("agent", self._call_model)
         workflow.add_node("action", self._call_tool)
 
         # Define edges
-        workflow.set_entry_point("agent")
+        # Simple requests are answered by the router; everything else passes through the memory node,
+        # which keeps the history within budget, on its way to the agent
+        workflow.set_entry_point("router")
+        workflow.add_conditional_edges(
+            "router",
+            self._after_route,
+            {"answered": END, "agent": "memory"}
+        )
+        workflow.add_edge("memory", "agent")
         workflow.add_conditional_edges(
             "agent",
             self._should_continue,
@@ -126,9 +275,23 @@ Whenever you need to reference the date, know that it is {today}.
         workflow.add_edge("action", "agent")
         
         # Compile the graph
-        return workflow.compile(checkpointer=MemorySaver())
+        return workflow.compile(checkpointer=checkpointer or build_checkpointer())
 
     # +++ NEW: LANGGRAPH NODE METHODS +++
+    async def _route(self, state):
+        """Fast path: answers a plain single-tool request directly, or leaves the state untouched for the agent."""
+        if not FAST_PATH_ENABLED:
+            return {}
+        with self.tracer.span("router") as span:
+            reply = await self.router.handle(state["messages"][-1].content)
+            span.set(answered=reply is not None)
+        if reply is None:
+            return {}
+        return {"messages": [AIMessage(content=reply)]}
+
+    def _after_route(self, state):
+        return "answered" if isinstance(state["messages"][-1], AIMessage) else "agent"
+
     def _should_continue(self, state):
         last_message = state["messages"][-1]
         if not last_message.tool_calls:
@@ -139,10 +302,34 @@ Whenever you need to reference the date, know that it is {today}.
 
     async def _call_model(self, state):
         """
-        Calls the LLM. Includes diagnostic printing to debug the message history.
+        Calls the LLM with the system prompt, running summary and trimmed history.
+        Prints the prompt size so long sessions can be checked for constant-cost turns.
         """
-    # The original function call remains the same
-        response = await self.llm_with_tools.ainvoke(state["messages"])
+        prompt = self.memory.build_prompt(self.system_prompt, state)
+        with self.tracer.span("model", messages=len(prompt)) as span:
+            started = time.perf_counter()
+            if SPECULATIVE_TOOLS_ENABLED:
+                # Stream so safe tool calls can start as soon as their arguments are complete
+                self.speculation.start_turn()
+                streamed = None
+                async for chunk in self.llm_with_tools.astream(prompt):
+                    if streamed is None:
+                        self.tracer.event("first_token")
+                        span.set(first_token_ms=(time.perf_counter() - started) * 1000)
+                    streamed = chunk if streamed is None else streamed + chunk
+                    if chunk.tool_call_chunks:
+                        self.speculation.observe(streamed)
+                self.speculation.model_finished()
+                response = message_chunk_to_message(streamed)
+            else:
+                response = await self.llm_with_tools.ainvoke(prompt)
+                self.tracer.event("first_token")
+            span.set(tool_calls=len(response.tool_calls))
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            print(f"\nPrompt size: {usage['input_tokens']} tokens ({len(prompt)} messages).")
+        else:
+            print(f"\nPrompt size: ~{self.memory.last_prompt_tokens} tokens ({len(prompt)} messages).")
         return {"messages": [response]}
 
     async def _call_tool(self, state: AgentState):
@@ -165,12 +352,22 @@ Whenever you need to reference the date, know that it is {today}.
                 )
         
             print(f"Agent is calling tool '{tool_name}' with args: {tool_args}")
+            if tool_name not in SPECULATIVE_TOOLS and not self._turn_confirmed.is_set():
+                # Started on a partial transcript: nothing gets sent or created until the final one agrees
+                await self._turn_confirmed.wait()
         
-            try:
-            # Use ainvoke for both async and sync tools
-                response = await tool_function.ainvoke(tool_args)
-            except Exception as e:
-                response = f"Error executing tool '{tool_name}': {e}"
+            with self.tracer.span(f"tool:{tool_name}") as span:
+                try:
+                    # A matching speculative call may already be running (or done); otherwise start it now
+                    speculative = self.speculation.claim(tool_call)
+                    span.set(speculative=speculative is not None)
+                    if speculative is not None:
+                        response = await speculative
+                    else:
+                        # Use ainvoke for both async and sync tools
+                        response = await self.tool_cache.ainvoke(tool_function, tool_args)
+                except Exception as e:
+                    response = f"Error executing tool '{tool_name}': {e}"
 
             return ToolMessage(
                 content=str(response),
@@ -181,7 +378,10 @@ Whenever you need to reference the date, know that it is {today}.
         tasks = [run_one_tool(tc) for tc in last_message.tool_calls]
     
     # Run all tool call tasks concurrently and gather their results
-        tool_messages = await asyncio.gather(*tasks)
+        tools_started = time.perf_counter()
+        with self.tracer.span("action", tools=len(tasks)):
+            tool_messages = await asyncio.gather(*tasks)
+        self.speculation.finish_turn(tools_started, time.perf_counter())
 
         return {"messages": tool_messages}
 
@@ -189,183 +389,253 @@ Whenever you need to reference the date, know that it is {today}.
     # alfred.py
 
     async def send_prompt(self):
-        """Manages the LangGraph conversation, handling text and tool calls."""
+        """Manages the LangGraph conversation: runs each turn as its own task so barge-in can cancel it."""
         print("Starting LangGraph session manager...")
-        config = {"configurable": {"thread_id": "main_thread"}}
 
         while True:
-            message_text = await self.input_queue.get()
-            if message_text.lower() == "exit":
-                break
-        
-            print(f"Sending FINAL text input to LangGraph: {message_text}")
-        
-            inputs = {
-                "messages": [
-                    SystemMessage(content=self.system_prompt),
-                    HumanMessage(content=message_text)
-                ]
-            }
-
-        # --- MODIFIED LOGIC ---
-        # 1. Accumulate the full response here
-            full_response = ""
-        
-        # 2. Stream events to print to console in real-time
-            async for event in self.graph.astream_events(inputs, config=config, version="v1"):
+            turn_id, message_text = await self.input_queue.get()
+            try:
+                if message_text.lower() == "exit":
+                    break
+                if turn_id != self.turn_id:
+                    continue  # superseded before it started
+
+                task = asyncio.create_task(self._run_admitted(turn_id, message_text))
+                self._turn_task = task
+                try:
+                    await asyncio.wait([task])
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                reply = ""
+                if task.cancelled():
+                    print(f"\nTurn {turn_id} was interrupted.")
+                    status = "interrupted"
+                    await self._close_interrupted_turn()
+                elif task.exception() is not None:
+                    print(f"\nError while running the agent: {task.exception()}")
+                    status = "error"
+                else:
+                    status, reply = "ok", task.result()
+                self.tracer.finish_turn(turn_id, status)
+                if self.on_turn_end is not None:
+                    self.on_turn_end(turn_id, status, reply)
+            finally:
+                self.input_queue.task_done()
+
+    async def _run_admitted(self, turn_id, message_text):
+        """Runs the turn once one of the shared turn slots is free (when turns are limited)."""
+        if self.turn_slots is None:
+            return await self._run_turn(turn_id, message_text)
+        async with self.turn_slots:
+            return await self._run_turn(turn_id, message_text)
+
+    async def _run_turn(self, turn_id, message_text):
+        """
+        Streams one turn through the graph, pushing each finished sentence to TTS as soon as it appears.
+        If a model run that already spoke turns out to be a tool request, that preamble is retracted.
+        """
+        print(f"Sending FINAL text input to LangGraph: {message_text}")
+        # Spans recorded by the graph's nodes (and tasks they start) belong to this turn
+        current_turn.set(turn_id)
+        if self._forget is not None:
+            false_start, self._forget = self._forget, None
+            await self._forget_false_start(false_start)
+        self.tracer.event("graph_start")
+
+        # The system prompt is added by _call_model, so only the new utterance is stored
+        inputs = {"messages": [HumanMessage(content=message_text, id=f"{self._message_prefix}-{turn_id}")]}
+
+        # Accumulate the full response here (for logging) while segments go straight to TTS
+        full_response = ""
+        segmenter = SentenceSegmenter(min_chars=TTS_MIN_FLUSH_CHARS, max_chars=TTS_MAX_FLUSH_CHARS)
+        speaking = True
+        spoken = False  # the current model run has sent text to TTS
+        run_text = ""
+
+        # v2 events: unlike v1, cancelling the consumer also cancels the graph run, its model stream and tools
+        with self.tracer.span("graph"):
+            async for event in self.graph.astream_events(inputs, config=self.graph_config, version="v2"):
                 kind = event["event"]
-                if kind == "on_chat_model_stream":
+                node = event.get("metadata", {}).get("langgraph_node")
+                if kind == "on_chain_end" and node == "router" and event["name"] == "router":
+                    # A fast-path reply arrives whole, from a template rather than a model stream
+                    for message in (event["data"].get("output") or {}).get("messages", []):
+                        print(message.content, end="", flush=True)
+                        full_response += message.content
+                        for segment in segmenter.push(message.content):
+                            await self.response_queue.put((turn_id, segment))
+                        for segment in segmenter.flush():
+                            await self.response_queue.put((turn_id, segment))
+                    continue
+                # Only the "agent" node produces text meant for the user
+                if node != "agent":
+                    continue
+
+                if kind == "on_chat_model_start":
+                    segmenter.reset()
+                    speaking = True
+                    spoken = False
+                    run_text = ""
+                elif kind == "on_chat_model_stream":
                     chunk = event["data"]["chunk"]
-                    if chunk.content:
-                    # Print to console as it comes in
+                    if chunk.tool_call_chunks and speaking:
+                        # This model run is a tool request; anything it said is a preamble, not the answer.
+                        # OpenAI streams tool calls before any text, so normally nothing was sent yet.
+                        speaking = False
+                        segmenter.reset()
+                        run_text = ""
+                        if spoken:
+                            await self._retract_preamble()
+                    if chunk.content and speaking:
+                        # Print to console as it comes in
                         print(chunk.content, end="", flush=True)
-                    # Add the chunk to our full response
-                        full_response += chunk.content
-        
-            print("\nEnd of LangGraph response stream for this turn.")
-
-        # 3. After the stream is done, queue the complete response for TTS
-            if full_response:
-                await self.response_queue.put(full_response)
-            else:
-                print("[WARNING] The agent generated an empty response.")
-
-        # 4. Finally, send the "end of sentence" signal
-            await self.response_queue.put(None)
-            self.input_queue.task_done()
+                        run_text += chunk.content
+                        for segment in segmenter.push(chunk.content):
+                            await self.response_queue.put((turn_id, segment))
+                            spoken = True
+                elif kind == "on_chat_model_end":
+                    output = event["data"].get("output")
+                    if speaking and getattr(output, "tool_calls", None):
+                        # Tool calls that never streamed as chunks (a non-streaming model call)
+                        if spoken:
+                            await self._retract_preamble()
+                    elif speaking:
+                        full_response += run_text
+                        for segment in segmenter.flush():
+                            await self.response_queue.put((turn_id, segment))
+                    segmenter.reset()
+                    run_text = ""
+
+        print("\nEnd of LangGraph response stream for this turn.")
+
+        if not full_response:
+            print("[WARNING] The agent generated an empty response.")
+
+        # Finally, send the "end of turn" signal
+        await self.response_queue.put((turn_id, None))
+        return full_response
+
+    async def _close_interrupted_turn(self):
+        """
+        A turn cancelled between the model's tool request and the tool results leaves unanswered
+        tool calls in the checkpoint, which the OpenAI API rejects; record them as cancelled.
+        """
+        snapshot = await self.graph.aget_state(self.graph_config)
+        messages = snapshot.values.get("messages", [])
+        if messages and isinstance(messages[-1], AIMessage) and messages[-1].tool_calls:
+            cancelled = [
+                ToolMessage(content="Cancelled: the user interrupted before this tool finished.", tool_call_id=call["id"])
+                for call in messages[-1].tool_calls
+            ]
+            await self.graph.aupdate_state(self.graph_config, {"messages": cancelled}, as_node="action")
+
+    async def _forget_false_start(self, turn_id):
+        """Removes a false start (its partial-transcript message and everything after it) from the thread."""
+        snapshot = await self.graph.aget_state(self.graph_config)
+        messages = snapshot.values.get("messages", [])
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].id == f"{self._message_prefix}-{turn_id}":
+                removed = [RemoveMessage(id=message.id) for message in messages[index:]]
+                await self.graph.aupdate_state(self.graph_config, {"messages": removed}, as_node="memory")
+                return
+
+    async def _retract_preamble(self):
+        """
+        Stops speaking text from a model run that turned into a tool request. Unlike a barge-in the
+        turn goes on: only its queued text and audio are dropped and ElevenLabs generation is aborted.
+        """
+        print("\n[Preamble before a tool call; not speaking it.]")
+        for q in (self.response_queue, self.audio_queue):
+            while not q.empty():
+                q.get_nowait()
+                q.task_done()
+        if self.tts_session is not None:
+            self.tts_session.abort_turn()
+        if self.audio_output is not None:
+            self.audio_output.clear()
+
+    # --- Barge-in ---
+    async def interrupt(self):
+        """
+        Starts a new turn and tears down the old one: cancels its graph run (model stream and tool
+        calls included), aborts ElevenLabs generation, silences playback and drops queued items.
+        Returns the new turn id.
+        """
+        started = time.perf_counter()
+        self.turn_id += 1
+        self.speculation.discard()
+        if self.audio_output is not None:
+            if self.tts_session is not None and self.audio_output.turn_played_ms():
+                heard = self.tts_session.heard_text(self.turn_id - 1, self.audio_output.turn_played_ms())
+                print(f"Interrupted after: {heard!r}")
+            # Only the block already handed to the device still plays
+            self.audio_output.clear()
+        if self.tts_session is not None:
+            self.tts_session.abort_turn()
+        await self.clear_queues()
+        task = self._turn_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.wait([task], timeout=BARGE_IN_TIMEOUT)
+            print(f"Barge-in: cancelled the running turn in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        # Whatever was speculative is gone; the next turn says for itself whether it is
+        self._speculative = None
+        self._turn_confirmed.set()
+        return self.turn_id
 
     async def tts(self):
-        """ Send text to ElevenLabs API and stream the returned audio. (Kept Original Logic) """
-        uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream-input?model_id=eleven_flash_v2_5&output_format=pcm_24000"
-        while True: # Outer loop to handle reconnections
-            print("Attempting to connect to ElevenLabs WebSocket...")
-            try:
-                async with websockets.connect(uri) as websocket:
-                    print("ElevenLabs WebSocket Connected.")
-                    try:
-                        # Send initial configuration
-                        await websocket.send(json.dumps({
-                            "text": " ",
-                            "voice_settings": {"stability": 0.4, "similarity_boost": 0.8, "speed": 1.1},
-                            "xi_api_key": ELEVENLABS_API_KEY,
-                        }))
-
-                        async def listen():
-                            """Listen to the websocket for audio data and queue it."""
-                            while True:
-                                try:
-                                    message = await websocket.recv()
-                                    data = json.loads(message)
-                                    if data.get("audio"):
-                                        #print("[DEBUG] TTS received audio data from ElevenLabs.")
-                                        # Put raw audio bytes onto the queue
-                                        await self.audio_queue.put(base64.b64decode(data["audio"]))
-                                    elif data.get("isFinal"):
-                                        # Optional: Handle end-of-stream signal from ElevenLabs if needed
-                                        #print("[DEBUG] TTS stream is final.")
-                                        pass
-                                    # Removed `elif text is None:` check as it was incorrect scope
-                                except websockets.exceptions.ConnectionClosedOK:
-                                    print("ElevenLabs connection closed normally by server.")
-                                    break # Exit listener loop
-                                except websockets.exceptions.ConnectionClosedError as e:
-                                     print(f"ElevenLabs connection closed with error: {e}")
-                                     break # Exit listener loop
-                                except json.JSONDecodeError as e:
-                                    print(f"JSON Decode Error in ElevenLabs listener: {e}")
-                                    # Decide whether to break or continue
-                                except asyncio.CancelledError:
-                                     print("ElevenLabs listener task cancelled.")
-                                     raise # Re-raise cancellation
-                                except Exception as e:
-                                    print(f"Error in ElevenLabs listener: {e}")
-                                    break # Exit listener loop on other errors
-
-                        listen_task = asyncio.create_task(listen())
-
-                        try:
-                            # Send text chunks from response queue
-                            while True:
-                                text = await self.response_queue.get()
-                                #print(f"[DEBUG] TTS received text: '{text}'") # <-- ADD THIS LINE
-                                if text is None: # Signal to end the TTS stream for this turn
-                                    print("End of text stream signal received for TTS.")
-                                    await websocket.send(json.dumps({"text": ""})) # Send EOS signal
-                                    break # Exit inner loop (sending text)
-
-                                if text: # Ensure text is not empty
-                                    # Added space for potential word breaks
-                                    await websocket.send(json.dumps({"text": text + " "}))
-
-                                self.response_queue.task_done() # Mark item as processed
-
-                        except asyncio.CancelledError:
-                            print("TTS text sender cancelled.")
-                            listen_task.cancel() # Cancel listener if sender is cancelled
-                            raise # Re-raise cancellation
-                        except Exception as e:
-                            print(f"Error processing text for TTS: {e}")
-                            listen_task.cancel() # Cancel listener on error
-                        finally:
-                            # Wait for the listener task to finish after text sending stops or errors
-                            if not listen_task.done():
-                                print("Waiting for TTS listener task to complete...")
-                                try:
-                                    await asyncio.wait_for(listen_task, timeout=5.0)
-                                except asyncio.TimeoutError:
-                                    print("Timeout waiting for TTS listener task.")
-                                    listen_task.cancel()
-                                except asyncio.CancelledError:
-                                     print("TTS Listener was already cancelled.") # Expected if sender was cancelled
-                                except Exception as e:
-                                     print(f"Error awaiting listener task: {e}")
-
-
-                    except websockets.exceptions.ConnectionClosed as e:
-                         print(f"ElevenLabs WebSocket connection closed during operation: {e}")
-                         # Outer loop will handle reconnection attempt
-                    except Exception as e:
-                        print(f"Error during ElevenLabs websocket communication: {e}")
-                        # Outer loop will handle reconnection attempt
-
-            except websockets.exceptions.WebSocketException as e:
-                print(f"ElevenLabs WebSocket connection failed: {e}")
-            except asyncio.CancelledError:
-                 print("TTS main task cancelled.")
-                 break # Exit outer loop if cancelled
-            except Exception as e:
-                print(f"Error connecting to ElevenLabs websocket: {e}")
-
-            print("Waiting 5 seconds before attempting ElevenLabs reconnection...")
-            await asyncio.sleep(5) # Wait before retrying connection
+        """ Send text to ElevenLabs over a persistent session and stream the returned audio. """
+        await self.connect_tts()
+        session = self.tts_session
+        try:
+            # Send text segments from the response queue; the socket stays open between turns
+            while True:
+                turn_id, text = await self.response_queue.get()
+                try:
+                    if turn_id != self.turn_id: # Left over from an interrupted turn
+                        continue
+                    if text is None: # Signal that this turn's text is complete
+                        print("End of text stream signal received for TTS.")
+                        await session.end_turn()
+                        print(f"Audio pipeline: {self.audio_metrics()}")
+                    elif text: # Ensure text is not empty
+                        self.tracer.event("tts_first_text", turn_id)
+                        await session.send_text(text, turn_id)
+                except Exception as e:
+                    print(f"Error processing text for TTS: {e}")
+                finally:
+                    self.response_queue.task_done() # Mark item as processed
+        except asyncio.CancelledError:
+            print("TTS main task cancelled.")
+        finally:
+            await session.close()
 
     # Removed extract_tool_call method as it's replaced by direct handling in send_prompt
     async def play_audio(self): # <--- This line needs to be consistently indented with other ADA methods
-        """ Play audio data from the audio_queue. """
-        if self.pya is None:
-            print("PyAudio is not initialized. Cannot play audio.")
-            return
-        stream = None # Initialize stream variable
+        """ Hand audio data from the audio_queue to the output engine, which plays it on its own thread. """
+        output = None
         try:
             print("Opening PyAudio stream...")
-            stream = await asyncio.to_thread(
-                self.pya.open,
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=RECEIVE_SAMPLE_RATE,
-                output=True,
-            )
+            # Usually already opened during start-up
+            await self.open_audio_output()
+            output = self.audio_output
             print("PyAudio stream opened. Waiting for audio chunks...")
             while True:
                 try:
                     # Wait for audio data from the TTS task
-                    bytestream = await self.audio_queue.get()
+                    turn_id, bytestream = await self.audio_queue.get()
                     #print(f"[DEBUG] play_audio received audio chunk of size: {len(bytestream)} bytes.")
                     if bytestream is None: # Potential signal to stop? (Not currently used)
                          print("Received None in audio queue, stopping playback loop.")
                          break
-                    # Write audio data to the stream in a separate thread
-                    await asyncio.to_thread(stream.write, bytestream)
+                    # Copy into the ring buffer (waits only if it is full); audio from earlier turns is dropped
+                    if turn_id == self.turn_id:
+                        self.tracer.event("tts_first_audio", turn_id)
+                        # A speculative turn's audio waits for the final transcript (and is dropped if it disagrees)
+                        await self._turn_confirmed.wait()
+                    if turn_id == self.turn_id:
+                        await output.write(bytestream, turn_id)
                     self.audio_queue.task_done() # Mark item as processed
                 except asyncio.CancelledError:
                     print("Audio playback task cancelled.")
@@ -380,23 +650,40 @@ Whenever you need to reference the date, know that it is {today}.
         except Exception as e:
             print(f"Error setting up audio stream: {e}")
         finally:
-            if stream:
+            if output:
                 print("Closing PyAudio stream...")
-                await asyncio.to_thread(stream.stop_stream)
-                await asyncio.to_thread(stream.close)
-                print("PyAudio stream closed.")
+                await asyncio.to_thread(output.close)
+                print(f"PyAudio stream closed. Playback stats: {output.stats()}")
             # Don't terminate PyAudio here if other parts might use it
             # await asyncio.to_thread(self.pya.terminate)
 
     async def stt(self):
         """ Listens via microphone and puts transcribed text onto input_queue. """
-        if self.recorder is None:
-            print("Audio recorder (RealtimeSTT) is not initialized.")
+        try:
+            # Usually already loading since start-up; other subsystems may still be warming up
+            await self.load_stt()
+        except Exception as e:
+            print(f"Audio recorder (RealtimeSTT) could not be initialized: {e}")
             return
 
-        print("Starting Speech-to-Text engine... Waiting for wake word 'Alfred'")
+        if self.wake_gate is not None:
+            # Barge-in starts the moment the wake word is heard, not once the command is transcribed
+            loop = asyncio.get_running_loop()
+            self.wake_gate.on_wake = lambda: loop.call_soon_threadsafe(self._on_wake)
+            print("Starting Speech-to-Text engine... Waiting for the wake word")
+        else:
+            print("Starting Speech-to-Text engine... Waiting for wake word 'Alfred'")
         while True:
             try:
+                if self.wake_gate is not None:
+                    # The wake word was spotted on raw audio, so the transcript is the command itself
+                    prompt = (await asyncio.to_thread(self.wake_gate.next_command) or "").strip()
+                    if prompt:
+                        await self._final_transcript(prompt)
+                    else:
+                        print("Wake word detected, but no command followed.")
+                    continue
+
                 # Blocking call handled in a thread, now specifically listening for the wake word
                 text = await asyncio.to_thread(self.recorder.text)
                 
@@ -408,8 +695,7 @@ Whenever you need to reference the date, know that it is {today}.
                     prompt = text.strip()[len("alfred"):].strip()
                     
                     if prompt: # Ensure there is a prompt after the wake word
-                        await self.clear_queues()
-                        await self.input_queue.put(prompt)
+                        await self._final_transcript(prompt)
                     else:
                         print("Wake word detected, but no command followed.")
                 # If the text doesn't start with "alfred", it's ignored.
@@ -421,12 +707,116 @@ Whenever you need to reference the date, know that it is {today}.
             except Exception as e:
                 print(f"Error in STT loop: {e}")
                 await asyncio.sleep(0.5)
+    async def submit(self, prompt, utterance_end=None, speculative=False):
+        """
+        Starts a new turn for a transcribed command; its trace starts when the utterance ended
+        (`utterance_end`, a perf_counter value, or else the recorder's own stop time).
+        A speculative turn stays unconfirmed until confirm_turn().
+        """
+        transcribed = time.perf_counter()
+        if utterance_end is None:
+            # The recorder keeps the wall-clock time it stopped recording; map it onto perf_counter
+            stopped = getattr(self.recorder, "last_recording_stop_time", None)
+            utterance_end = transcribed - max(0.0, time.time() - stopped) if stopped else transcribed
+        turn_id = await self.interrupt()
+        self.tracer.begin_turn(turn_id, at=utterance_end)
+        self.tracer.event("speculated" if speculative else "transcribed", turn_id, at=transcribed)
+        if speculative:
+            self._speculative = (turn_id, prompt)
+            self._turn_confirmed.clear()
+        await self.input_queue.put((turn_id, prompt))
+
+    # --- Early Endpointing ---
+    def _from_recorder(self, handler, *args):
+        """RealtimeSTT calls back on its own threads; the time is taken there and the handler runs on the loop."""
+        self._loop.call_soon_threadsafe(handler, time.perf_counter(), *args)
+
+    def _on_speech_start(self, at):
+        self.endpointer.begin(at)
+
+    def _on_partial(self, at, text):
+        if self.wake_gate is None:
+            # Transcript matching: only what follows "Alfred" is the command
+            if not text.strip().lower().startswith("alfred"):
+                return
+            text = text.strip()[len("alfred"):].strip(" ,.")
+        self.endpointer.partial(text, at)
+        self._schedule_endpoint_check()
+
+    def _on_pause(self, at):
+        self.endpointer.pause(at)
+        self._schedule_endpoint_check()
+
+    def _on_resume(self, at):
+        if self.endpointer.resume(at) and self._speculative is not None:
+            # The speaker was not done after all: drop the early start and wait for the real end
+            print(f"Early start withdrawn; the speaker went on after: {self._speculative[1]!r}")
+            self._forget = self._speculative[0]
+            asyncio.ensure_future(self.interrupt())
+
+    def _schedule_endpoint_check(self):
+        if self._endpoint_timer is not None:
+            self._endpoint_timer.cancel()
+        ready = self.endpointer.ready_at()
+        if ready is not None:
+            self._endpoint_timer = self._loop.call_later(max(0.0, ready - time.perf_counter()), self._check_endpoint)
+
+    def _check_endpoint(self):
+        self._endpoint_timer = None
+        text = self.endpointer.check(time.perf_counter())
+        if text:
+            print(f"Starting early on a stable partial transcript: {text!r}")
+            asyncio.ensure_future(self.submit(text, utterance_end=self.endpointer.paused_at, speculative=True))
+
+    async def _final_transcript(self, prompt):
+        """Confirms the turn started early on a matching partial, or (re)starts the turn on the final text."""
+        if self._endpoint_timer is not None:
+            # A check still due would speculate again on the utterance that just ended
+            self._endpoint_timer.cancel()
+            self._endpoint_timer = None
+        if self.endpointer is None:
+            await self.submit(prompt)
+            return
+        speculative = self._speculative
+        outcome = self.endpointer.finish(prompt, time.perf_counter())
+        # The next utterance ends after a silence that fits this speaker's pauses
+        self.recorder.post_speech_silence_duration = self.endpointer.pace.end_of_turn_silence()
+        if outcome == "confirmed" and speculative is not None:
+            self.confirm_turn()
+            print(f"Early start confirmed, {self.endpointer.saved_ms[-1]:.0f} ms before the final transcript.")
+        else:
+            if speculative is not None:
+                print(f"False start: started on {speculative[1]!r}, but the final transcript is {prompt!r}.")
+                self._forget = speculative[0]
+            await self.submit(prompt)
+        print(self.endpointer.report())
+
+    def confirm_turn(self):
+        """The final transcript agrees with the speculative turn: let its audio play and its tools act."""
+        self._speculative = None
+        self._turn_confirmed.set()
+        self.tracer.event("confirmed", self.turn_id)
+
+    def audio_metrics(self) -> dict:
+        """Queue depth and bytes in flight between the TTS socket and the speaker."""
+        metrics = {"queue": self.audio_queue.stats()}
+        in_flight = self.audio_queue.bytes
+        if self.audio_output is not None:
+            metrics["output"] = self.audio_output.stats()
+            in_flight += self.audio_output.ring.available()
+        metrics["bytes_in_flight"] = in_flight
+        return metrics
+
+    def _on_wake(self):
+        self._wake_interrupt = asyncio.ensure_future(self.interrupt())
+
     async def clear_queues(self):
         """Empties all asyncio queues to start fresh."""
         print("Clearing queues to handle new input...")
         for q in [self.input_queue, self.response_queue, self.audio_queue]:
             while not q.empty():
                 q.get_nowait()
+                q.task_done()
     
 
     # --- End of ADA Class ---
\ No newline at end of file
@@ -0,0 +1,352 @@
+import os
+import time
+import random
+import asyncio
+import threading
+
+# --- Output Format ---
+# ElevenLabs streams pcm_24000: 16-bit mono PCM at 24 kHz.
+SAMPLE_RATE = 24000
+CHANNELS = 1
+SAMPLE_WIDTH = 2
+# Frames the device asks for per callback (~43 ms at 24 kHz).
+FRAMES_PER_BUFFER = 1024
+
+# --- Buffering ---
+# Playback of a burst starts once this much audio is buffered (or the first bytes have waited this
+# long), which absorbs uneven arrival of ElevenLabs frames at the cost of that much extra latency.
+JITTER_TARGET_MS = int(os.getenv("ALFRED_JITTER_TARGET_MS", "120"))
+# Capacity of the preallocated ring buffer; a whole spoken reply normally fits.
+BUFFER_SECONDS = 20
+# Decoded audio waiting between the TTS listener and the ring is capped at this many seconds; past
+# it the listener stops reading the socket, so a stalled player cannot grow memory without bound.
+AUDIO_QUEUE_SECONDS = 5
+# "device" plays through PyAudio; "memory" renders into an in-memory sink (headless runs and tests);
+# "null" renders and counts the audio but keeps none of it (long benchmark runs).
+OUTPUT_SINK = os.getenv("ALFRED_AUDIO_SINK", "device")
+
+
+class RingBuffer:
+    """Fixed-size byte ring shared by the event loop (writer) and the audio callback thread (reader)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._view = memoryview(bytearray(capacity))
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> int:
+        return self._size
+
+    def space(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, data) -> int:
+        """Copies as much of `data` (any bytes-like object) as fits; returns the number of bytes taken."""
+        data = memoryview(data).cast("B")
+        with self._lock:
+            count = min(len(data), self.capacity - self._size)
+            end = (self._start + self._size) % self.capacity
+            first = min(count, self.capacity - end)
+            self._view[end:end + first] = data[:first]
+            self._view[:count - first] = data[first:count]
+            self._size += count
+        return count
+
+    def read_into(self, out: memoryview) -> int:
+        """Moves up to len(out) bytes into `out`; returns the number of bytes copied."""
+        with self._lock:
+            count = min(len(out), self._size)
+            first = min(count, self.capacity - self._start)
+            out[:first] = self._view[self._start:self._start + first]
+            out[first:count] = self._view[:count - first]
+            self._start = (self._start + count) % self.capacity
+            self._size -= count
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._start = self._size = 0
+
+
+class AudioQueue(asyncio.Queue):
+    """
+    asyncio.Queue of (turn id, pcm bytes) bounded by bytes instead of items, so backpressure does
+    not depend on how ElevenLabs happens to size its frames. Keeps depth and size metrics.
+    """
+
+    def __init__(self, max_bytes: int = int(AUDIO_QUEUE_SECONDS * SAMPLE_RATE) * CHANNELS * SAMPLE_WIDTH):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.peak_depth = 0
+        self.producer_waits = 0
+
+    def full(self) -> bool:
+        return self.bytes >= self.max_bytes
+
+    async def put(self, item):
+        if self.full():
+            self.producer_waits += 1
+        await super().put(item)
+
+    def _put(self, item):
+        super()._put(item)
+        self.bytes += len(item[1] or b"")
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        self.peak_depth = max(self.peak_depth, self.qsize())
+
+    def _get(self):
+        item = super()._get()
+        self.bytes -= len(item[1] or b"")
+        return item
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "bytes": self.bytes,
+            "peak_depth": self.peak_depth,
+            "peak_bytes": self.peak_bytes,
+            "producer_waits": self.producer_waits,
+        }
+
+
+class AudioOutput:
+    """
+    Plays 24 kHz PCM through a PyAudio callback stream fed from a preallocated ring buffer.
+    The device pulls fixed-size blocks on its own thread, so playback timing no longer depends on
+    event-loop scheduling; the loop only copies decoded frames into the ring. Each burst is held
+    back until the jitter target is buffered, and underruns/overruns are counted.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS, sample_width: int = SAMPLE_WIDTH,
+                 frames_per_buffer: int = FRAMES_PER_BUFFER, jitter_target_ms: int = JITTER_TARGET_MS,
+                 buffer_seconds: float = BUFFER_SECONDS, clock=time.monotonic):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frames_per_buffer = frames_per_buffer
+        self.frame_bytes = channels * sample_width
+        self.jitter_target = jitter_target_ms / 1000
+        self.target_bytes = int(self.jitter_target * sample_rate) * self.frame_bytes
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate) * self.frame_bytes)
+        self._clock = clock
+        self._scratch = memoryview(bytearray(frames_per_buffer * self.frame_bytes))
+        self._stream = None
+        self._sink = None
+        self._continue = 0  # pyaudio.paContinue
+        # Playback state (touched by the callback thread)
+        self._prebuffering = True
+        self._pending_since = None  # when the oldest unplayed byte of a held-back burst arrived
+        self._starved = False  # ran dry mid-burst; an underrun if more audio of the same turn follows
+        self._turn = None
+        self._generation = 0  # bumped by clear(), so a write waiting for space gives up
+        # Counters
+        self.underruns = 0
+        self.overruns = 0
+        self.frames_played = 0
+        self.frames_silent = 0
+        self.turn_frames_played = 0  # frames of the latest turn played so far
+        # Called from the audio thread as on_first_audio(turn id, perf_counter time) when a turn starts playing.
+        self.on_first_audio = None
+
+    # --- Lifecycle ---
+
+    def open(self, pya):
+        """Opens the PyAudio output stream in callback mode."""
+        import pyaudio
+        self._stream = pya.open(
+            format=pya.get_format_from_width(self.sample_width),
+            channels=self.channels,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self._continue = pyaudio.paContinue
+        self._stream.start_stream()
+
+    def open_memory(self, realtime: bool = True, keep: bool = True):
+        """Renders into a MemorySink instead of a device; returns the sink."""
+        self._sink = MemorySink(self, realtime=realtime, keep=keep)
+        if realtime:
+            self._sink.start()
+        return self._sink
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._sink is not None:
+            self._sink.stop()
+
+    # --- Writer Side (event loop) ---
+
+    def feed(self, data, turn_id=None) -> int:
+        """Non-blocking write; returns how many bytes fit in the ring."""
+        if self._starved and turn_id == self._turn:
+            self.underruns += 1
+        self._starved = False
+        if turn_id != self._turn:
+            self._turn = turn_id
+            self.turn_frames_played = 0
+        if self._prebuffering and self._pending_since is None:
+            self._pending_since = self._clock()
+        return self.ring.write(data)
+
+    async def write(self, data, turn_id=None):
+        """Queues decoded PCM for playback without copying it first; waits for space if the ring is full."""
+        view = memoryview(data)
+        generation = self._generation
+        view = view[self.feed(view, turn_id):]
+        if view:
+            self.overruns += 1
+        while view and generation == self._generation:
+            await asyncio.sleep(self.frames_per_buffer / self.sample_rate)
+            view = view[self.ring.write(view):]
+
+    def clear(self):
+        """Drops everything not yet handed to the device (barge-in); silence starts with the next callback."""
+        self._generation += 1
+        self.ring.clear()
+        self._prebuffering = True
+        self._pending_since = None
+        self._starved = False
+
+    # --- Reader Side (audio thread) ---
+
+    def render(self, frame_count: int) -> bytes:
+        """Produces the next `frame_count` frames of output, padding with silence when there is no audio."""
+        wanted = frame_count * self.frame_bytes
+        if len(self._scratch) < wanted:
+            self._scratch = memoryview(bytearray(wanted))
+        out = self._scratch[:wanted]
+        available = self.ring.available()
+        if self._prebuffering:
+            waited = self._pending_since is not None and self._clock() - self._pending_since >= self.jitter_target
+            if available and (available >= self.target_bytes or waited):
+                self._prebuffering = False
+                self._pending_since = None
+            else:
+                self.frames_silent += frame_count
+                return bytes(wanted)
+        # Only whole frames are read, so an odd-sized chunk never shifts the samples that follow it.
+        count = self.ring.read_into(out[:min(wanted, available - available % self.frame_bytes)])
+        if count < wanted:
+            # Ran dry: pad with silence and hold the next burst back until it is buffered again.
+            out[count:] = bytes(wanted - count)
+            self._prebuffering = True
+            self._pending_since = None
+            self._starved = True
+        if count and not self.turn_frames_played and self.on_first_audio is not None:
+            self.on_first_audio(self._turn, time.perf_counter())
+        self.frames_played += count // self.frame_bytes
+        self.turn_frames_played += count // self.frame_bytes
+        self.frames_silent += frame_count - count // self.frame_bytes
+        return bytes(out)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        return self.render(frame_count), self._continue
+
+    # --- Reporting ---
+
+    def turn_played_ms(self) -> float:
+        return 1000 * self.turn_frames_played / self.sample_rate
+
+    def buffered_ms(self) -> float:
+        return 1000 * self.ring.available() / self.frame_bytes / self.sample_rate
+
+    def stats(self) -> dict:
+        return {
+            "underruns": self.underruns,
+            "overruns": self.overruns,
+            "played_seconds": self.frames_played / self.sample_rate,
+            "buffered_ms": self.buffered_ms(),
+        }
+
+
+class MemorySink:
+    """Stands in for the sound card: pulls blocks from an AudioOutput and keeps everything it 'played'."""
+
+    def __init__(self, output: AudioOutput, realtime: bool = True, keep: bool = True):
+        self.output = output
+        self.realtime = realtime
+        self.keep = keep
+        self.data = bytearray()
+        self.bytes_rendered = 0
+        self._running = False
+        self._thread = None
+
+    def pump(self, blocks: int = 1):
+        """Renders `blocks` device buffers immediately (for tests driving time themselves)."""
+        for _ in range(blocks):
+            block = self.output.render(self.output.frames_per_buffer)
+            self.bytes_rendered += len(block)
+            if self.keep:
+                self.data += block
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _loop(self):
+        # Paced like a device: one buffer per buffer-duration, against an absolute schedule.
+        period = self.output.frames_per_buffer / self.output.sample_rate
+        next_tick = time.perf_counter()
+        while self._running:
+            self.pump()
+            next_tick += period
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+# --- Offline Simulation ---
+
+def simulate(jitter_target_ms: int, arrivals, seconds: float, frames_per_buffer: int = FRAMES_PER_BUFFER) -> dict:
+    """
+    Replays (arrival time, chunk) pairs against the in-memory sink on a virtual clock and reports
+    underruns and how long the first audio was held back.
+    """
+    now = [0.0]
+    output = AudioOutput(jitter_target_ms=jitter_target_ms, frames_per_buffer=frames_per_buffer, clock=lambda: now[0])
+    sink = MemorySink(output, realtime=False)
+    period = frames_per_buffer / output.sample_rate
+    pending = list(arrivals)
+    first_audio = None
+    while now[0] < seconds:
+        while pending and pending[0][0] <= now[0]:
+            output.feed(pending.pop(0)[1], turn_id=1)
+        before = output.frames_played
+        sink.pump()
+        if first_audio is None and output.frames_played > before:
+            first_audio = now[0]
+        now[0] += period
+    return dict(output.stats(), first_audio_ms=1000 * (first_audio or 0.0))
+
+
+def elevenlabs_like_arrivals(seconds_of_audio: float = 8.0, chunk_ms: int = 50, jitter_ms: int = 40, seed: int = 7):
+    """Chunks that arrive at real-time pace on average but with random gaps, like streamed TTS."""
+    rng = random.Random(seed)
+    chunk_bytes = int(SAMPLE_RATE * chunk_ms / 1000) * CHANNELS * SAMPLE_WIDTH
+    arrivals, at = [], 0.2
+    for _ in range(int(seconds_of_audio * 1000 / chunk_ms)):
+        arrivals.append((at, bytes(chunk_bytes)))
+        at += max(0.0, rng.gauss(chunk_ms, jitter_ms)) / 1000
+    return arrivals
+
+
+if __name__ == "__main__":
+    arrivals = elevenlabs_like_arrivals()
+    print("8 s of speech in 50 ms chunks with ~40 ms arrival jitter:")
+    for target in (0, 40, 80, 120, 200, 300):
+        result = simulate(target, arrivals, seconds=12.0)
+        print(
+            f"  jitter target {target:3d} ms: {result['underruns']:2d} underruns, "
+            f"first audio after {result['first_audio_ms']:.0f} ms"
+        )
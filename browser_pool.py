@@ -0,0 +1,154 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+# --- Pool Defaults ---
+# Number of isolated browser contexts (each with one page) available to tools at once.
+BROWSER_POOL_SIZE = 3
+# A context is closed and replaced after this many leases, so cookies, caches and leaks don't pile up.
+PAGE_MAX_USES = 25
+# Time allowed for the liveness probe run before a page is handed out.
+HEALTH_CHECK_TIMEOUT = 2.0
+# Navigation timeout for pooled pages (milliseconds, as Playwright expects).
+NAVIGATION_TIMEOUT_MS = 20000
+# Resource types that never contribute to a page's text and are aborted when blocking is on.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet", "texttrack", "manifest", "eventsource", "websocket"}
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class PooledPage:
+    """One pool entry: a private browser context, its page and a use counter."""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            print(f"Error closing pooled browser context: {e}")
+
+
+class BrowserPool:
+    """
+    A fixed-size pool of Playwright contexts/pages.
+    Each tool call leases its own page, so parallel web reads no longer race on a shared one.
+    Pages are health-checked on lease and recycled after `max_uses` leases or any failure,
+    and by default they skip images, fonts, media and stylesheets.
+    """
+
+    def __init__(self, browser, size: int = BROWSER_POOL_SIZE, max_uses: int = PAGE_MAX_USES,
+                 block_resources: bool = True):
+        self.browser = browser
+        self.size = size
+        self.max_uses = max_uses
+        self.block_resources = block_resources
+        self._idle = asyncio.Queue()
+        self._created = 0
+        self._create_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _new_entry(self):
+        context = await self.browser.new_context()
+        if self.block_resources:
+            # Only the document and scripts are needed to read a page's text.
+            await context.route("**/*", _block_heavy_resources)
+        page = await context.new_page()
+        page.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        return PooledPage(context, page)
+
+    async def _is_healthy(self, entry) -> bool:
+        if entry.page.is_closed():
+            return False
+        try:
+            return await asyncio.wait_for(entry.page.evaluate("1 + 1"), HEALTH_CHECK_TIMEOUT) == 2
+        except Exception:
+            return False
+
+    async def acquire(self) -> PooledPage:
+        """Leases a healthy page, creating one if the pool is not full yet, otherwise waiting for a return."""
+        if self._closed:
+            raise RuntimeError("The browser pool is closed.")
+        entry = None
+        if self._idle.empty():
+            async with self._create_lock:
+                if self._created < self.size:
+                    self._created += 1
+                    try:
+                        entry = await self._new_entry()
+                    except Exception:
+                        self._created -= 1
+                        raise
+        if entry is None:
+            entry = await self._idle.get()
+            if not await self._is_healthy(entry):
+                print("Pooled browser page failed its health check; replacing it.")
+                try:
+                    entry = await self._replace(entry)
+                except Exception:
+                    # The slot is free again; the next acquire creates a fresh page for it.
+                    self._created -= 1
+                    raise
+        entry.uses += 1
+        return entry
+
+    async def release(self, entry: PooledPage, healthy: bool = True):
+        """Returns a leased page; pages that failed or reached max_uses are recycled first."""
+        if self._closed:
+            await entry.close()
+            return
+        if not healthy or entry.uses >= self.max_uses:
+            try:
+                entry = await self._replace(entry)
+            except Exception as e:
+                print(f"Could not replace pooled browser page: {e}")
+                self._created -= 1
+                return
+        self._idle.put_nowait(entry)
+
+    async def _replace(self, entry: PooledPage) -> PooledPage:
+        await entry.close()
+        return await self._new_entry()
+
+    @asynccontextmanager
+    async def lease(self):
+        """`async with pool.lease() as page:` — the page is returned (or recycled on error) afterwards."""
+        entry = await self.acquire()
+        healthy = True
+        try:
+            yield entry.page
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            await self.release(entry, healthy)
+
+    async def navigate_and_extract(self, url: str) -> tuple[str, str]:
+        """Loads `url` on a single leased page and returns (title, html) from that same page."""
+        async with self.lease() as page:
+            await page.goto(url, wait_until="domcontentloaded")
+            return await page.title(), await page.content()
+
+    async def navigate_and_read(self, url: str, max_chars: int) -> tuple[str, str]:
+        """Loads `url` on a single leased page and returns (title, text) extracted inside the browser."""
+        from text_extraction import BOILERPLATE_TOKENS, BROWSER_EXTRACT_JS, HINT_MAX_PARAGRAPHS, MIN_MAIN_CHARS
+        async with self.lease() as page:
+            await page.goto(url, wait_until="domcontentloaded")
+            title = await page.title()
+            # The script strips boilerplate out of the live DOM; harmless, since every lease navigates afresh.
+            text = await page.evaluate(
+                BROWSER_EXTRACT_JS, [max_chars, MIN_MAIN_CHARS, sorted(BOILERPLATE_TOKENS), HINT_MAX_PARAGRAPHS]
+            )
+        return title, text
+
+    async def close(self):
+        self._closed = True
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
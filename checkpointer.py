@@ -0,0 +1,482 @@
+import zlib
+import random
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Iterator, AsyncIterator, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+# --- Checkpointer Defaults ---
+# Checkpoints kept per thread and namespace; older ones are pruned.
+KEEP_CHECKPOINTS = 50
+# Pruning runs after this many checkpoint writes rather than on every super-step.
+PRUNE_EVERY = 25
+# A list channel (e.g. "messages") is stored as an append delta on top of its previous
+# version; after this many deltas in a row a full snapshot is written again.
+DELTA_CHAIN_LIMIT = 16
+# Serialized payloads above this size are zlib-compressed.
+COMPRESS_MIN_BYTES = 512
+# Last-written lists kept for delta detection (one per thread, namespace and channel); the least
+# recently written is evicted, and its next write is simply a full snapshot.
+DELTA_CACHE_SIZE = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint BLOB NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data BLOB,
+    base_version TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    A durable LangGraph checkpointer backed by SQLite in WAL mode.
+    Channel values are stored once per version (only channels that changed in a step),
+    list channels that only grew are stored as append deltas, payloads are msgpack
+    (via the serializer) plus zlib, and old checkpoints are pruned per thread.
+    """
+
+    def __init__(self, path: str, keep_checkpoints: int = KEEP_CHECKPOINTS, prune_every: int = PRUNE_EVERY,
+                 *, serde=None, delta_cache_size: int = DELTA_CACHE_SIZE):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_checkpoints = keep_checkpoints
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # (thread_id, checkpoint_ns, channel) -> (version, value, depth) of the last list written,
+        # used to detect append-only growth without reading it back from disk. Bounded (LRU), since a
+        # server writes one thread per session and never deletes them.
+        self._last_lists = OrderedDict()
+        self.delta_cache_size = delta_cache_size
+        self._puts_since_prune = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Encoding ---
+
+    def _pack(self, obj: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return b"z" + type_.encode() + b"\x00" + zlib.compress(data, 1)
+        return b"r" + type_.encode() + b"\x00" + data
+
+    def _unpack(self, blob: bytes) -> Any:
+        type_, _, data = blob[1:].partition(b"\x00")
+        if blob[:1] == b"z":
+            data = zlib.decompress(data)
+        return self.serde.loads_typed((type_.decode(), data))
+
+    # --- Blob (Channel Value) Storage ---
+
+    def _write_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str, values: dict):
+        if channel not in values:
+            row = ("empty", None, None, 0)
+        else:
+            value = values[channel]
+            key = (thread_id, checkpoint_ns, channel)
+            previous = self._last_lists.get(key)
+            row = None
+            if isinstance(value, list):
+                if previous is not None and previous[2] < DELTA_CHAIN_LIMIT:
+                    base_version, base_value, depth = previous
+                    if len(value) >= len(base_value) and all(
+                        a is b or a == b for a, b in zip(base_value, value)
+                    ):
+                        row = ("delta", self._pack(value[len(base_value):]), base_version, depth + 1)
+                if row is None:
+                    row = ("full", self._pack(value), None, 0)
+                self._last_lists[key] = (version, value, row[3])
+                self._last_lists.move_to_end(key)
+                while len(self._last_lists) > self.delta_cache_size:
+                    self._last_lists.popitem(last=False)
+            else:
+                row = ("full", self._pack(value), None, 0)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, channel, str(version), *row),
+        )
+
+    def _read_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str):
+        """Returns (found, value), following append deltas back to their full snapshot."""
+        tails = []
+        while True:
+            row = self._conn.execute(
+                "SELECT kind, data, base_version FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is None:
+                return False, None
+            kind, data, base_version = row
+            if kind == "empty":
+                return False, None
+            if kind == "full":
+                value = self._unpack(data)
+                break
+            tails.append(self._unpack(data))
+            version = base_version
+        for tail in reversed(tails):
+            value = value + tail
+        return True, value
+
+    def _load_channel_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict:
+        channel_values = {}
+        for channel, version in versions.items():
+            found, value = self._read_blob(thread_id, checkpoint_ns, channel, version)
+            if found:
+                channel_values[channel] = value
+        return channel_values
+
+    # --- Reads ---
+
+    def _make_tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_b, metadata_b):
+        checkpoint = self._unpack(checkpoint_b)
+        writes = self._conn.execute(
+            "SELECT task_id, channel, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self._unpack(metadata_b),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self._unpack(value)) for task_id, channel, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, checkpoint, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, checkpoint, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._make_tuple(thread_id, checkpoint_ns, *row)
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint, metadata FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_b, metadata_b in rows:
+            if filter:
+                metadata = self._unpack(metadata_b)
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            with self._lock:
+                item = self._make_tuple(thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint_b, metadata_b)
+            yield item
+
+    # --- Writes ---
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for channel, version in new_versions.items():
+                    self._write_blob(thread_id, checkpoint_ns, channel, version, values)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"],
+                        config["configurable"].get("checkpoint_id"),
+                        self._pack(c),
+                        self._pack(get_checkpoint_metadata(config, metadata)),
+                    ),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # The delta cache may now point at a version that was never stored.
+                self._last_lists.clear()
+                raise
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= self.prune_every:
+                self._puts_since_prune = 0
+                self._prune(thread_id, checkpoint_ns)
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((write_idx >= 0, (
+                thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, self._pack(value), task_path,
+            )))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for keep_existing, row in rows:
+                verb = "INSERT OR IGNORE" if keep_existing else "INSERT OR REPLACE"
+                self._conn.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.execute("COMMIT")
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("COMMIT")
+            for key in [k for k in self._last_lists if k[0] == thread_id]:
+                del self._last_lists[key]
+
+    # --- Retention ---
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        """Keeps the newest checkpoints of a thread and drops blobs nothing references any more."""
+        old_ids = [row[0] for row in self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_checkpoints),
+        )]
+        if not old_ids:
+            return
+
+        self._conn.execute("BEGIN")
+        for checkpoint_id in old_ids:
+            params = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+
+        # Blob versions still referenced by a kept checkpoint, plus the delta chains they build on.
+        needed = set()
+        for (checkpoint_b,) in self._conn.execute(
+            "SELECT checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall():
+            for channel, version in self._unpack(checkpoint_b)["channel_versions"].items():
+                needed.add((channel, str(version)))
+        bases = {
+            (channel, version): base
+            for channel, version, base in self._conn.execute(
+                "SELECT channel, version, base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            )
+        }
+        for channel, version in list(needed):
+            base = bases.get((channel, version))
+            while base is not None and (channel, base) not in needed:
+                needed.add((channel, base))
+                base = bases.get((channel, base))
+        stale = [(thread_id, checkpoint_ns, channel, version) for channel, version in bases
+                 if (channel, version) not in needed]
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", stale
+        )
+        self._conn.execute("COMMIT")
+
+    # --- Async API (SQLite work runs off the event loop) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # Same sortable "<counter>.<random>" format as MemorySaver.
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+# --- Write Latency / Memory Benchmark ---
+
+def _build_benchmark_graph(checkpointer):
+    """A two-node graph that mimics Alfred's turns: user message, tool result, answer."""
+    from typing import TypedDict, Annotated
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langgraph.graph import StateGraph, END
+    from langgraph.graph.message import add_messages
+
+    class State(TypedDict):
+        messages: Annotated[list, add_messages]
+
+    def agent(state):
+        last = state["messages"][-1]
+        if isinstance(last, ToolMessage):
+            return {"messages": [AIMessage(content="Certainly, Sir. " * 20)]}
+        return {"messages": [AIMessage(content="", tool_calls=[
+            {"name": "get_weather", "args": {"location": "London"}, "id": f"call_{len(state['messages'])}"}
+        ])]}
+
+    def action(state):
+        call = state["messages"][-1].tool_calls[0]
+        return {"messages": [ToolMessage(content="It is 61°F with light rain. " * 40, tool_call_id=call["id"])]}
+
+    workflow = StateGraph(State)
+    workflow.add_node("agent", agent)
+    workflow.add_node("action", action)
+    workflow.set_entry_point("agent")
+    workflow.add_conditional_edges(
+        "agent", lambda state: "continue" if state["messages"][-1].tool_calls else "end",
+        {"continue": "action", "end": END},
+    )
+    workflow.add_edge("action", "agent")
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def benchmark(turns: int = 2000, path: str = "checkpoint_benchmark.db"):
+    """Runs `turns` turns against MemorySaver and SqliteCheckpointer, reporting latency and memory."""
+    import os
+    import time
+    import tracemalloc
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import MemorySaver
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    results = {}
+    for name, saver in (("MemorySaver", MemorySaver()), ("SqliteCheckpointer", SqliteCheckpointer(path))):
+        graph = _build_benchmark_graph(saver)
+        config = {"configurable": {"thread_id": "benchmark"}}
+        tracemalloc.start()
+        latencies = []
+        for turn in range(turns):
+            started = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=f"What's the weather, turn {turn}?")]}, config)
+            latencies.append(time.perf_counter() - started)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        latencies.sort()
+        results[name] = {
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+            "retained_mb": current / 1e6,
+        }
+        if isinstance(saver, SqliteCheckpointer):
+            saver.close()
+            results[name]["disk_mb"] = sum(
+                os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+            ) / 1e6
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in benchmark().items():
+        details = ", ".join(f"{key} {value:.2f}" for key, value in result.items())
+        print(f"{name}: {details}")
@@ -0,0 +1,140 @@
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, SystemMessage, ToolMessage, RemoveMessage, get_buffer_string
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+# --- Memory Defaults ---
+# Approximate token budget for the stored conversation history (system prompt not included).
+TOKEN_BUDGET = 6000
+# When the budget is exceeded, the newest turns up to this size are kept verbatim.
+KEEP_RECENT_TOKENS = 3000
+# Tool outputs from earlier turns (e.g. extract_page_text) are cut down to this many characters.
+TOOL_OUTPUT_CHARS = 600
+
+SUMMARY_PROMPT = """You maintain the running memory of a conversation between Sir and his butler, Alfred.
+Merge the existing summary with the new exchanges below into one concise summary.
+Keep names, dates, decisions, commitments, preferences and facts Alfred may need later. Drop pleasantries.
+
+Existing summary:
+{summary}
+
+New exchanges:
+{exchanges}
+
+Updated summary:"""
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Cheap, tokenizer-free token estimate used for budgeting."""
+    return count_tokens_approximately(messages) if messages else 0
+
+
+def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Groups messages into turns, each starting at a HumanMessage, so tool calls stay with their results."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class ConversationMemory:
+    """
+    Keeps the LangGraph message history within a token budget.
+    Runs once per turn as its own graph node: drops stored system prompts, shortens
+    tool outputs from earlier turns and folds the oldest turns into a running summary.
+    """
+
+    def __init__(self, llm, token_budget: int = TOKEN_BUDGET, keep_recent_tokens: int = KEEP_RECENT_TOKENS,
+                 tool_output_chars: int = TOOL_OUTPUT_CHARS):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_recent_tokens = min(keep_recent_tokens, token_budget)
+        self.tool_output_chars = tool_output_chars
+        self.last_prompt_tokens = 0
+
+    async def manage(self, state) -> dict:
+        """Graph node: returns the message removals/replacements that bring the history back in budget."""
+        messages = list(state["messages"])
+        summary = state.get("summary", "")
+        updates = []
+
+        # 1. The system prompt is injected at call time, so any stored copies are duplicates.
+        for message in messages:
+            if isinstance(message, SystemMessage):
+                updates.append(RemoveMessage(id=message.id))
+        messages = [m for m in messages if not isinstance(m, SystemMessage)]
+
+        # 2. Shorten raw tool outputs from turns before the current one.
+        turns = _split_turns(messages)
+        for turn in turns[:-1]:
+            for index, message in enumerate(turn):
+                if isinstance(message, ToolMessage) and len(str(message.content)) > self.tool_output_chars:
+                    compressed = self._compress_tool_message(message)
+                    turn[index] = compressed
+                    updates.append(compressed)
+
+        # 3. Roll the oldest turns into the running summary if still over budget.
+        history_tokens = estimate_tokens([m for turn in turns for m in turn])
+        if history_tokens > self.token_budget:
+            kept, dropped = self._select_recent(turns)
+            if dropped:
+                new_summary = await self._summarize(summary, [m for turn in dropped for m in turn])
+                if new_summary is not None:
+                    summary = new_summary
+                    updates.extend(RemoveMessage(id=m.id) for turn in dropped for m in turn)
+                    history_tokens = estimate_tokens([m for turn in kept for m in turn])
+                    print(f"Conversation memory: folded {len(dropped)} older turn(s) into the summary.")
+
+        print(f"Conversation memory: ~{history_tokens} history tokens (budget {self.token_budget}).")
+        result = {"messages": updates} if updates else {}
+        if summary != state.get("summary", ""):
+            result["summary"] = summary
+        return result
+
+    def build_prompt(self, system_prompt: str, state) -> list[BaseMessage]:
+        """Returns the messages actually sent to the model: one system prompt, the summary, then the history."""
+        content = system_prompt
+        summary = state.get("summary", "")
+        if summary:
+            content += f"\n\nSummary of the earlier conversation:\n{summary}"
+        prompt = [SystemMessage(content=content)]
+        prompt.extend(m for m in state["messages"] if not isinstance(m, SystemMessage))
+        self.last_prompt_tokens = estimate_tokens(prompt)
+        return prompt
+
+    # --- Helpers ---
+
+    def _compress_tool_message(self, message: ToolMessage) -> ToolMessage:
+        content = str(message.content)
+        omitted = len(content) - self.tool_output_chars
+        return ToolMessage(
+            content=f"{content[:self.tool_output_chars]}\n[... {omitted} characters of earlier tool output omitted]",
+            tool_call_id=message.tool_call_id,
+            name=message.name,
+            id=message.id,
+        )
+
+    def _select_recent(self, turns):
+        """Splits turns into (kept, dropped), keeping the newest ones that fit and always the current turn."""
+        kept = [turns[-1]]
+        used = estimate_tokens(turns[-1])
+        for turn in reversed(turns[:-1]):
+            size = estimate_tokens(turn)
+            if used + size > self.keep_recent_tokens:
+                break
+            kept.insert(0, turn)
+            used += size
+        dropped = turns[:len(turns) - len(kept)]
+        return kept, dropped
+
+    async def _summarize(self, summary: str, messages: list[BaseMessage]):
+        """Asks the model for an updated running summary; returns None if that fails."""
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none yet)", exchanges=get_buffer_string(messages))
+        try:
+            response = await self.llm.ainvoke(prompt)
+            return str(response.content).strip()
+        except Exception as e:
+            print(f"Error summarizing conversation history, keeping it for now: {e}")
+            return None
@@ -0,0 +1,301 @@
+import os
+import re
+import json
+import time
+import difflib
+import threading
+from collections import deque
+
+from tracing import percentile
+
+# --- Endpointing Settings ---
+# "adaptive" starts the agent on a stable partial transcript and adapts the trailing-silence timeout
+# to the speaker; "fixed" waits for RealtimeSTT's final transcript after a fixed silence.
+ENDPOINTING = os.getenv("ALFRED_ENDPOINTING", "fixed")
+# A partial transcript must stay unchanged this long (and the speaker be pausing) before the agent starts on it.
+STABLE_MS = float(os.getenv("ALFRED_STABLE_MS", "200"))
+# Shorter partials ("what", "hey") are never acted on.
+MIN_WORDS = 2
+# The final transcript confirms a speculative start when it matches this closely (word-level similarity).
+MATCH_RATIO = 0.9
+# Trailing silence that ends an utterance (RealtimeSTT's post_speech_silence_duration, default 0.6 s):
+# adapted to the speaker's own pauses, within these bounds.
+DEFAULT_SILENCE = 0.6
+MIN_SILENCE = 0.35
+MAX_SILENCE = 1.2
+# Added to the speaker's long (90th percentile) pauses, so a normal hesitation does not end the turn.
+SILENCE_MARGIN = 0.15
+# Pause needed before a speculative start, until enough of the speaker's pauses have been seen.
+DEFAULT_SPECULATE_PAUSE = 0.25
+MIN_SPECULATE_PAUSE = 0.15
+# Pauses remembered, and how many are needed before the thresholds adapt.
+PAUSE_HISTORY = 50
+MIN_PAUSES = 5
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without punctuation, for comparing transcripts."""
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+
+def same_command(partial: str, final: str, ratio: float = MATCH_RATIO) -> bool:
+    """Whether the final transcript says what the partial one did (punctuation and small slips aside)."""
+    a, b = normalize(partial).split(), normalize(final).split()
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= ratio
+
+
+class SpeakerPace:
+    """Pauses inside the speaker's utterances, and the silence thresholds derived from them."""
+
+    def __init__(self):
+        self.pauses = deque(maxlen=PAUSE_HISTORY)
+
+    def add(self, seconds: float):
+        self.pauses.append(seconds)
+
+    def end_of_turn_silence(self) -> float:
+        """Trailing silence after which the utterance is over: longer than nearly all of the speaker's pauses."""
+        if len(self.pauses) < MIN_PAUSES:
+            return DEFAULT_SILENCE
+        return min(MAX_SILENCE, max(MIN_SILENCE, percentile(sorted(self.pauses), 90) + SILENCE_MARGIN))
+
+    def speculation_pause(self) -> float:
+        """Pause after which a stable partial is acted on: longer than the speaker's typical pause."""
+        if len(self.pauses) < MIN_PAUSES:
+            return DEFAULT_SPECULATE_PAUSE
+        typical = percentile(sorted(self.pauses), 50)
+        return min(self.end_of_turn_silence() - 0.1, max(MIN_SPECULATE_PAUSE, typical))
+
+
+class EarlyEndpointer:
+    """
+    Follows one utterance at a time through RealtimeSTT's signals (recording start, realtime partials,
+    silence start/stop) and says when a partial is stable enough to start the agent on. The final
+    transcript then confirms the speculative start or turns it into a false start.
+    """
+
+    def __init__(self, pace: SpeakerPace = None, stable_ms: float = STABLE_MS, min_words: int = MIN_WORDS,
+                 speculate_pause: float = None):
+        self.pace = pace or SpeakerPace()
+        self.stable = stable_ms / 1000
+        self.min_words = min_words
+        self.fixed_pause = speculate_pause  # overrides the adaptive pause (offline tuning)
+        self.utterances = 0
+        self.speculations = 0
+        self.confirmed = 0
+        self.false_starts = 0
+        self.saved_ms = deque(maxlen=PAUSE_HISTORY)
+        self.begin(time.perf_counter())
+
+    # --- Signals ---
+
+    def begin(self, at: float):
+        """Recording started: a new utterance."""
+        self.text = ""
+        self.changed_at = at
+        self.paused_at = None
+        self.speculated = None  # text the agent was started on
+        self.speculated_at = None
+
+    def partial(self, text: str, at: float):
+        if normalize(text) != normalize(self.text):
+            self.text = text
+            self.changed_at = at
+
+    def pause(self, at: float):
+        """Silence started (RealtimeSTT's turn detection began)."""
+        self.paused_at = at
+
+    def resume(self, at: float) -> bool:
+        """
+        Speech resumed within the utterance. The pause feeds the speaker's pace; returns True if a
+        speculative start was outstanding, which is now a false start to withdraw.
+        """
+        if self.paused_at is not None:
+            self.pace.add(at - self.paused_at)
+        self.paused_at = None
+        if self.speculated is None:
+            return False
+        self.false_starts += 1
+        self.speculated = None
+        return True
+
+    # --- Decisions ---
+
+    def ready_at(self):
+        """When the current partial may be acted on (a perf_counter time), or None while that cannot happen."""
+        if self.paused_at is None or self.speculated is not None or len(normalize(self.text).split()) < self.min_words:
+            return None
+        pause = self.fixed_pause if self.fixed_pause is not None else self.pace.speculation_pause()
+        return max(self.changed_at + self.stable, self.paused_at + pause)
+
+    def check(self, at: float):
+        """Returns the partial to start the agent on, once, if it is due by `at`."""
+        ready = self.ready_at()
+        if ready is None or at < ready:
+            return None
+        self.speculations += 1
+        self.speculated = self.text
+        self.speculated_at = at
+        return self.text
+
+    def finish(self, final: str, at: float):
+        """
+        The final transcript arrived. Returns "confirmed" if it matches the speculative start,
+        "restart" if it differs materially, or None if nothing was started early. The utterance is
+        over either way, so nothing of it can be speculated on again.
+        """
+        self.utterances += 1
+        speculated, speculated_at = self.speculated, self.speculated_at
+        self.begin(at)
+        if speculated is None:
+            return None
+        if same_command(speculated, final):
+            self.confirmed += 1
+            self.saved_ms.append((at - speculated_at) * 1000)
+            return "confirmed"
+        self.false_starts += 1
+        return "restart"
+
+    def report(self) -> str:
+        saved = sorted(self.saved_ms)
+        return (
+            f"Early endpointing: {self.speculations} speculative starts over {self.utterances} utterances, "
+            f"{self.confirmed} confirmed, {self.false_starts} false starts; saved p50 {percentile(saved, 50):.0f} ms; "
+            f"end-of-turn silence {self.pace.end_of_turn_silence():.2f}s."
+        )
+
+
+# --- Offline Harness ---
+
+def replay(endpointer: EarlyEndpointer, timeline: dict) -> dict:
+    """
+    Runs one recorded utterance through the endpointer: events are applied in order, and a speculative
+    start fires at the moment it becomes due, if that comes before the next event.
+    """
+    endpointer.begin(0.0)
+    outcome = {"speculated_at": None, "withdrawn": 0}
+
+    def fire_until(limit: float):
+        ready = endpointer.ready_at()
+        if ready is not None and ready <= limit and endpointer.check(ready) is not None:
+            outcome["speculated_at"] = ready
+
+    for event in timeline["events"]:
+        at, kind = event[0], event[1]
+        fire_until(at)
+        if kind == "partial":
+            endpointer.partial(event[2], at)
+        elif kind == "pause":
+            endpointer.pause(at)
+        elif kind == "resume" and endpointer.resume(at):
+            outcome["withdrawn"] += 1
+            outcome["speculated_at"] = None
+    fire_until(timeline["final_at"])
+    outcome["result"] = endpointer.finish(timeline["final"], timeline["final_at"])
+    return outcome
+
+
+def evaluate(timelines: list, stable_values=(STABLE_MS,), pause_values=(None,)) -> list:
+    """
+    Replays recorded utterances for each setting and reports the false-start rate (withdrawn or
+    contradicted starts per utterance) against the dead air saved by confirmed early starts.
+    A pause of None means the adaptive one.
+    """
+    results = []
+    for stable_ms in stable_values:
+        for pause in pause_values:
+            endpointer = EarlyEndpointer(stable_ms=stable_ms, speculate_pause=pause)
+            for timeline in timelines:
+                replay(endpointer, timeline)
+            saved = sorted(endpointer.saved_ms)
+            count = len(timelines) or 1
+            results.append({
+                "stable_ms": stable_ms,
+                "pause": "adaptive" if pause is None else pause,
+                "speculation_rate": endpointer.speculations / count,
+                "false_start_rate": endpointer.false_starts / count,
+                "confirmed_rate": endpointer.confirmed / count,
+                "saved_p50_ms": percentile(saved, 50),
+                "saved_mean_ms": sum(saved) / len(saved) if saved else 0.0,
+                "final_silence": endpointer.pace.end_of_turn_silence(),
+            })
+    return results
+
+
+def record_timelines(paths: list, output: str, realtime_model: str = "tiny.en"):
+    """
+    Feeds WAV recordings through RealtimeSTT (in real time, with realtime transcription on) and writes
+    each utterance's signals as a JSONL timeline for `evaluate`. Times are seconds from recording start.
+    """
+    from RealtimeSTT import AudioToTextRecorder
+    from wake_word import FRAME_SAMPLES, SAMPLE_RATE, wav_frames
+    events = []
+    origin = [time.perf_counter()]
+
+    def log(kind, *args):
+        events.append([time.perf_counter() - origin[0], kind, *args])
+
+    recorder = AudioToTextRecorder(
+        model="base.en", language="en", spinner=False, use_microphone=False,
+        enable_realtime_transcription=True, realtime_model_type=realtime_model, realtime_processing_pause=0.1,
+        on_recording_start=lambda: origin.__setitem__(0, time.perf_counter()),
+        on_realtime_transcription_update=lambda text: log("partial", text),
+        on_turn_detection_start=lambda: log("pause"),
+        on_turn_detection_stop=lambda: log("resume"),
+    )
+
+    def feed(path):
+        for frame in wav_frames(path, realtime=True):
+            recorder.feed_audio(frame)
+        silence = bytes(FRAME_SAMPLES * 2)
+        for _ in range(int(2 * SAMPLE_RATE / FRAME_SAMPLES)):
+            recorder.feed_audio(silence)
+            time.sleep(FRAME_SAMPLES / SAMPLE_RATE)
+
+    try:
+        with open(output, "w", encoding="utf-8") as out:
+            for path in paths:
+                events.clear()
+                feeder = threading.Thread(target=feed, args=(path,), daemon=True)
+                feeder.start()
+                final = recorder.text()
+                final_at = time.perf_counter() - origin[0]
+                feeder.join()
+                out.write(json.dumps({"wav": path, "events": sorted(events), "final": final, "final_at": final_at}) + "\n")
+                print(f"{os.path.basename(path)}: {final!r} ({len(events)} events)")
+    finally:
+        recorder.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Tune early endpointing offline on recorded utterances.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    record = subcommands.add_parser("record", help="transcribe WAV files and save their RealtimeSTT timelines")
+    record.add_argument("wavs", nargs="+")
+    record.add_argument("--output", default="endpointing_timelines.jsonl")
+    tune = subcommands.add_parser("evaluate", help="replay saved timelines for a grid of settings")
+    tune.add_argument("timelines")
+    tune.add_argument("--stable-ms", default="100,200,300,400")
+    tune.add_argument("--pauses", default="adaptive,0.15,0.25,0.35", help="seconds, or 'adaptive'")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_timelines(args.wavs, args.output)
+    else:
+        with open(args.timelines, encoding="utf-8") as timeline_file:
+            timelines = [json.loads(line) for line in timeline_file if line.strip()]
+        rows = evaluate(
+            timelines,
+            [float(value) for value in args.stable_ms.split(",")],
+            [None if value == "adaptive" else float(value) for value in args.pauses.split(",")],
+        )
+        print(f"{len(timelines)} utterances")
+        for row in rows:
+            pause = row["pause"] if row["pause"] == "adaptive" else f"{row['pause']:.2f}s"
+            print(
+                f"stable {row['stable_ms']:4.0f} ms, pause {pause:>8}: per utterance {row['speculation_rate']:.2f} early starts, "
+                f"{row['false_start_rate']:.2f} false starts, {row['confirmed_rate']:.2f} confirmed; "
+                f"saved p50 {row['saved_p50_ms']:.0f} ms (mean {row['saved_mean_ms']:.0f} ms)"
+            )
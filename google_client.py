@@ -0,0 +1,154 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+# --- Google API Call Limits ---
+# Maximum number of Google API requests in flight at once across all tools.
+GOOGLE_MAX_CONCURRENCY = 4
+# Per-request timeout (seconds), applied both to the socket and to the awaiting coroutine.
+GOOGLE_CALL_TIMEOUT = 15.0
+# Credentials are refreshed in the background this long before they expire.
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_semaphore = None
+# httplib2.Http objects are not thread-safe, so each worker thread gets its own transport.
+_thread_local = threading.local()
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GOOGLE_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _thread_http(credentials, timeout):
+    """Returns this worker thread's authorized transport, rebuilt when the credentials object changes."""
+    cached = getattr(_thread_local, "http", None)
+    if cached is None or cached[0] is not credentials or cached[1] != timeout:
+        cached = (credentials, timeout, AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout)))
+        _thread_local.http = cached
+    return cached[2]
+
+
+def _execute_in_thread(request, timeout, credentials):
+    if credentials is None:
+        credentials = getattr(getattr(request, "http", None), "credentials", None)
+    if credentials is None:
+        return request.execute()
+    return request.execute(http=_thread_http(credentials, timeout))
+
+
+async def execute(request, timeout: float = GOOGLE_CALL_TIMEOUT, credentials=None):
+    """
+    Runs a googleapiclient request off the event loop.
+    Calls are limited to GOOGLE_MAX_CONCURRENCY at a time and fail with TimeoutError after `timeout` seconds.
+    Batch requests carry no transport of their own, so pass their `credentials` explicitly.
+    """
+    semaphore = _get_semaphore()
+    await semaphore.acquire()
+    try:
+        worker = asyncio.ensure_future(asyncio.to_thread(_execute_in_thread, request, timeout, credentials))
+    except BaseException:
+        semaphore.release()
+        raise
+    # A thread cannot be cancelled, so a timed-out or cancelled call keeps its slot until the thread returns.
+    worker.add_done_callback(lambda task: _release_after_worker(semaphore, task))
+    try:
+        return await asyncio.wait_for(asyncio.shield(worker), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"Google API call timed out after {timeout:g} seconds.") from None
+
+
+def _release_after_worker(semaphore, task):
+    semaphore.release()
+    # Nobody awaits an abandoned call, so retrieve its error to keep asyncio from logging it.
+    if not task.cancelled():
+        task.exception()
+
+
+# --- Credential Manager ---
+
+class CredentialManager:
+    """
+    Keeps Google OAuth credentials in memory for the whole process.
+    Loading and refreshing run in a worker thread, concurrent callers share a single
+    in-flight load/refresh, and a background task refreshes shortly before expiry.
+    """
+
+    def __init__(self, load, save, refresh_margin: timedelta = REFRESH_MARGIN):
+        # load() -> credentials and save(credentials) are blocking callables (token file, OAuth flow).
+        self._load = load
+        self._save = save
+        self.refresh_margin = refresh_margin
+        self._credentials = None
+        self._inflight = None
+        self._refresher = None
+
+    async def get(self):
+        """Returns valid credentials, loading or refreshing them only when necessary."""
+        credentials = self._credentials
+        if credentials is None or not credentials.valid:
+            credentials = await self._single_flight(self._load_or_refresh)
+        self._schedule_refresh()
+        return credentials
+
+    async def _single_flight(self, func):
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(asyncio.to_thread(func))
+        # Shielded so one cancelled caller does not abort the refresh everybody else is waiting on.
+        self._credentials = await asyncio.shield(self._inflight)
+        return self._credentials
+
+    def _load_or_refresh(self):
+        credentials = self._credentials
+        if credentials is not None and credentials.refresh_token:
+            credentials.refresh(Request())
+            self._save(credentials)
+            return credentials
+        return self._load()
+
+    def _schedule_refresh(self):
+        credentials = self._credentials
+        if credentials is None or credentials.expiry is None or not credentials.refresh_token:
+            return
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_before_expiry())
+
+    async def _refresh_before_expiry(self):
+        while self._credentials is not None and self._credentials.expiry is not None:
+            # google-auth keeps expiry as a naive UTC datetime.
+            expiry = self._credentials.expiry.replace(tzinfo=timezone.utc)
+            wait = (expiry - self.refresh_margin - datetime.now(timezone.utc)).total_seconds()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await self._single_flight(self._load_or_refresh)
+                print("Google credentials refreshed in the background.")
+            except Exception as e:
+                print(f"Background refresh of Google credentials failed: {e}")
+                return
+
+
+# --- Service Object Cache ---
+
+# (api, version) -> (credentials, service); the discovery document is parsed once per API.
+_services = {}
+
+
+async def get_service(api: str, version: str, credentials):
+    """
+    Returns a cached Google API service object, building it (off the event loop) on first use.
+    Refreshed credentials are updated in place, so a service is only rebuilt if the credentials object changes.
+    """
+    cached = _services.get((api, version))
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+    service = await asyncio.to_thread(build, api, version, credentials=credentials, cache_discovery=False)
+    _services[(api, version)] = (credentials, service)
+    return service
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import aiohttp
+
+# --- Connection Pool Settings ---
+# Total simultaneous connections, and per host, across every tool sharing the pool.
+HTTP_POOL_LIMIT = 64
+HTTP_POOL_LIMIT_PER_HOST = 8
+# Idle keep-alive connections are kept open this long (seconds) for the next call to reuse.
+HTTP_KEEPALIVE_TIMEOUT = 60.0
+# Resolved addresses are cached this long (seconds).
+HTTP_DNS_CACHE_TTL = 300
+
+_connector = None
+
+
+def get_connector() -> aiohttp.TCPConnector:
+    """Returns the process-wide keep-alive connector, creating it on first use (inside the event loop)."""
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+    return _connector
+
+
+def new_session(**kwargs) -> aiohttp.ClientSession:
+    """
+    Creates a ClientSession on the shared connector, so its connections (and TLS handshakes)
+    are reused by every other client. Closing the session leaves the pool open.
+    """
+    return aiohttp.ClientSession(connector=get_connector(), connector_owner=False, **kwargs)
+
+
+async def close():
+    """Closes every pooled connection. Call it after the sessions using the pool are closed."""
+    global _connector
+    if _connector is not None and not _connector.closed:
+        await _connector.close()
+    _connector = None
+
+
+# --- Repeated-Call Latency Benchmark ---
+
+async def benchmark(url: str = None, calls: int = 50):
+    """
+    Times `calls` sequential GETs to `url` with a new session per call (the old per-call
+    client pattern) versus a session on the shared pool. Without a URL a local server is used;
+    pass an https URL to include the TLS handshakes the pool saves in practice.
+    """
+    from aiohttp import web
+
+    runner = None
+    if url is None:
+        app = web.Application()
+        app.router.add_get("/", lambda request: web.json_response({"ok": True}))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+    timings = {}
+    started = time.perf_counter()
+    for _ in range(calls):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                await response.read()
+    timings["new_session_ms"] = (time.perf_counter() - started) / calls * 1000
+
+    session = new_session()
+    started = time.perf_counter()
+    for _ in range(calls):
+        async with session.get(url) as response:
+            await response.read()
+    timings["pooled_ms"] = (time.perf_counter() - started) / calls * 1000
+    await session.close()
+    await close()
+
+    if runner is not None:
+        await runner.cleanup()
+    return timings
+
+
+if __name__ == "__main__":
+    import sys
+    for name, value in asyncio.run(benchmark(sys.argv[1] if len(sys.argv) > 1 else None)).items():
+        print(f"{name}: {value:.2f}")
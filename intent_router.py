@@ -0,0 +1,337 @@
+import re
+import json
+import time
+from datetime import datetime
+
+# --- Router Settings ---
+# Slots longer than this are more likely a misparse than a place name.
+MAX_SLOT_WORDS = 6
+# A slot containing any of these words means the utterance asks for more than one thing,
+# or for something the tool cannot answer (a forecast rather than current conditions).
+REJECT_SLOT_WORDS = {
+    "and", "then", "also", "or", "but", "if", "later", "next", "forecast", "it", "me", "my", "should",
+    # Time words: "weather in London today" must not become get_weather("London today").
+    "today", "tonight", "tomorrow", "yesterday", "morning", "afternoon", "evening", "weekend", "week",
+    "currently", "this", "these", "those", "days", "now",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    # The lazy slot patterns run to the end of the utterance, so a trailing qualifier lands in the
+    # slot ("Paris in Celsius", "London like"): a preposition or unit means it is not a bare place.
+    "in", "on", "at", "by", "for", "like", "with", "during", "around", "before", "after", "via",
+    "celsius", "fahrenheit", "centigrade", "degrees", "miles", "kilometres", "kilometers", "km",
+    # Places only the agent can resolve (from context or the current location).
+    "here", "there", "home", "work", "office",
+}
+# Politeness and filler stripped before matching; "Alfred, could you please tell me ..." -> "...".
+_FILLER_RE = re.compile(
+    r"^(?:(?:hey|ok|okay|so|alfred|please|kindly|quickly|now|"
+    r"(?:could|can|would|will) you(?: please)?(?: tell me| let me know| check)?|tell me|let me know|i'd like to know|"
+    r"do you know)[\s,]+)+",
+    re.IGNORECASE,
+)
+_TRAILING_RE = re.compile(r"(?:[\s,]+(?:please|alfred|sir|right now|now|thanks|thank you))+$|[\s?.!]+$", re.IGNORECASE)
+
+_PLACE = r"(?P<{}>[a-z][\w .,'-]*?)"
+_MODE = r"(?: (?:by|on|via) (?P<mode>car|foot|bike|bicycle|transit|train|bus|subway))?"
+
+# (intent, tool name, anchored patterns). Patterns must match the whole cleaned utterance.
+INTENTS = [
+    ("weather", "get_weather", [
+        r"(?:what(?:'s| is) )?(?:the )?(?:current )?(?:weather|temperature)(?: like)? (?:in|for|at) " + _PLACE.format("location"),
+        r"how(?:'s| is) the weather (?:in|at) " + _PLACE.format("location"),
+        r"(?:is it|how) (?:hot|cold|warm|raining) (?:in|at) " + _PLACE.format("location"),
+    ]),
+    ("location", "get_current_location", [
+        r"where am i",
+        r"what(?:'s| is) my (?:current )?(?:location|address|position)",
+        r"what (?:city|town|place) am i in",
+    ]),
+    ("travel", "get_travel_duration", [
+        r"how long (?:does it|will it|would it) take (?:me )?to (?:get|go|drive|walk|cycle|bike|travel) from "
+        + _PLACE.format("origin") + " to " + _PLACE.format("destination") + _MODE,
+        r"how long is the (?:drive|walk|ride|trip|journey|commute) from "
+        + _PLACE.format("origin") + " to " + _PLACE.format("destination") + _MODE,
+        r"how far is it from " + _PLACE.format("origin") + " to " + _PLACE.format("destination") + _MODE,
+    ]),
+    ("calendar", "list_calendar_events", [
+        r"what(?:'s| is) (?:on )?my (?:calendar|schedule|agenda)",
+        r"what(?:'s| is) (?:coming up|next) (?:on|in) my (?:calendar|schedule|agenda)",
+        r"what do i have (?:coming up|scheduled|on my calendar)",
+        r"(?:list|show|read)(?: me)? my (?:upcoming |next )?(?:events|appointments|meetings|engagements)",
+        r"(?:do i have )?any (?:upcoming )?(?:events|appointments|meetings)(?: coming up)?",
+    ]),
+    ("email", "list_unread_messages", [
+        r"(?:do i have|are there|have i got) (?:any )?(?:new |unread )+(?:e-?mails?|mail|messages)",
+        r"check my (?:e-?mails?|inbox|mail)",
+        r"(?:any )?(?:new|unread) (?:e-?mails?|mail)",
+        r"(?:read|list|show)(?: me)? my (?:new |unread )+(?:e-?mails?|mail|messages)",
+    ]),
+]
+_COMPILED = [
+    (intent, tool_name, [re.compile(pattern + r"$", re.IGNORECASE) for pattern in patterns])
+    for intent, tool_name, patterns in INTENTS
+]
+_TRAVEL_MODES = {
+    None: "driving", "car": "driving", "foot": "walking", "bike": "bicycling", "bicycle": "bicycling",
+    "transit": "transit", "train": "transit", "bus": "transit", "subway": "transit",
+}
+_VERB_MODES = {"drive": "driving", "walk": "walking", "cycle": "bicycling", "bike": "bicycling"}
+# Unread mail is listed up to this many messages; a full list means there may be more.
+EMAIL_MAX_RESULTS = 5
+
+
+def clean_utterance(text: str) -> str:
+    text = " ".join(text.split())
+    text = _FILLER_RE.sub("", text)
+    return _TRAILING_RE.sub("", text).strip()
+
+
+def _slot_ok(value: str) -> bool:
+    words = value.lower().replace(",", " ").split()
+    return 0 < len(words) <= MAX_SLOT_WORDS and not REJECT_SLOT_WORDS.intersection(words)
+
+
+def match(text: str):
+    """
+    Returns (intent, tool name, tool args) when the utterance is a plain, single request for
+    one read-only tool; None for anything else, which then goes to the full agent.
+    """
+    cleaned = clean_utterance(text)
+    for intent, tool_name, patterns in _COMPILED:
+        for pattern in patterns:
+            found = pattern.match(cleaned)
+            if found is None:
+                continue
+            slots = {name: value for name, value in found.groupdict().items() if value is not None}
+            mode = slots.pop("mode", None)
+            if not all(_slot_ok(value) for value in slots.values()):
+                return None
+            if intent == "travel":
+                verb = re.search(r"\bto (drive|walk|cycle|bike)\b", cleaned, re.IGNORECASE)
+                slots["mode"] = _TRAVEL_MODES.get(mode.lower() if mode else None, "driving")
+                if verb and not mode:
+                    slots["mode"] = _VERB_MODES[verb.group(1).lower()]
+            elif intent == "email":
+                slots["max_results"] = EMAIL_MAX_RESULTS
+            return intent, tool_name, slots
+    return None
+
+
+# --- Reply Templates ---
+# Each returns the spoken reply, or None when the tool result is not the expected shape
+# (an error, an empty answer) so the full agent can handle it instead.
+
+def _reply_weather(result):
+    return f"Certainly, Sir. {result}" if str(result).startswith("The current weather") else None
+
+
+def _reply_location(result):
+    result = str(result)
+    if not result or result.lower().startswith(("error", "an unexpected", "could not")):
+        return None
+    return f"By my reckoning, Sir, you are at {result}."
+
+
+def _reply_travel(result):
+    return f"Right away, Sir. {result}" if str(result).startswith("Estimated travel duration") else None
+
+
+def _spoken_time(value: str) -> str:
+    try:
+        if "T" not in value:
+            return datetime.strptime(value, "%Y-%m-%d").strftime("%A %d %B, all day")
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return moment.strftime("%A %d %B at %I:%M %p").replace(" 0", " ")
+    except ValueError:
+        return value
+
+
+_EVENT_LINE_RE = re.compile(r"^- (?P<summary>.*) \(Starts: (?P<start>[^)]*)\)$")
+
+
+def _reply_calendar(result):
+    result = str(result)
+    if result == "No upcoming events found.":
+        return "Your calendar is entirely clear, Sir."
+    events = [_EVENT_LINE_RE.match(line) for line in result.splitlines()]
+    if not events or not all(events):
+        return None
+    spoken = "; ".join(f"{event['summary']}, {_spoken_time(event['start'])}" for event in events)
+    return f"Your upcoming engagements, Sir: {spoken}."
+
+
+_EMAIL_LINE_RE = re.compile(r"^From: (?P<sender>.*?) - Subject: (?P<subject>.*)$")
+
+
+def _sender_name(sender: str) -> str:
+    """'"Jane Doe" <jane@example.com>' is read out as just 'Jane Doe'."""
+    name = re.sub(r"\s*<[^>]*>", "", sender).strip().strip('"')
+    return name or sender.strip("<>")
+
+
+def _reply_email(result):
+    lines = result if isinstance(result, list) else [result]
+    if lines == ["No unread messages found."]:
+        return "No unread mail, Sir."
+    messages = [_EMAIL_LINE_RE.match(str(line)) for line in lines]
+    if not messages or not all(messages):
+        return None
+    spoken = "; ".join(f"from {_sender_name(message['sender'])}, about {message['subject']}" for message in messages)
+    count = len(messages)
+    if count >= EMAIL_MAX_RESULTS:
+        # The list was cut at the limit, so this is not the unread total
+        return f"Your latest {count} unread messages, Sir: {spoken}."
+    return f"You have {count} unread message{'s' if count != 1 else ''}, Sir: {spoken}."
+
+
+REPLIES = {
+    "weather": _reply_weather,
+    "location": _reply_location,
+    "travel": _reply_travel,
+    "calendar": _reply_calendar,
+    "email": _reply_email,
+}
+
+
+class IntentRouter:
+    """
+    Answers simple, high-confidence requests without the LLM: a local pattern match picks the tool,
+    the tool runs directly, and a template phrases the reply. Anything else returns None.
+    """
+
+    def __init__(self, tool_map: dict, invoke):
+        # invoke(tool, args) is awaited to run a tool (e.g. ToolCache.ainvoke).
+        self.tool_map = tool_map
+        self.invoke = invoke
+
+    async def handle(self, text: str):
+        """Returns the spoken reply, or None if the utterance should go to the full agent."""
+        found = match(text)
+        if found is None:
+            return None
+        intent, tool_name, args = found
+        tool = self.tool_map.get(tool_name)
+        if tool is None:
+            return None
+        print(f"Fast path: '{intent}' -> calling tool '{tool_name}' with args: {args}")
+        try:
+            result = await self.invoke(tool, args)
+        except Exception as e:
+            print(f"Fast path tool '{tool_name}' failed ({e}); handing over to the agent.")
+            return None
+        return REPLIES[intent](result)
+
+
+# --- Accuracy / Latency Evaluation ---
+
+# Recorded utterances (as transcribed after the wake word) with the intent that should fire;
+# None means the full agent must handle it.
+EVAL_UTTERANCES = [
+    ("What's the weather in London?", "weather"),
+    ("what is the weather like in Vinings, GA", "weather"),
+    ("How's the weather in Paris", "weather"),
+    ("Could you tell me the temperature in New York, please?", "weather"),
+    ("weather in San Francisco", "weather"),
+    ("Is it raining in Seattle?", "weather"),
+    ("What's the weather in London tomorrow?", None),
+    ("What's the weather in London today?", None),
+    ("weather in Paris this afternoon", None),
+    ("Is it cold in Boston tonight?", None),
+    ("How's the weather in Rome this morning", None),
+    ("What is the temperature in Madrid currently?", None),
+    ("weather in Paris in Celsius?", None),
+    ("weather in New York on Friday?", None),
+    ("What's the weather like in London these days?", None),
+    ("Weather in London like?", None),
+    ("What's the temperature in Berlin in Fahrenheit", None),
+    ("How's the weather in Tokyo at the moment", None),
+    ("Is it raining in Dublin by the coast?", None),
+    ("What's the weather in London and do I have any meetings?", None),
+    ("Should I bring an umbrella today?", None),
+    ("What's the weather forecast for the weekend in Rome?", None),
+    ("Where am I?", "location"),
+    ("What's my current location?", "location"),
+    ("what city am I in", "location"),
+    ("Where am I supposed to be at noon?", None),
+    ("How long does it take to get from Atlanta to Savannah?", "travel"),
+    ("How long will it take to walk from Piccadilly Circus to King's Cross?", "travel"),
+    ("How long does it take to get from home to work?", None),
+    ("how long is the drive from Boston to New York", "travel"),
+    ("How long would it take to get from Midtown to the airport by train?", "travel"),
+    ("How long does it take to get from here to the airport if I leave at five?", None),
+    ("How long is the flight from London to Tokyo and what does it cost?", None),
+    ("How long does it take to get from Atlanta to Savannah tomorrow morning?", None),
+    ("How long is the drive from Boston to New York this evening", None),
+    ("How far is it from Leeds to York in miles?", None),
+    ("How long does it take to get from Oxford to London on Sunday?", None),
+    ("How long is the walk from Hyde Park to Soho with the dog", None),
+    ("What's on my calendar?", "calendar"),
+    ("What do I have coming up?", "calendar"),
+    ("Show me my upcoming meetings", "calendar"),
+    ("Any meetings coming up?", "calendar"),
+    ("What's on my calendar tomorrow?", None),
+    ("Move my three o'clock meeting to four", None),
+    ("Schedule a meeting with Bruce on Friday at ten", None),
+    ("Do I have any new emails?", "email"),
+    ("check my inbox", "email"),
+    ("Any unread mail?", "email"),
+    ("Read me my unread messages", "email"),
+    ("Send an email to Lucius saying I'll be late", None),
+    ("Do I have any emails from Bruce?", None),
+    ("Search the web for the latest news on fusion energy", None),
+    ("Tell me a joke", None),
+    ("What is the capital of Australia?", None),
+    ("Remind me what we discussed earlier", None),
+    ("How are you today, Alfred?", None),
+    ("What's the weather", None),
+    ("Open the BBC website and read me the headlines", None),
+]
+
+
+def evaluate(path: str = None, repeats: int = 200):
+    """
+    Scores the matcher on the recorded set (or a JSONL file of {"text", "intent"} lines):
+    overall accuracy, precision of routed utterances (a wrong route is worse than a fallback),
+    recall of routable ones, and matching latency.
+    """
+    if path:
+        with open(path, encoding="utf-8") as samples:
+            rows = [json.loads(line) for line in samples if line.strip()]
+        dataset = [(row["text"], row.get("intent")) for row in rows]
+    else:
+        dataset = EVAL_UTTERANCES
+    correct = routed = routed_correct = routable = routable_found = 0
+    failures = []
+    for text, expected in dataset:
+        found = match(text)
+        predicted = found[0] if found else None
+        correct += predicted == expected
+        routed += predicted is not None
+        routed_correct += predicted is not None and predicted == expected
+        routable += expected is not None
+        routable_found += expected is not None and predicted == expected
+        if predicted != expected:
+            failures.append((text, expected, predicted))
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for text, _ in dataset:
+            match(text)
+    per_utterance_us = (time.perf_counter() - started) / (repeats * len(dataset)) * 1e6
+
+    return {
+        "utterances": len(dataset),
+        "accuracy": correct / len(dataset),
+        "routed_precision": routed_correct / routed if routed else 1.0,
+        "routable_recall": routable_found / routable if routable else 1.0,
+        "match_latency_us": per_utterance_us,
+        "failures": failures,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    report = evaluate(sys.argv[1] if len(sys.argv) > 1 else None)
+    for text, expected, predicted in report.pop("failures"):
+        print(f"MISMATCH expected={expected} predicted={predicted}: {text}")
+    for name, value in report.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
@@ -1,11 +1,10 @@
 import os
 import pickle
 import base64
+import time
 import asyncio
+import aiohttp
 from datetime import datetime
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
-from brave import Brave
 import os
 from datetime import datetime, timedelta
 import pytz
@@ -14,12 +13,14 @@ import pytz
 from langchain_core.tools import tool
 
 # --- Google Service Imports ---
-import googlemaps
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from google_client import CredentialManager, execute, get_service
+from browser_pool import BrowserPool
+from page_fetcher import PageFetcher
+import http_pool
+from location_service import LocationService, MapsApiError
 
 # --- Other Library Imports ---
 import python_weather
@@ -30,19 +31,30 @@ from dotenv import load_dotenv
 load_dotenv()
 MAPS_API_KEY = os.getenv("MAPS_API_KEY")
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
-brave_client = Brave(BRAVE_API_KEY)
+BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
+# Only the top results are shown to the LLM, so only those are requested
+BRAVE_RESULT_COUNT = 5
+
+# Long-lived API clients on the shared keep-alive pool, opened by startup_http_clients
+api_session = None
+weather_client = None
 
-browser_page = None
 playwright_context = None
 browser_instance = None
-browser_page= None
-
-
-# --- Google Maps Client Initialization ---
-# Initialize the client once to be reused by the tool
-gmaps_client = None
+browser_pool = None
+# Plain HTTP fetches work without the browser, so the fetcher exists from the start
+page_fetcher = PageFetcher()
+# Recently read pages (url -> (load time, extracted text)), so extract_page_text can follow navigate_to_url without reloading
+PAGE_CACHE_SIZE = 8
+PAGE_CACHE_TTL = 120
+recent_pages = {}
+
+
+# --- Google Maps Service Initialization ---
+# Maps calls share the keep-alive API session; geocodes are cached on disk between runs
+location_service = None
 if MAPS_API_KEY:
-    gmaps_client = googlemaps.Client(key=MAPS_API_KEY)
+    location_service = LocationService(MAPS_API_KEY, lambda: _get_api_session())
 else:
     print("Warning: MAPS_API_KEY not found. The 'get_travel_duration' tool will not work.")
 
@@ -53,12 +65,12 @@ GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/calendar'
 ]
 
-# --- Helper Function (Not a Tool) ---
-# This function handles the OAuth2 flow for Gmail.
-async def google_authenticate():
+# --- Helper Functions (Not Tools) ---
+# These handle the OAuth2 flow for Gmail and Calendar.
+def _load_google_credentials():
     """
-    Authenticates with Google APIs using OAuth2.
-    Handles token creation, storage, and refresh for all required scopes.
+    Loads Google credentials from token.pickle, refreshing them or running the OAuth2 flow if needed.
+    Blocking; called from a worker thread by the credential manager.
     """
     creds = None
     if os.path.exists('token.pickle'):
@@ -75,29 +87,91 @@ async def google_authenticate():
                     "Please download it from your Google Cloud Console."
                 )
             # Use the updated GOOGLE_SCOPES list here
+            from google_auth_oauthlib.flow import InstalledAppFlow
             flow = InstalledAppFlow.from_client_secrets_file('credentials.json', GOOGLE_SCOPES)
             creds = flow.run_local_server(port=0)
 
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    
-    # This function now returns the credentials, not a specific service build
+        _save_google_credentials(creds)
+
     return creds
 
+
+def _save_google_credentials(creds):
+    with open('token.pickle', 'wb') as token:
+        pickle.dump(creds, token)
+
+
+google_credentials = CredentialManager(_load_google_credentials, _save_google_credentials)
+
+
+async def google_authenticate():
+    """
+    Authenticates with Google APIs using OAuth2.
+    Credentials are kept in memory and refreshed in the background, so only the first call touches disk.
+    """
+    return await google_credentials.get()
+
+
+# --- Shared API Clients ---
+
+async def startup_http_clients():
+    """Opens the long-lived weather and search clients on the shared connection pool."""
+    _get_weather_client()
+    _get_api_session()
+
+
+async def shutdown_http_clients():
+    """Closes the API clients and then the connection pool itself."""
+    global weather_client, api_session
+    if location_service is not None:
+        await location_service.close()
+    if weather_client is not None:
+        await weather_client.close()
+        weather_client = None
+    if api_session is not None:
+        await api_session.close()
+        api_session = None
+    await http_pool.close()
+
+
+def _get_weather_client():
+    global weather_client
+    if weather_client is None or api_session is None or api_session.closed:
+        # python_weather leaves a session it did not create open, so the session is closed separately
+        weather_client = python_weather.Client(unit=python_weather.IMPERIAL, session=_get_api_session())
+    return weather_client
+
+
+def _get_api_session():
+    global api_session
+    if api_session is None or api_session.closed:
+        api_session = http_pool.new_session(timeout=aiohttp.ClientTimeout(total=15))
+    return api_session
+
+
 async def startup_browser():
-    """Initializes the playwright browser instance and page."""
-    global playwright_context, browser_instance, browser_page
+    """Initializes the playwright browser instance and its page pool."""
+    global playwright_context, browser_instance, browser_pool
     if browser_instance is None:
         print("Starting up browser...")
+        # Imported on first use to keep start-up light; the browser launches in the background anyway
+        from playwright.async_api import async_playwright
         playwright_context = await async_playwright().start()
         browser_instance = await playwright_context.chromium.launch()
-        browser_page = await browser_instance.new_page()
+        browser_pool = BrowserPool(browser_instance)
+        page_fetcher.browser_pool = browser_pool
         print("Browser started successfully.")
 
 async def shutdown_browser():
     """Closes the playwright browser instance and context."""
-    global playwright_context, browser_instance
-    
+    global playwright_context, browser_instance, browser_pool
+
+    await page_fetcher.close()
+    page_fetcher.browser_pool = None
+    if browser_pool:
+        await browser_pool.close()
+        browser_pool = None
+
     # The correct method is .is_connected()
     if browser_instance and browser_instance.is_connected():
         print("Shutting down browser...")
@@ -114,33 +188,17 @@ async def shutdown_browser():
 
 
 @tool
-def get_current_location() -> str:
+async def get_current_location() -> str:
     """
     Returns the user's current physical location based on their IP address.
     This tool should be used when the user asks 'where am I?' or for their current city.
     """
-    if not gmaps_client:
+    if not location_service:
         return "Error: The Google Maps client is not configured. Please check the API key."
     try:
-        # Get the user's current location using the Geolocation API
-        geolocation_result = gmaps_client.geolocate()
-        
-        if not geolocation_result or 'location' not in geolocation_result:
-            return "Could not determine current location."
-
-        lat = geolocation_result['location']['lat']
-        lng = geolocation_result['location']['lng']
-
-        # Perform a reverse geocode to get the address
-        reverse_geocode_result = gmaps_client.reverse_geocode((lat, lng))
-
-        if not reverse_geocode_result:
-            return f"Could not find address for location: ({lat}, {lng})."
-
-        # Return the first (most accurate) address
-        return reverse_geocode_result[0]['formatted_address']
-
-    except googlemaps.exceptions.ApiError as api_err:
+        # The last known location is reused for a few minutes; reverse geocodes are cached by rounded coordinates
+        return await location_service.current_location()
+    except MapsApiError as api_err:
         print(f"Google Maps API Error: {api_err}")
         return f"Error contacting Google Maps: {api_err}"
     except Exception as e:
@@ -156,41 +214,38 @@ async def get_weather(location: str) -> str:
     Gets the current weather conditions (temperature, precipitation, description)
     for a specified city and state/country (e.g., 'Vinings, GA', 'London, UK').
     """
-    async with python_weather.Client(unit=python_weather.IMPERIAL) as client:
-        try:
-            weather = await client.get(location)
-            response = (
-                f"The current weather in {location} is {weather.temperature}°F "
-                f"with {weather.description}. "
-                f"Precipitation is {weather.precipitation}."
-            )
-            print(f"Weather tool generated response: {response}")
-            return response
-        except Exception as e:
-            print(f"Error fetching weather for {location}: {e}")
-            return f"Sorry, I could not fetch the weather for {location}."
+    try:
+        weather = await _get_weather_client().get(location)
+        response = (
+            f"The current weather in {location} is {weather.temperature}°F "
+            f"with {weather.description}. "
+            f"Precipitation is {weather.precipitation}."
+        )
+        print(f"Weather tool generated response: {response}")
+        return response
+    except Exception as e:
+        print(f"Error fetching weather for {location}: {e}")
+        return f"Sorry, I could not fetch the weather for {location}."
 
 
 # --- Travel Tool ---
 
 @tool
-def get_travel_duration(origin: str, destination: str, mode: str = "driving") -> str:
+async def get_travel_duration(origin: str, destination: str, mode: str = "driving") -> str:
     """
     Calculates the estimated travel duration between a specified origin and destination
     using Google Maps. Considers current traffic for driving mode.
     The 'mode' can be 'driving', 'walking', 'bicycling', or 'transit'.
     """
-    if not gmaps_client:
+    if not location_service:
         return "Error: The Google Maps client is not configured. Please check the API key."
     try:
-        now = datetime.now()
         print(f"Requesting directions: From='{origin}', To='{destination}', Mode='{mode}'")
-        directions_result = gmaps_client.directions(origin, destination, mode=mode, departure_time=now)
+        leg = await location_service.directions(origin, destination, mode=mode)
 
-        if not directions_result:
+        if not leg:
             return f"Could not find a route from {origin} to {destination} via {mode}."
 
-        leg = directions_result[0]['legs'][0]
         result = f"Estimated travel duration from {origin} to {destination} by {mode}"
 
         if mode == "driving" and 'duration_in_traffic' in leg:
@@ -204,7 +259,7 @@ def get_travel_duration(origin: str, destination: str, mode: str = "driving") ->
 
         print(f"Travel duration tool generated response: {result}")
         return result
-    except googlemaps.exceptions.ApiError as api_err:
+    except MapsApiError as api_err:
         print(f"Google Maps API Error: {api_err}")
         return f"Error contacting Google Maps: {api_err}"
     except Exception as e:
@@ -212,8 +267,75 @@ def get_travel_duration(origin: str, destination: str, mode: str = "driving") ->
         return f"An unexpected error occurred: {e}"
 
 
+@tool
+async def get_travel_matrix(origins: list[str], destinations: list[str], mode: str = "driving") -> str:
+    """
+    Calculates travel durations and distances between several origins and/or destinations
+    in a single Google Maps request (e.g., comparing which of three restaurants is closest).
+    Use this instead of calling get_travel_duration repeatedly.
+    The 'mode' can be 'driving', 'walking', 'bicycling', or 'transit'.
+    """
+    if not location_service:
+        return "Error: The Google Maps client is not configured. Please check the API key."
+    try:
+        print(f"Requesting travel matrix: From={origins}, To={destinations}, Mode='{mode}'")
+        matrix = await location_service.travel_matrix(origins, destinations, mode=mode)
+        lines = []
+        for origin, row in zip(origins, matrix.get("rows", [])):
+            for destination, element in zip(destinations, row.get("elements", [])):
+                if element.get("status") != "OK":
+                    lines.append(f"{origin} -> {destination}: no route found.")
+                    continue
+                duration = element.get("duration_in_traffic") or element["duration"]
+                lines.append(f"{origin} -> {destination}: {duration['text']} ({element['distance']['text']}).")
+        result = f"Travel by {mode}:\n" + "\n".join(lines) if lines else "No travel information found."
+        print(f"Travel matrix tool generated response: {result}")
+        return result
+    except MapsApiError as api_err:
+        print(f"Google Maps API Error: {api_err}")
+        return f"Error contacting Google Maps: {api_err}"
+    except Exception as e:
+        print(f"An unexpected error occurred during travel matrix lookup: {e}")
+        return f"An unexpected error occurred: {e}"
+
+
 # --- Gmail Tools ---
 
+# Gmail accepts up to 100 calls per batch, but recommends staying at or below 50.
+GMAIL_BATCH_SIZE = 50
+# Largest page the messages.list endpoint returns.
+GMAIL_LIST_PAGE_SIZE = 500
+
+
+async def _fetch_message_headers(service, creds, message_ids: list[str]) -> dict[str, dict[str, str]]:
+    """
+    Fetches only the Subject and From headers of the given messages, using batched
+    metadata requests instead of one full-message round trip per id.
+    """
+    headers_by_id = {}
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            print(f"Could not fetch Gmail message {request_id}: {exception}")
+            return
+        headers = response.get('payload', {}).get('headers', [])
+        headers_by_id[request_id] = {header['name']: header['value'] for header in headers}
+
+    batches = []
+    for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=collect)
+        for message_id in message_ids[start:start + GMAIL_BATCH_SIZE]:
+            batch.add(
+                service.users().messages().get(
+                    userId='me', id=message_id, format='metadata', metadataHeaders=['Subject', 'From']
+                ),
+                request_id=message_id,
+            )
+        batches.append(execute(batch, credentials=creds))
+    await asyncio.gather(*batches)
+    return headers_by_id
+
+
 @tool
 async def list_unread_messages(max_results: int = 5) -> list[str]:
     """
@@ -222,20 +344,31 @@ async def list_unread_messages(max_results: int = 5) -> list[str]:
     """
     try:
         creds = await google_authenticate()
-        service = build('gmail', 'v1', credentials=creds)
-        # Call the Gmail API
-        results = service.users().messages().list(userId='me', labelIds=['INBOX', 'UNREAD'], q="is:unread", maxResults=max_results).execute()
-        messages = results.get('messages', [])
-
-        if not messages:
+        service = await get_service('gmail', 'v1', creds)
+        # Call the Gmail API, following pages until max_results ids are collected
+        message_ids = []
+        page_token = None
+        while len(message_ids) < max_results:
+            results = await execute(service.users().messages().list(
+                userId='me', labelIds=['INBOX', 'UNREAD'], q="is:unread",
+                maxResults=min(max_results - len(message_ids), GMAIL_LIST_PAGE_SIZE), pageToken=page_token
+            ))
+            message_ids.extend(message['id'] for message in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        if not message_ids:
             return ["No unread messages found."]
 
+        headers_by_id = await _fetch_message_headers(service, creds, message_ids[:max_results])
         response_lines = []
-        for message in messages:
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-            headers = msg['payload']['headers']
-            subject = next(header['value'] for header in headers if header['name'] == 'Subject')
-            sender = next(header['value'] for header in headers if header['name'] == 'From')
+        for message_id in message_ids[:max_results]:
+            headers = headers_by_id.get(message_id)
+            if headers is None:
+                continue
+            subject = headers.get('Subject', '(no subject)')
+            sender = headers.get('From', '(unknown sender)')
             response_lines.append(f"From: {sender} - Subject: {subject}")
 
         return response_lines
@@ -253,7 +386,7 @@ async def send_email(to: str, subject: str, body: str) -> str:
     """
     try:
         creds = await google_authenticate()
-        service = build('gmail', 'v1', credentials=creds)
+        service = await get_service('gmail', 'v1', creds)
         message = {
             'raw': base64.urlsafe_b64encode(
                 f"To: {to}\r\n"
@@ -261,7 +394,7 @@ async def send_email(to: str, subject: str, body: str) -> str:
                 f"{body}".encode('utf-8')
             ).decode('utf-8')
         }
-        sent_message = service.users().messages().send(userId='me', body=message).execute()
+        sent_message = await execute(service.users().messages().send(userId='me', body=message))
         return f"Email sent successfully to {to}. Message ID: {sent_message['id']}"
     except HttpError as error:
         return f"Failed to send email due to a Gmail API error: {error.reason}."
@@ -269,19 +402,25 @@ async def send_email(to: str, subject: str, body: str) -> str:
         return f"Failed to send email: {e}"
     
 @tool
-def brave_search(query: str) -> str:
+async def brave_search(query: str) -> str:
     """
     Performs a web search using the Brave Search API to get a list of results.
     Use this to find information, articles, or websites on a given topic.
     """
-    if not brave_client:
+    if not BRAVE_API_KEY:
         return "Error: Brave Search client is not configured."
     print(f"Searching the web for: '{query}'")
     try:
-        search_results = brave_client.search(q=query)
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip", "X-Subscription-Token": BRAVE_API_KEY}
+        params = {"q": query, "count": BRAVE_RESULT_COUNT}
+        async with _get_api_session().get(BRAVE_SEARCH_URL, headers=headers, params=params) as response:
+            response.raise_for_status()
+            # The brave package's pydantic models are slow to import, so they are loaded on first search
+            from brave.types import WebSearchApiResponse
+            search_results = WebSearchApiResponse.model_validate(await response.json())
         # Format the results for the LLM
         formatted_results = []
-        for i, result in enumerate(search_results.web.results[:5]): # Return top 5 results
+        for i, result in enumerate(search_results.web.results[:BRAVE_RESULT_COUNT]): # Return top 5 results
             formatted_results.append(
                 f"{i+1}. {result.title}\n"
                 f"   URL: {result.url}\n"
@@ -293,48 +432,51 @@ def brave_search(query: str) -> str:
 
 
 
+def _remember_page(url: str, text: str):
+    recent_pages.pop(url, None)
+    recent_pages[url] = (time.monotonic(), text)
+    while len(recent_pages) > PAGE_CACHE_SIZE:
+        recent_pages.pop(next(iter(recent_pages)))
+
+
 @tool
 async def navigate_to_url(url: str) -> str:
     """
-    Navigates the shared browser to a specified URL.
+    Opens a specified URL in the browser and reports the page title.
     Use this after finding a URL with the search tool.
     """
-    if browser_page is None:
-        return "Error: The browser is not running. Please start it first."
     print(f"Navigating to URL: {url}")
     try:
-        await browser_page.goto(url, wait_until="domcontentloaded")
-        return f"Successfully navigated to {url}. The page title is '{await browser_page.title()}'."
+        # The text is extracted right away (off the event loop), so extract_page_text is usually a cache hit
+        title, text = await page_fetcher.fetch_text(url)
+        _remember_page(url, text)
+        return f"Successfully navigated to {url}. The page title is '{title}'."
     except Exception as e:
         return f"Error navigating to {url}: {e}"
 
 
 @tool
-async def extract_page_text() -> str:
+async def extract_page_text(url: str = "") -> str:
     """
-    Extracts and returns the clean, visible text content from the current browser page.
-    Use this after navigating to a page to read its content.
+    Extracts and returns the clean, visible text content of a web page.
+    Pass the page's `url`; if omitted, the most recently opened page is used.
     """
-    if browser_page is None:
-        return "Error: The browser is not running."
-    print("Extracting text from current page...")
+    if not url:
+        if not recent_pages:
+            return "Error: No page has been opened yet. Provide a URL."
+        url = next(reversed(recent_pages))
+    print(f"Extracting text from {url}...")
     try:
-        html_content = await browser_page.content()
-        soup = BeautifulSoup(html_content, "html.parser")
-        
-        # Remove script and style elements
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-        
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        clean_text = "\n".join(chunk for chunk in chunks if chunk)
-        
-        # Truncate to avoid excessively long content
-        return clean_text[:8000]
+        loaded_at, text = recent_pages.get(url, (0, None))
+        if text is None or time.monotonic() - loaded_at > PAGE_CACHE_TTL:
+            # Static pages skip the browser; rendered ones load and extract on a single leased page
+            _, text = await page_fetcher.fetch_text(url)
+            _remember_page(url, text)
+        return text
     except Exception as e:
         return f"Error extracting text from page: {e}"
+
+
 @tool
 async def list_calendar_events(max_results: int = 10) -> str:
     """
@@ -343,16 +485,16 @@ async def list_calendar_events(max_results: int = 10) -> str:
     """
     try:
         creds = await google_authenticate()
-        service = build('calendar', 'v3', credentials=creds)
+        service = await get_service('calendar', 'v3', creds)
         
         now = datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
         print(f"Getting upcoming {max_results} events from Google Calendar...")
         
-        events_result = service.events().list(
+        events_result = await execute(service.events().list(
             calendarId='primary', timeMin=now,
             maxResults=max_results, singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
         
         events = events_result.get('items', [])
 
@@ -378,7 +520,7 @@ async def create_calendar_event(summary: str, start_time: str, end_time: str, lo
     """
     try:
         creds = await google_authenticate()
-        service = build('calendar', 'v3', credentials=creds)
+        service = await get_service('calendar', 'v3', creds)
 
         event = {
             'summary': summary,
@@ -395,7 +537,7 @@ async def create_calendar_event(summary: str, start_time: str, end_time: str, lo
         }
 
         print(f"Creating calendar event: {summary}")
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
+        created_event = await execute(service.events().insert(calendarId='primary', body=event))
         
         return f"Event created successfully: {created_event.get('htmlLink')}"
     except Exception as e:
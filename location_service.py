@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import asyncio
+
+# --- Maps Endpoints ---
+GEOLOCATE_URL = "https://www.googleapis.com/geolocation/v1/geolocate"
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# --- Cache Settings ---
+# Geocodes (place string -> place id and address, rounded coordinates -> address) persist across runs.
+GEOCODE_CACHE_PATH = os.getenv("ALFRED_GEOCODE_CACHE", "alfred_geocode_cache.json")
+# Places rarely move; cached geocodes are trusted this long (seconds).
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+GEOCODE_CACHE_SIZE = 2000
+# Coordinates are rounded to this many decimals (~100 m) for reverse-geocode keys.
+COORDINATE_PRECISION = 3
+# The IP-based current location is reused until it is this old (seconds).
+LOCATION_MAX_AGE = 600
+# Distance Matrix limits per request.
+MATRIX_MAX_PLACES = 25
+MATRIX_MAX_ELEMENTS = 100
+
+
+class MapsApiError(Exception):
+    """A Maps web service answered with a status other than OK."""
+
+
+class LocationService:
+    """
+    Async Google Maps lookups on the shared keep-alive HTTP pool.
+    Geocodes are cached on disk, the current location is reused until it goes stale, and
+    routes reuse place ids the service has already resolved instead of re-geocoding text.
+    """
+
+    def __init__(self, api_key: str, session_factory, cache_path: str = GEOCODE_CACHE_PATH):
+        # session_factory() returns the shared aiohttp session (see http_pool).
+        self.api_key = api_key
+        self._session = session_factory
+        self.cache_path = cache_path
+        self._cache = None
+        self._save_task = None
+        self._dirty = False
+        self._current = None  # (fetched_at, address)
+        self._current_inflight = None
+
+    # --- Geocode Cache ---
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path, encoding="utf-8") as cache_file:
+                    self._cache = json.load(cache_file)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _cache_get(self, key: str):
+        entry = self._load_cache().get(key)
+        if entry is None or time.time() - entry["at"] > GEOCODE_CACHE_TTL:
+            return None
+        return entry["value"]
+
+    def _cache_put(self, key: str, value: dict):
+        cache = self._load_cache()
+        cache.pop(key, None)
+        cache[key] = {"at": time.time(), "value": value}
+        while len(cache) > GEOCODE_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        # Writes are coalesced: a running save writes again if entries were added meanwhile.
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_cache())
+
+    async def _save_cache(self):
+        while self._dirty:
+            self._dirty = False
+            snapshot = dict(self._cache)
+            try:
+                await asyncio.to_thread(self._write_cache, snapshot)
+            except OSError as e:
+                print(f"Could not save the geocode cache: {e}")
+                return
+
+    def _write_cache(self, snapshot: dict):
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(snapshot, cache_file)
+        os.replace(temp_path, self.cache_path)
+
+    @staticmethod
+    def _place_key(place: str) -> str:
+        # Only case and spacing are ignored: a place id must never be shared by two different
+        # queries ("Paris, US" vs "Paris"). Older, looser "place:" keys are simply never read again.
+        return "query:" + " ".join(place.casefold().split())
+
+    @staticmethod
+    def _coordinate_key(lat: float, lng: float) -> str:
+        return f"latlng:{round(lat, COORDINATE_PRECISION)},{round(lng, COORDINATE_PRECISION)}"
+
+    # --- Transport ---
+
+    async def _request(self, url: str, params: dict = None, payload: dict = None) -> dict:
+        params = dict(params or {}, key=self.api_key)
+        session = self._session()
+        if payload is None:
+            request = session.get(url, params=params)
+        else:
+            request = session.post(url, params=params, json=payload)
+        async with request as response:
+            data = await response.json(content_type=None)
+        if "error" in data and isinstance(data["error"], dict):  # Geolocation API error format
+            raise MapsApiError(data["error"].get("message", "unknown error"))
+        status = data.get("status", "OK")
+        if status not in ("OK", "ZERO_RESULTS"):
+            raise MapsApiError(f"{status}: {data.get('error_message', '')}".rstrip(": "))
+        return data
+
+    # --- Lookups ---
+
+    async def reverse_geocode(self, lat: float, lng: float):
+        """Returns the formatted address nearest to the coordinates, or None."""
+        key = self._coordinate_key(lat, lng)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached["address"]
+        data = await self._request(GEOCODE_URL, {"latlng": f"{lat},{lng}"})
+        if not data.get("results"):
+            return None
+        address = data["results"][0]["formatted_address"]
+        self._cache_put(key, {"address": address})
+        return address
+
+    async def current_location(self, max_age: float = LOCATION_MAX_AGE) -> str:
+        """The user's address from their IP; the last answer is reused until it is `max_age` seconds old."""
+        if self._current is not None and time.monotonic() - self._current[0] < max_age:
+            return self._current[1]
+        if self._current_inflight is None or self._current_inflight.done():
+            self._current_inflight = asyncio.create_task(self._locate())
+        return await asyncio.shield(self._current_inflight)
+
+    async def _locate(self) -> str:
+        data = await self._request(GEOLOCATE_URL, payload={"considerIp": True})
+        if "location" not in data:
+            raise MapsApiError("Could not determine current location.")
+        lat, lng = data["location"]["lat"], data["location"]["lng"]
+        address = await self.reverse_geocode(lat, lng)
+        if address is None:
+            raise MapsApiError(f"Could not find address for location: ({lat}, {lng}).")
+        self._current = (time.monotonic(), address)
+        return address
+
+    def _waypoint(self, place: str) -> str:
+        """A place id reference when this place was resolved before, so Maps does not geocode it again."""
+        cached = self._cache_get(self._place_key(place))
+        return f"place_id:{cached['place_id']}" if cached else place
+
+    async def directions(self, origin: str, destination: str, mode: str = "driving") -> dict:
+        """Returns the first leg of the best route, with traffic-aware duration for driving."""
+        references = (self._waypoint(origin), self._waypoint(destination))
+        params = {
+            "origin": references[0],
+            "destination": references[1],
+            "mode": mode,
+            "departure_time": "now",
+        }
+        data = await self._request(DIRECTIONS_URL, params)
+        if not data.get("routes"):
+            return None
+        # The response names the place ids it resolved the text to; keep them for next time.
+        waypoints = data.get("geocoded_waypoints", [])
+        legs = data["routes"][0]["legs"]
+        addresses = (legs[0]["start_address"], legs[-1]["end_address"])
+        for place, reference, waypoint, address in zip((origin, destination), references, waypoints, addresses):
+            if waypoint.get("place_id") and not reference.startswith("place_id:"):
+                self._cache_put(self._place_key(place), {"place_id": waypoint["place_id"], "address": address})
+        return legs[0]
+
+    async def travel_matrix(self, origins: list[str], destinations: list[str], mode: str = "driving") -> dict:
+        """One Distance Matrix request for every origin/destination pair."""
+        if not origins or not destinations:
+            raise ValueError("At least one origin and one destination are required.")
+        if max(len(origins), len(destinations)) > MATRIX_MAX_PLACES or len(origins) * len(destinations) > MATRIX_MAX_ELEMENTS:
+            raise ValueError(
+                f"Too many places: at most {MATRIX_MAX_PLACES} per side and {MATRIX_MAX_ELEMENTS} pairs per request."
+            )
+        params = {
+            "origins": "|".join(self._waypoint(place) for place in origins),
+            "destinations": "|".join(self._waypoint(place) for place in destinations),
+            "mode": mode,
+            "departure_time": "now",
+        }
+        return await self._request(DISTANCE_MATRIX_URL, params)
+
+    async def close(self):
+        if self._save_task is not None:
+            await self._save_task
+
@@ -1,13 +1,22 @@
 # main.py
 
+import time
 import asyncio
 import logging
 from dotenv import load_dotenv
 
+from startup import StartupOrchestrator
+
+# Timed from here so the start-up report includes the imports below
+startup = StartupOrchestrator()
+_imports_started = time.perf_counter()
 # Import the main class from your alfred.py file
 from Alfred import Alfred
 # Import the Gmail authentication function to run a pre-flight check
-from langchain_tools import google_authenticate, startup_browser, shutdown_browser
+from langchain_tools import (
+    google_authenticate, startup_browser, shutdown_browser, startup_http_clients, shutdown_http_clients
+)
+startup.record("imports", _imports_started)
 
 # Configure logging for better debugging and to see the auth flow
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -45,24 +54,37 @@ async def main():
     # Load environment variables from your .env file
     load_dotenv()
 
-    # --- Pre-flight Checks ---
-    await check_google_auth()
-    await startup_browser()
+    # --- Warm-up ---
+    # Independent subsystems start concurrently. Only the speech-to-text model is needed to hear
+    # the wake word; the browser, Google auth, TTS socket and audio output finish in the background.
+    startup.start("google_auth", check_google_auth())
+    startup.start("browser", startup_browser())
+    startup.start("http_clients", startup_http_clients())
+    await asyncio.sleep(0)  # let them get going (threads, subprocesses) before the synchronous set-up below
 
     # --- Initialize and Run Alfred ---
     alfred_instance = None
+    report_task = None
     try:
-        # 1. Initialize Alfred
-        alfred_instance = Alfred()
+        # 1. Initialize Alfred (fast: heavy models load in the warm-up phases below)
+        alfred_instance = startup.run("agent", Alfred)
         logging.info("Alfred initialized successfully.")
+        startup.start("stt_model", alfred_instance.load_stt(), critical=True)
+        startup.start("tts_connect", alfred_instance.connect_tts())
+        startup.start("audio_output", alfred_instance.open_audio_output())
 
-        # 2. Create the concurrent tasks for Alfred's core functions
+        # 2. Create the concurrent tasks for Alfred's core functions; each waits only for its own subsystem
         tasks = [
             asyncio.create_task(alfred_instance.stt()),           # Speech-to-Text
             asyncio.create_task(alfred_instance.send_prompt()),   # LangGraph Agent Logic
             asyncio.create_task(alfred_instance.tts()),           # Text-to-Speech
             asyncio.create_task(alfred_instance.play_audio()),    # Audio Playback
         ]
+        # Prints the start-up report once the background phases are done
+        report_task = asyncio.create_task(startup.wait_all())
+
+        ready_after = await startup.wait_critical()
+        logging.info(f"Listening for the wake word {ready_after:.2f}s after launch.")
 
         # 3. Run all tasks together
         await asyncio.gather(*tasks)
@@ -71,7 +93,15 @@ async def main():
         logging.critical(f"A critical error occurred in the main run function: {e}", exc_info=True)
     finally:
         logging.info("Shutting down Alfred...")
+        if report_task is not None and not report_task.done():
+            # A phase is still starting (or hung); the report is not worth waiting for
+            report_task.cancel()
+            await asyncio.gather(report_task, return_exceptions=True)
         await shutdown_browser()
+        await shutdown_http_clients()
+        if alfred_instance:
+            alfred_instance.tracer.close()
+            logging.info(alfred_instance.tracer.report())
         if alfred_instance and alfred_instance.pya:
             alfred_instance.pya.terminate()
             logging.info("PyAudio instance terminated.")
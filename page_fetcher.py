@@ -0,0 +1,218 @@
+import re
+import html
+import asyncio
+from urllib.parse import urlparse
+
+import aiohttp
+
+import http_pool
+from text_extraction import MAX_CHARS, clean_text, extract_text
+
+# --- Fetch Policy ---
+# Domains known to need (or not need) a real browser render. Domains not listed are decided
+# per request by `needs_browser`, and ones that turn out to need a browser are remembered.
+DOMAIN_POLICY = {
+    "x.com": "browser",
+    "twitter.com": "browser",
+    "instagram.com": "browser",
+    "en.wikipedia.org": "http",
+}
+# Pages whose visible text (outside scripts/styles) is shorter than this are treated as JS shells.
+MIN_STATIC_TEXT_CHARS = 400
+# Markers of client-rendered app shells or "please enable JavaScript" pages.
+JS_SHELL_MARKERS = (
+    '<div id="root"></div>', '<div id="app"></div>', '<div id="__next"></div>',
+    "enable javascript", "requires javascript", "javascript is disabled",
+)
+HTTP_TIMEOUT = 10.0
+# Larger responses are cut off; extract_page_text only keeps a few thousand characters anyway.
+MAX_RESPONSE_BYTES = 3_000_000
+READ_CHUNK_BYTES = 64 * 1024
+REQUEST_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style|noscript)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+
+
+def needs_browser(html_content: str) -> bool:
+    """Heuristic: does this statically fetched HTML need JavaScript to show its content?"""
+    lowered = html_content.lower()
+    if any(marker in lowered for marker in JS_SHELL_MARKERS):
+        return True
+    visible = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", html_content))
+    return len(" ".join(visible.split())) < MIN_STATIC_TEXT_CHARS
+
+
+def extract_title(html_content: str) -> str:
+    match = _TITLE_RE.search(html_content)
+    return " ".join(html.unescape(match.group(1)).split()) if match else ""
+
+
+def _domain(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class PageFetcher:
+    """
+    Loads web pages for the browsing tools as cheaply as possible.
+    Static pages are fetched over plain HTTP (no browser at all); pages that need
+    JavaScript, or domains configured/learned to need it, go through the browser pool.
+    """
+
+    def __init__(self, browser_pool=None, domain_policy: dict = None):
+        self.browser_pool = browser_pool
+        self.domain_policy = dict(DOMAIN_POLICY if domain_policy is None else domain_policy)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = http_pool.new_session(
+                headers=REQUEST_HEADERS, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def fetch(self, url: str) -> tuple[str, str]:
+        """Returns (title, html) for `url`, using the browser only when needed."""
+        page = await self._fetch_static(url)
+        if page is not None:
+            return page
+        return await self._require_browser().navigate_and_extract(url)
+
+    async def fetch_text(self, url: str, max_chars: int = MAX_CHARS) -> tuple[str, str]:
+        """
+        Returns (title, readable text) for `url`. Static pages are parsed in a worker thread;
+        browser-rendered pages have their text extracted inside the browser.
+        """
+        page = await self._fetch_static(url)
+        if page is not None:
+            title, html_content = page
+            return title, await asyncio.to_thread(extract_text, html_content, max_chars)
+        title, text = await self._require_browser().navigate_and_read(url, max_chars)
+        return title, clean_text(text, max_chars)
+
+    async def _fetch_static(self, url: str):
+        """Returns (title, html) from a plain HTTP fetch, or None if the page needs the browser."""
+        domain = _domain(url)
+        if self.domain_policy.get(domain) == "browser":
+            return None
+        try:
+            title, html_content = await self._fetch_http(url)
+        except Exception as e:
+            # Not remembered: a 404, a timeout or a PDF says nothing about how the domain renders.
+            print(f"Plain fetch of {url} failed ({e}); using the browser.")
+            return None
+        if self.domain_policy.get(domain) == "http" or not needs_browser(html_content):
+            return title, html_content
+        print(f"Page at {domain} looks script-rendered; using the browser.")
+        # Remember it so later reads of this domain skip the wasted plain fetch.
+        self.domain_policy.setdefault(domain, "browser")
+        return None
+
+    def _require_browser(self):
+        if self.browser_pool is None:
+            raise RuntimeError("This page needs a browser, but the browser is not running.")
+        return self.browser_pool
+
+    async def _fetch_http(self, url: str) -> tuple[str, str]:
+        async with self._get_session().get(url, allow_redirects=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if not any(kind in content_type for kind in ("html", "text", "json", "xml")):
+                raise ValueError(f"unsupported content type '{content_type}'")
+            # content.read(n) returns only what is already buffered; read until EOF or the cap.
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+                body += chunk
+                if len(body) >= MAX_RESPONSE_BYTES:
+                    del body[MAX_RESPONSE_BYTES:]
+                    break
+            text = body.decode(response.charset or "utf-8", errors="replace")
+            if "html" not in content_type:
+                # Plain text/JSON: wrap it so the HTML-to-text step passes it through unchanged.
+                return "", f"<pre>{html.escape(text)}</pre>"
+            return extract_title(text), text
+
+
+# --- Page Read Benchmark ---
+
+async def benchmark(pages: int = 20, use_browser: bool = True):
+    """
+    Serves a local fixture site (static article with images/fonts, plus a JS app shell)
+    and times reading it through the fast path versus a full, unblocked browser load.
+    """
+    import time
+    from aiohttp import web
+
+    article = "<p>" + "The butler served tea in the library while the city slept. " * 40 + "</p>"
+    images = "".join(f'<img src="/img/{i}.png">' for i in range(30))
+    static_page = f"<html><head><title>Fixture article</title><link rel='stylesheet' href='/style.css'></head><body>{images}{article}</body></html>"
+    shell_page = "<html><head><title>Fixture app</title></head><body><div id=\"root\"></div><script>document.getElementById('root').innerText = 'Rendered';</script></body></html>"
+
+    async def slow_asset(request):
+        await asyncio.sleep(0.02)
+        return web.Response(body=b"\0" * 50_000, content_type="application/octet-stream")
+
+    app = web.Application()
+    app.router.add_get("/article", lambda request: web.Response(text=static_page, content_type="text/html"))
+    app.router.add_get("/app", lambda request: web.Response(text=shell_page, content_type="text/html"))
+    app.router.add_get("/img/{name}", slow_asset)
+    app.router.add_get("/style.css", slow_asset)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    results = {}
+    fetcher = PageFetcher(domain_policy={})
+    started = time.perf_counter()
+    for _ in range(pages):
+        await fetcher.fetch(f"{base}/article")
+    results["fast_path_static_ms"] = (time.perf_counter() - started) / pages * 1000
+
+    if use_browser:
+        from playwright.async_api import async_playwright
+        from browser_pool import BrowserPool
+        playwright = await async_playwright().start()
+        browser = await playwright.chromium.launch()
+        for name, block in (("browser_full_static_ms", False), ("browser_blocked_static_ms", True)):
+            pool = BrowserPool(browser, size=1, block_resources=block)
+            started = time.perf_counter()
+            for _ in range(pages):
+                await pool.navigate_and_extract(f"{base}/article")
+            results[name] = (time.perf_counter() - started) / pages * 1000
+            await pool.close()
+        fetcher.browser_pool = BrowserPool(browser, size=1)
+        started = time.perf_counter()
+        for _ in range(pages):
+            await fetcher.fetch(f"{base}/app")
+        results["fast_path_js_shell_ms"] = (time.perf_counter() - started) / pages * 1000
+        await fetcher.browser_pool.close()
+        await browser.close()
+        await playwright.stop()
+
+    await fetcher.close()
+    await http_pool.close()
+    await runner.cleanup()
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    for name, value in asyncio.run(benchmark(use_browser="--no-browser" not in sys.argv)).items():
+        print(f"{name}: {value:.1f}")
@@ -0,0 +1,447 @@
+import io
+import os
+import json
+import time
+import random
+import asyncio
+import base64
+import argparse
+import resource
+import contextlib
+
+import websockets
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+from langgraph.checkpoint.memory import MemorySaver
+
+from tracing import Tracer, summarize, format_report
+
+# --- Default Latency Model ---
+# Roughly what gpt-4o-mini, ElevenLabs flash and the Google/Maps APIs look like from a home connection.
+FIRST_TOKEN_MS = 350
+TOKENS_PER_SECOND = 80
+TOOL_LATENCY_MS = 250
+TTS_FIRST_BYTE_MS = 200
+# Speech rate of the generated audio, and how much faster than real time it is produced.
+TTS_CHARS_PER_SECOND = 15
+TTS_REALTIME_FACTOR = 4.0
+TTS_FRAME_MS = 100
+# Relative jitter applied to every modelled latency.
+JITTER = 0.2
+# The fake TTS server may receive the last text a moment after Alfred sent it; idle checks wait this long first.
+SETTLE_SECONDS = 0.05
+
+# Canned tool results, formatted with the call's arguments.
+STUB_RESULTS = {
+    "get_current_location": "12 Grimmauld Place, London, UK",
+    "get_weather": "Weather in {location}: 14°C, light rain, wind 18 km/h.",
+    "get_travel_duration": "Travel from {origin} to {destination} by {mode}: 24 mins (9.1 km).",
+    "get_travel_matrix": "All routes are between 15 and 40 minutes.",
+    "list_unread_messages": "['From: Lucius Fox | Subject: Prototype ready']",
+    "send_email": "Email sent successfully to {to}.",
+    "brave_search": "1. Example result - https://example.com - A page about {query}.",
+    "navigate_to_url": "Navigated to {url}. Title: Example Domain",
+    "extract_page_text": "Example Domain. This domain is for use in illustrative examples.",
+    "list_calendar_events": "Upcoming events:\n- 2025-07-21T09:00:00: Board meeting",
+    "create_calendar_event": "Event created: {summary}",
+}
+
+# Used when no script file is given: a fast-path turn, a tool turn, a chat turn and a follow-up.
+DEFAULT_SCRIPT = [
+    {"conversation": "errands", "user": "What's the weather in London?"},
+    {"conversation": "errands", "user": "How long would it take to drive to Heathrow from here?",
+     "tool_calls": [{"name": "get_travel_duration", "args": {"origin": "current location", "destination": "Heathrow"}}],
+     "reply": "About twenty-four minutes by car, Sir, traffic permitting."},
+    {"conversation": "errands", "user": "Tell me something cheerful.",
+     "reply": "The Batmobile has passed its inspection, Sir, and only one tyre required replacing. A personal best."},
+    {"conversation": "research", "user": "Search the web for the latest on fusion energy.",
+     "tool_calls": [{"name": "brave_search", "args": {"query": "latest fusion energy news"}}],
+     "reply": "The latest reports describe a record plasma run, Sir. Shall I read you the details?"},
+    {"conversation": "research", "user": "Yes, briefly.",
+     "reply": "In short, Sir, the reactor held its plasma for longer than ever before, and the team expects to double it next year."},
+]
+
+
+def _jittered(ms: float) -> float:
+    return max(0.0, random.gauss(ms, ms * JITTER)) / 1000
+
+
+# --- Scripted Chat Model ---
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Streams scripted replies with modelled first-token latency and token rate. The reply is chosen by the
+    latest user message, so one model serves any number of concurrent conversations. Tool calls are
+    streamed in two argument fragments, like the real API, so speculative tool starts are exercised.
+    """
+
+    script: dict = {}
+    first_token_ms: float = FIRST_TOKEN_MS
+    tokens_per_second: float = TOKENS_PER_SECOND
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages) -> AIMessage:
+        user = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        turn = self.script.get(user)
+        if turn is None:
+            # e.g. the conversation-memory summary prompt
+            return AIMessage(content="The user and Alfred discussed errands and the news.")
+        if turn.get("tool_calls") and not isinstance(messages[-1], ToolMessage):
+            return AIMessage(content="", tool_calls=[
+                {"name": call["name"], "args": call["args"], "id": f"call_{index}_{abs(hash(user)) % 10**8}"}
+                for index, call in enumerate(turn["tool_calls"])
+            ])
+        return AIMessage(content=turn.get("reply", "Very good, Sir."))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        response = self._respond(messages)
+        await asyncio.sleep(_jittered(self.first_token_ms))
+        if response.tool_calls:
+            chunks = []
+            for index, call in enumerate(response.tool_calls):
+                args = json.dumps(call["args"])
+                middle = len(args) // 2
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": call["name"], "args": args[:middle], "id": call["id"], "index": index}]))
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": None, "args": args[middle:], "id": None, "index": index}]))
+        else:
+            words = response.content.split(" ")
+            chunks = [AIMessageChunk(content=word if i == 0 else " " + word) for i, word in enumerate(words)]
+        for i, message in enumerate(chunks):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        streamed = None
+        async for chunk in self._astream(messages, stop, run_manager, **kwargs):
+            streamed = chunk if streamed is None else streamed + chunk
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=streamed.message.content, tool_calls=streamed.message.tool_calls))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Same reply and modelled latency as the async path, for callers that invoke the model synchronously
+        response = self._respond(messages)
+        tokens = len(response.tool_calls) * 2 or len(response.content.split(" "))
+        time.sleep(_jittered(self.first_token_ms) + (tokens - 1) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+def stub_tools(real_tools, latency_ms: float = TOOL_LATENCY_MS):
+    """Tools with the real names and argument schemas that return canned results after a modelled delay."""
+    def make(real):
+        async def run(**kwargs):
+            await asyncio.sleep(_jittered(latency_ms))
+            template = STUB_RESULTS.get(real.name, f"Stub result for {real.name}.")
+            try:
+                return template.format(**kwargs)
+            except (KeyError, IndexError):
+                return template
+        return StructuredTool(name=real.name, description=real.description, args_schema=real.args_schema, coroutine=run)
+    return [make(real) for real in real_tools]
+
+
+# --- Fake ElevenLabs ---
+
+class FakeElevenLabs:
+    """
+    A local stream-input WebSocket server. Each flushed text becomes silent 24 kHz PCM of a
+    speech-like duration, sent in frames with character alignment after a first-byte delay.
+    Sessions are told apart by URL path, so concurrent Alfreds can be checked for idleness.
+    """
+
+    def __init__(self, first_byte_ms: float = TTS_FIRST_BYTE_MS, chars_per_second: float = TTS_CHARS_PER_SECOND,
+                 realtime_factor: float = TTS_REALTIME_FACTOR, frame_ms: int = TTS_FRAME_MS):
+        self.first_byte_ms = first_byte_ms
+        self.chars_per_second = chars_per_second
+        self.realtime_factor = realtime_factor
+        self.frame_ms = frame_ms
+        self.pending = {}  # session path -> texts received but not fully voiced
+        self.connections = 0
+        self._server = None
+        self.port = None
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def uri(self, session: str) -> str:
+        return f"ws://127.0.0.1:{self.port}/{session}"
+
+    def idle(self, session: str) -> bool:
+        return not self.pending.get(f"/{session}")
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, websocket):
+        path = websocket.request.path
+        self.connections += 1
+        texts = asyncio.Queue()
+        # This socket's share of pending[path]; several sockets (a session's spares, or many clients) can share a path
+        outstanding = {"texts": 0}
+        worker = asyncio.create_task(self._voice(websocket, path, texts, outstanding))
+        buffered = ""
+        try:
+            async for message in websocket:
+                data = json.loads(message)
+                if data.get("text") == "":
+                    break  # end of stream
+                buffered += data.get("text", "")
+                if data.get("flush") and buffered.strip():
+                    self.pending[path] = self.pending.get(path, 0) + 1
+                    outstanding["texts"] += 1
+                    texts.put_nowait(buffered.strip())
+                    buffered = ""
+            texts.put_nowait(None)
+            await worker
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            worker.cancel()
+            self.pending[path] = self.pending.get(path, 0) - outstanding["texts"]
+            if self.pending[path] <= 0:
+                del self.pending[path]
+
+    async def _voice(self, websocket, path: str, texts: asyncio.Queue, outstanding: dict):
+        while (text := await texts.get()) is not None:
+            await asyncio.sleep(_jittered(self.first_byte_ms))
+            total_ms = 1000 * len(text) / self.chars_per_second
+            frames = max(1, round(total_ms / self.frame_ms))
+            per_frame = -(-len(text) // frames)
+            pcm = base64.b64encode(bytes(self.frame_ms * 48)).decode()
+            for index in range(frames):
+                chars = list(text[index * per_frame:(index + 1) * per_frame])
+                step = self.frame_ms / max(1, len(chars))
+                await websocket.send(json.dumps({
+                    "audio": pcm,
+                    "normalizedAlignment": {
+                        "chars": chars,
+                        "charStartTimesMs": [round(i * step) for i in range(len(chars))],
+                        "charDurationsMs": [round(step)] * len(chars),
+                    },
+                }))
+                await asyncio.sleep(self.frame_ms / 1000 / self.realtime_factor)
+            self.pending[path] -= 1
+            outstanding["texts"] -= 1
+
+
+# --- Scripts ---
+
+def load_script(path: str = None) -> dict:
+    """{conversation id: [turn, ...]} from a JSONL file of turns (see DEFAULT_SCRIPT for the fields)."""
+    turns = DEFAULT_SCRIPT
+    if path:
+        with open(path, encoding="utf-8") as script_file:
+            turns = [json.loads(line) for line in script_file if line.strip()]
+    conversations = {}
+    for turn in turns:
+        conversations.setdefault(turn.get("conversation", "default"), []).append(turn)
+    return conversations
+
+
+def wav_seconds(path: str) -> float:
+    import wave
+    with wave.open(path, "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def transcribe(path: str) -> str:
+    """Transcribes a recorded utterance with the same Whisper model Alfred uses (needs RealtimeSTT)."""
+    from RealtimeSTT import AudioToTextRecorder
+    from wake_word import FRAME_SAMPLES, SAMPLE_RATE, wav_frames
+    recorder = AudioToTextRecorder(model="base.en", language="en", spinner=False, use_microphone=False)
+    try:
+        for frame in wav_frames(path):
+            recorder.feed_audio(frame)
+        # Trailing silence so the recorder sees the end of the utterance
+        for _ in range(int(1.5 * SAMPLE_RATE / FRAME_SAMPLES)):
+            recorder.feed_audio(bytes(FRAME_SAMPLES * 2))
+        return recorder.text()
+    finally:
+        recorder.shutdown()
+
+
+def prepare_turns(conversations: dict) -> dict:
+    """Fills in `user` for turns given only as a WAV recording, timing the transcription; returns stt timings."""
+    stt_ms = []
+    for turns in conversations.values():
+        for turn in turns:
+            if turn.get("wav"):
+                turn["speech_seconds"] = wav_seconds(turn["wav"])
+                if not turn.get("user"):
+                    started = time.perf_counter()
+                    turn["user"] = transcribe(turn["wav"]).strip()
+                    stt_ms.append((time.perf_counter() - started) * 1000)
+    return {"stt_ms": stt_ms}
+
+
+# --- Replay ---
+
+async def _wait_until_quiet(alfred, server: FakeElevenLabs, session: str):
+    """Waits until the turn has been answered, voiced and played out."""
+    await alfred.input_queue.join()
+    await alfred.response_queue.join()
+    await asyncio.sleep(SETTLE_SECONDS)
+    while (not server.idle(session) or alfred.audio_queue.qsize()
+           or (alfred.audio_output is not None and alfred.audio_output.ring.available())):
+        await asyncio.sleep(0.01)
+
+
+async def replay_conversation(name: str, turns: list, server: FakeElevenLabs, llm, tools, trace_path: str = ""):
+    """Runs one scripted conversation through a fresh, fully fake-backed Alfred; returns its tracer and stats."""
+    from Alfred import Alfred
+    session = f"{name}-{id(turns)}-{random.randrange(10**6)}"
+    alfred = Alfred(llm=llm, tools=tools, tts_uri=server.uri(session), audio_sink="null",
+                    thread_id=session, checkpointer=MemorySaver())
+    alfred.tracer = Tracer(path=trace_path, enabled=True, complete_on="first_sample_played")
+    await asyncio.gather(alfred.open_audio_output(), alfred.connect_tts())
+    tasks = [asyncio.create_task(coroutine) for coroutine in (alfred.send_prompt(), alfred.tts(), alfred.play_audio())]
+    try:
+        for turn in turns:
+            if turn.get("speech_seconds"):
+                await asyncio.sleep(turn["speech_seconds"])  # the user is still talking
+            await alfred.submit(turn["user"])
+            await _wait_until_quiet(alfred, server, session)
+            if turn.get("think_ms"):
+                await asyncio.sleep(turn["think_ms"] / 1000)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        alfred.tracer.close()
+    return alfred.tracer, alfred.audio_output.stats() if alfred.audio_output else {}
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return 0.0
+
+
+async def run_benchmark(script: str = None, concurrency: int = 1, repeat: int = 1, trace_path: str = "",
+                        first_token_ms: float = FIRST_TOKEN_MS, tokens_per_second: float = TOKENS_PER_SECOND,
+                        tool_latency_ms: float = TOOL_LATENCY_MS, tts_first_byte_ms: float = TTS_FIRST_BYTE_MS,
+                        quiet: bool = True) -> dict:
+    """Replays every scripted conversation `repeat` times, `concurrency` at a time, and reports latency, throughput and memory."""
+    import langchain_tools
+    conversations = load_script(script)
+    prepared = prepare_turns(conversations)
+    by_user = {turn["user"]: turn for turns in conversations.values() for turn in turns}
+    llm = ScriptedChatModel(script=by_user, first_token_ms=first_token_ms, tokens_per_second=tokens_per_second)
+    real_tools = [value for value in vars(langchain_tools).values() if isinstance(value, StructuredTool)]
+    tools = stub_tools(real_tools, tool_latency_ms)
+    server = FakeElevenLabs(first_byte_ms=tts_first_byte_ms)
+    await server.start()
+
+    jobs = [(name, turns) for _ in range(repeat) for name, turns in conversations.items()]
+    limit = asyncio.Semaphore(concurrency)
+    results = []
+    errors = []
+    rss_start = rss_mb()
+
+    async def run(name, turns):
+        async with limit:
+            try:
+                results.append(await replay_conversation(name, turns, server, llm, tools, trace_path))
+            except Exception as e:
+                errors.append(f"{name}: {e!r}")
+
+    started = time.perf_counter()
+    # Alfred narrates every step; keep the report readable unless asked otherwise
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        await asyncio.gather(*(run(name, turns) for name, turns in jobs))
+    wall = time.perf_counter() - started
+    await server.close()
+
+    samples = {}
+    for tracer, _ in results:
+        for metric, values in tracer.samples().items():
+            samples.setdefault(metric, []).extend(values)
+    if prepared["stt_ms"]:
+        samples["stt_ms"] = prepared["stt_ms"]
+    turns = sum(len(turns) for _, turns in jobs)
+    return {
+        "conversations": len(jobs),
+        "turns": turns,
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "turns_per_second": turns / wall if wall else 0.0,
+        "latency": summarize(samples),
+        "memory": {
+            "rss_start_mb": rss_start,
+            "rss_end_mb": rss_mb(),
+            # ru_maxrss is in KiB on Linux
+            "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "audio": {
+            "underruns": sum(stats.get("underruns", 0) for _, stats in results),
+            "overruns": sum(stats.get("overruns", 0) for _, stats in results),
+        },
+        "errors": errors,
+    }
+
+
+def format_comparison(report: dict, baseline: dict) -> str:
+    lines = [f"Against baseline: throughput {report['turns_per_second']:.2f} vs {baseline['turns_per_second']:.2f} turns/s"]
+    for metric, row in sorted(report["latency"].items()):
+        before = baseline["latency"].get(metric)
+        if before:
+            lines.append(
+                f"  {metric:<34} p50 {row['p50'] - before['p50']:+7.0f} ms   p95 {row['p95'] - before['p95']:+7.0f} ms"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay scripted conversations through Alfred with fake services.")
+    parser.add_argument("script", nargs="?", help="JSONL of turns: conversation, user or wav, tool_calls, reply, think_ms")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=FIRST_TOKEN_MS)
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND)
+    parser.add_argument("--tool-latency-ms", type=float, default=TOOL_LATENCY_MS)
+    parser.add_argument("--tts-first-byte-ms", type=float, default=TTS_FIRST_BYTE_MS)
+    parser.add_argument("--trace-file", default="", help="also append every turn's trace to this JSONL file")
+    parser.add_argument("--output", help="save the report as JSON")
+    parser.add_argument("--baseline", help="a saved report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show Alfred's own output")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(
+        args.script, args.concurrency, args.repeat, args.trace_file, args.first_token_ms,
+        args.tokens_per_second, args.tool_latency_ms, args.tts_first_byte_ms, quiet=not args.verbose,
+    ))
+    print(
+        f"{report['conversations']} conversations, {report['turns']} turns at concurrency {report['concurrency']}: "
+        f"{report['wall_seconds']:.1f}s, {report['turns_per_second']:.2f} turns/s"
+    )
+    print(format_report(report["latency"]))
+    memory = report["memory"]
+    print(
+        f"Memory: RSS {memory['rss_start_mb']:.0f} -> {memory['rss_end_mb']:.0f} MB (peak {memory['rss_peak_mb']:.0f} MB); "
+        f"audio underruns {report['audio']['underruns']}, overruns {report['audio']['overruns']}"
+    )
+    for error in report["errors"]:
+        print(f"Error: {error}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            print(format_comparison(report, json.load(baseline_file)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
@@ -0,0 +1,389 @@
+# server.py
+
+import io
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+import contextlib
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+from dotenv import load_dotenv
+
+from Alfred import Alfred, TTS_URI, build_llm, build_checkpointer
+from tool_cache import ToolCache
+from stt_worker import SpeechWorkerPool
+from tracing import TRACE_PATH, Tracer, summarize, format_report, percentile
+
+# --- Server Settings ---
+SERVER_HOST = os.getenv("ALFRED_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("ALFRED_SERVER_PORT", "8765"))
+# Admission control: connections beyond this are refused with close code 1013 ("try again later").
+MAX_SESSIONS = int(os.getenv("ALFRED_MAX_SESSIONS", "32"))
+# Turns running the graph at once across all sessions; later ones wait for a slot.
+MAX_ACTIVE_TURNS = int(os.getenv("ALFRED_MAX_ACTIVE_TURNS", "8"))
+# Client audio is 16 kHz 16-bit mono PCM in binary messages, ended by {"type": "audio_end"}; it is
+# transcribed while it streams by the STT worker pool (ALFRED_STT_WORKERS processes, see stt_worker.py).
+# Outgoing bytes buffered per connection before sends wait (backpressure towards the TTS socket).
+WRITE_LIMIT = 64 * 1024
+# A client that takes no audio for this long is disconnected instead of being buffered for.
+SEND_TIMEOUT = 10.0
+# Close code for refused sessions (RFC 6455: try again later).
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class ClientSession:
+    """
+    One connection. It gets its own Alfred (graph thread, queues, turn state and TTS socket);
+    the reply audio is sent back to the client instead of a sound card.
+
+    Client -> server: {"type": "text", "text": ...}, binary 16 kHz PCM then {"type": "audio_end"},
+    {"type": "interrupt"}. Server -> client: {"type": "ready"}, {"type": "partial"}, {"type": "transcript"},
+    {"type": "audio_start", "turn": n} followed by binary 24 kHz PCM, {"type": "reply"}, {"type": "error"}.
+    """
+
+    def __init__(self, server, websocket, session_id: str, thread_id: str):
+        self.server = server
+        self.websocket = websocket
+        self.session_id = session_id
+        self.thread_id = thread_id
+        self.alfred = Alfred(
+            llm=server.llm, tools=server.tools, tts_uri=server.tts_uri, audio_sink="null", thread_id=thread_id,
+            checkpointer=server.checkpointer, tool_cache=server.tool_cache, turn_slots=server.turn_slots,
+        )
+        # No speaker here: a turn is complete once its first audio has been handed to the client
+        self.alfred.tracer = Tracer(path=server.trace_path, complete_on="first_audio_sent")
+        self.alfred.on_turn_end = self._on_turn_end
+        self._stream = None  # the utterance being streamed to the STT pool
+        self._transcription = None
+        self._audio_turn = None
+        self._send_lock = asyncio.Lock()
+
+    async def run(self):
+        alfred = self.alfred
+        await alfred.connect_tts()
+        tasks = [
+            asyncio.create_task(alfred.send_prompt()),
+            asyncio.create_task(alfred.tts()),
+            asyncio.create_task(self.forward_audio()),
+            asyncio.create_task(self.receive()),
+        ]
+        await self.send_json({"type": "ready", "session": self.session_id, "thread": self.thread_id})
+        try:
+            # Ends when the client leaves, is too slow, or says "exit"
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks + [self._transcription, self._stream]:
+                if task is not None:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            alfred.tracer.close()
+
+    # --- Client -> Alfred ---
+
+    async def receive(self):
+        try:
+            async for message in self.websocket:
+                if isinstance(message, bytes):
+                    await self._feed(message)
+                    continue
+                try:
+                    data = json.loads(message)
+                except ValueError:
+                    await self.send_json({"type": "error", "error": "Messages must be JSON."})
+                    continue
+                kind = data.get("type")
+                if kind == "text" and data.get("text", "").strip():
+                    await self.alfred.submit(data["text"].strip())
+                elif kind == "audio_end" and self._stream is not None:
+                    stream, self._stream = self._stream, None
+                    # Only the latest utterance counts; the final transcript arrives while the client keeps talking
+                    if self._transcription is not None:
+                        self._transcription.cancel()
+                    self._transcription = asyncio.create_task(self._finish_utterance(stream, time.perf_counter()))
+                elif kind == "interrupt":
+                    await self.alfred.interrupt()
+                else:
+                    await self.send_json({"type": "error", "error": f"Unknown message type {kind!r}."})
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _feed(self, pcm: bytes):
+        if self.server.stt_pool is None:
+            await self.send_json({"type": "error", "error": "This server does not accept audio."})
+            return
+        if self._stream is None:
+            # Waits while every STT slot is busy; meanwhile the client's audio backs up in TCP
+            self._stream = await self.server.stt_pool.open_stream()
+            self._stream.on_partial = lambda text: asyncio.ensure_future(self.send_json({"type": "partial", "text": text}))
+        already_truncated = self._stream.truncated
+        self._stream.feed(pcm)
+        if self._stream.truncated and not already_truncated:
+            await self.send_json({"type": "error", "error": "Utterance too long; the rest is ignored."})
+
+    async def _finish_utterance(self, stream, utterance_end: float):
+        try:
+            text = await stream.end()
+        except Exception as e:
+            await self.send_json({"type": "error", "error": f"Transcription failed: {e}"})
+            return
+        await self.send_json({"type": "transcript", "text": text})
+        if text:
+            await self.alfred.submit(text, utterance_end=utterance_end)
+
+    # --- Alfred -> client ---
+
+    async def forward_audio(self):
+        """Takes the place of play_audio: sends the current turn's audio to the client, dropping stale turns."""
+        alfred = self.alfred
+        while True:
+            turn_id, pcm = await alfred.audio_queue.get()
+            try:
+                if turn_id != alfred.turn_id or not pcm:
+                    continue
+                alfred.tracer.event("tts_first_audio", turn_id)
+                if self._audio_turn != turn_id:
+                    self._audio_turn = turn_id
+                    await self.send_json({"type": "audio_start", "turn": turn_id})
+                # Waits while the client is behind, so the bounded audio queue pauses the TTS socket
+                await self.send(pcm)
+                alfred.tracer.event("first_audio_sent", turn_id)
+            finally:
+                alfred.audio_queue.task_done()
+
+    def _on_turn_end(self, turn_id, status, reply):
+        asyncio.ensure_future(self.send_json({"type": "reply", "turn": turn_id, "status": status, "text": reply}))
+
+    async def send_json(self, data: dict):
+        try:
+            await self.send(json.dumps(data))
+        except (websockets.exceptions.ConnectionClosed, asyncio.TimeoutError):
+            pass
+
+    async def send(self, message):
+        async with self._send_lock:
+            try:
+                await asyncio.wait_for(self.websocket.send(message), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"Session {self.session_id}: client stopped reading; disconnecting.")
+                await self.websocket.close(1008, "client too slow")
+                raise
+
+
+class AlfredServer:
+    """
+    Serves many clients from one process. Each WebSocket connection is a ClientSession with its own
+    graph thread, queues and turn state; the model client, checkpointer, tool cache, STT worker pool,
+    turn slots (and, through langchain_tools, the browser pool, HTTP clients and Google credentials)
+    are shared.
+    """
+
+    def __init__(self, llm=None, tools=None, tts_uri: str = TTS_URI, checkpointer=None, stt_pool=None,
+                 max_sessions: int = MAX_SESSIONS, max_active_turns: int = MAX_ACTIVE_TURNS,
+                 trace_path: str = TRACE_PATH):
+        self.llm = llm or build_llm()
+        self.tools = tools
+        self.tts_uri = tts_uri
+        self.checkpointer = checkpointer or build_checkpointer()
+        self.tool_cache = ToolCache()
+        self.stt_pool = stt_pool
+        self.turn_slots = asyncio.Semaphore(max_active_turns)
+        self.max_sessions = max_sessions
+        self.trace_path = trace_path
+        self.sessions = {}  # session id -> ClientSession
+        self.peak_sessions = 0
+        self.rejected = 0
+        self.samples = {}  # metric -> [ms, ...] from finished sessions
+        self._server = None
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self._server = await websockets.serve(
+            self.handle, host, port, write_limit=WRITE_LIMIT, max_size=2**20, ping_interval=20,
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Alfred server listening on ws://{host}:{self.port} (up to {self.max_sessions} sessions).")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.stt_pool is not None:
+            await self.stt_pool.close()
+
+    async def handle(self, websocket):
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            await websocket.close(CLOSE_TRY_AGAIN_LATER, "Alfred is at capacity, try again later.")
+            return
+        session_id = uuid.uuid4().hex[:8]
+        # ?thread=<id> resumes a conversation kept by the checkpointer
+        query = parse_qs(urlparse(websocket.request.path).query)
+        thread_id = query.get("thread", [f"session-{session_id}"])[0]
+        session = ClientSession(self, websocket, session_id, thread_id)
+        self.sessions[session_id] = session
+        self.peak_sessions = max(self.peak_sessions, len(self.sessions))
+        try:
+            await session.run()
+        except Exception as e:
+            print(f"Session {session_id} failed: {e}")
+        finally:
+            del self.sessions[session_id]
+            for metric, values in session.alfred.tracer.samples().items():
+                self.samples.setdefault(metric, []).extend(values)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "peak_sessions": self.peak_sessions,
+            "rejected": self.rejected,
+            "tool_cache": self.tool_cache.stats(),
+            "stt": self.stt_pool.stats() if self.stt_pool is not None else None,
+        }
+
+    def report(self) -> str:
+        return format_report(summarize(self.samples))
+
+
+async def serve(host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """Runs the server with the real services until cancelled."""
+    from main import check_google_auth
+    from langchain_tools import startup_browser, shutdown_browser, startup_http_clients, shutdown_http_clients
+    load_dotenv()
+    stt_pool = SpeechWorkerPool()
+    # The shared pieces start once for every session
+    await asyncio.gather(check_google_auth(), startup_browser(), startup_http_clients(), stt_pool.start())
+    server = AlfredServer(stt_pool=stt_pool)
+    await server.start(host, port)
+    try:
+        await asyncio.Future()
+    finally:
+        await server.close()
+        await shutdown_browser()
+        await shutdown_http_clients()
+        logging.info(server.report())
+
+
+# --- Load Test ---
+
+async def _load_client(uri: str, turns: list, think_ms: float, results: dict):
+    """One simulated user: sends each scripted turn as text and times the first audio of the reply."""
+    try:
+        async with websockets.connect(uri, max_size=2**20) as websocket:
+            await websocket.recv()  # "ready", or the close frame of a refused session
+            for turn in turns:
+                sent = time.perf_counter()
+                await websocket.send(json.dumps({"type": "text", "text": turn["user"]}))
+                first_audio = replied = None
+                last_audio = sent
+                # The turn is over once the reply is in and the audio has gone quiet
+                while replied is None or time.perf_counter() - last_audio < 0.3:
+                    try:
+                        message = await asyncio.wait_for(websocket.recv(), 0.3 if replied else 30)
+                    except asyncio.TimeoutError:
+                        if replied is None:
+                            raise
+                        break
+                    if isinstance(message, bytes):
+                        last_audio = time.perf_counter()
+                        if first_audio is None:
+                            first_audio = last_audio - sent
+                    elif json.loads(message).get("type") == "reply":
+                        replied = time.perf_counter()
+                        last_audio = replied
+                results["turns"] += 1
+                if first_audio is not None:
+                    results["first_audio_ms"].append(first_audio * 1000)
+                await asyncio.sleep(random.uniform(0, 2 * think_ms) / 1000)
+    except websockets.exceptions.ConnectionClosed as e:
+        if e.rcvd is not None and e.rcvd.code == CLOSE_TRY_AGAIN_LATER:
+            results["refused"] += 1
+        else:
+            results["errors"].append(repr(e))
+    except Exception as e:
+        results["errors"].append(repr(e))
+
+
+async def load_test(levels=(1, 2, 4, 8, 16), max_sessions: int = MAX_SESSIONS,
+                    max_active_turns: int = MAX_ACTIVE_TURNS, think_ms: float = 500, quiet: bool = True) -> list:
+    """
+    Runs the server against the replay benchmark's fakes (scripted model, stub tools, local ElevenLabs)
+    and, for each level, that many concurrent text clients; reports throughput, first-audio latency and memory.
+    """
+    import langchain_tools
+    from langchain_core.tools import StructuredTool
+    from langgraph.checkpoint.memory import MemorySaver
+    from replay_benchmark import DEFAULT_SCRIPT, FakeElevenLabs, ScriptedChatModel, load_script, rss_mb, stub_tools
+
+    conversations = list(load_script().values())
+    llm = ScriptedChatModel(script={turn["user"]: turn for turn in DEFAULT_SCRIPT})
+    tools = stub_tools([value for value in vars(langchain_tools).values() if isinstance(value, StructuredTool)])
+    tts = FakeElevenLabs()
+    await tts.start()
+    rows = []
+    for level in levels:
+        server = AlfredServer(llm=llm, tools=tools, tts_uri=tts.uri("load"), checkpointer=MemorySaver(),
+                              max_sessions=max_sessions, max_active_turns=max_active_turns, trace_path="")
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            await server.start("127.0.0.1", 0)
+            uri = f"ws://127.0.0.1:{server.port}"
+            results = {"turns": 0, "first_audio_ms": [], "refused": 0, "errors": []}
+            rss_before = rss_mb()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                _load_client(uri, conversations[index % len(conversations)], think_ms, results) for index in range(level)
+            ))
+            wall = time.perf_counter() - started
+            await server.close()
+        latencies = sorted(results["first_audio_ms"])
+        rows.append({
+            "sessions": level,
+            "admitted": server.peak_sessions,
+            "refused": results["refused"],
+            "turns": results["turns"],
+            "turns_per_second": results["turns"] / wall if wall else 0.0,
+            "first_audio_p50_ms": percentile(latencies, 50),
+            "first_audio_p95_ms": percentile(latencies, 95),
+            "graph_start_p95_ms": percentile(sorted(server.samples.get("to_graph_start_ms", [])), 95),
+            "rss_mb": rss_mb(),
+            "rss_per_session_mb": (rss_mb() - rss_before) / max(1, server.peak_sessions),
+            "errors": results["errors"],
+        })
+    await tts.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Alfred to many WebSocket clients, or load-test the server.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--load-test", metavar="LEVELS", help="comma-separated session counts, e.g. 1,2,4,8,16,32")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--max-active-turns", type=int, default=MAX_ACTIVE_TURNS)
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between a user's turns")
+    args = parser.parse_args()
+
+    if args.load_test:
+        rows = asyncio.run(load_test(
+            [int(level) for level in args.load_test.split(",")], args.max_sessions, args.max_active_turns, args.think_ms,
+        ))
+        print(f"{'sessions':>8} {'admitted':>8} {'refused':>7} {'turns':>5} {'turns/s':>8} "
+              f"{'audio p50':>9} {'audio p95':>9} {'queue p95':>9} {'MB/sess':>7}")
+        for row in rows:
+            print(
+                f"{row['sessions']:>8} {row['admitted']:>8} {row['refused']:>7} {row['turns']:>5} "
+                f"{row['turns_per_second']:>8.2f} {row['first_audio_p50_ms']:>9.0f} {row['first_audio_p95_ms']:>9.0f} "
+                f"{row['graph_start_p95_ms']:>9.0f} {row['rss_per_session_mb']:>7.1f}"
+            )
+            for error in row["errors"][:3]:
+                print(f"  error: {error}")
+    else:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
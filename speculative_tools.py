@@ -0,0 +1,109 @@
+import json
+import time
+import asyncio
+from collections import deque
+
+# --- Speculation Policy ---
+# Read-only tools that may start while the model is still streaming. Anything that sends,
+# creates or changes something (send_email, create_calendar_event) must never be listed here.
+SPECULATIVE_TOOLS = {
+    "get_current_location", "get_weather", "get_travel_duration", "get_travel_matrix",
+    "brave_search", "list_calendar_events",
+}
+# Per-turn latency records kept for inspection.
+TIMING_HISTORY = 50
+
+
+class SpeculativeToolRunner:
+    """
+    Starts safe tool calls from streamed tool-call chunks as soon as their JSON arguments are complete.
+    The action node then claims a running call if the final message asks for exactly the same
+    tool and arguments; calls the final message does not confirm are discarded.
+    """
+
+    def __init__(self, tool_map: dict, invoke, safe_tools=SPECULATIVE_TOOLS):
+        # invoke(tool, args) is awaited to run a tool (e.g. ToolCache.ainvoke).
+        self.tool_map = tool_map
+        self.invoke = invoke
+        self.safe_tools = set(safe_tools)
+        self._running = {}  # tool call id -> (name, args, task, started_at)
+        self._seen = set()  # chunk indices already started or found unsafe
+        self._turn = None
+        self.turn_timings = deque(maxlen=TIMING_HISTORY)
+
+    def start_turn(self):
+        """Called when the model starts streaming; leftovers from an earlier run are dropped."""
+        self.discard()
+        self._seen.clear()
+        self._turn = {"model_started": time.perf_counter(), "speculated": 0, "hits": 0, "misses": 0}
+
+    def observe(self, message_so_far):
+        """Looks at the accumulated AIMessageChunk and starts any safe call whose arguments just completed."""
+        for chunk in message_so_far.tool_call_chunks:
+            index = chunk.get("index")
+            if index in self._seen or not chunk.get("name") or not chunk.get("id"):
+                continue
+            if chunk["name"] not in self.safe_tools or chunk["name"] not in self.tool_map:
+                self._seen.add(index)
+                continue
+            try:
+                # Arguments stream as a JSON fragment; they are complete once they parse as an object.
+                args = json.loads(chunk.get("args") or "")
+            except ValueError:
+                continue
+            if not isinstance(args, dict):
+                continue
+            self._seen.add(index)
+            task = asyncio.create_task(self.invoke(self.tool_map[chunk["name"]], args))
+            self._running[chunk["id"]] = (chunk["name"], args, task, time.perf_counter())
+            if self._turn is not None:
+                self._turn["speculated"] += 1
+            print(f"Speculatively started '{chunk['name']}' with args: {args}")
+
+    def model_finished(self):
+        if self._turn is not None:
+            self._turn["model_finished"] = time.perf_counter()
+
+    def claim(self, tool_call):
+        """Returns the running task for this final tool call if speculation guessed it exactly, else None."""
+        running = self._running.pop(tool_call["id"], None)
+        if running is None:
+            return None
+        name, args, task, _ = running
+        if name != tool_call["name"] or args != tool_call["args"]:
+            task.cancel()
+            if self._turn is not None:
+                self._turn["misses"] += 1
+            return None
+        if self._turn is not None:
+            self._turn["hits"] += 1
+        return task
+
+    def discard(self):
+        """Cancels speculative calls the final message did not confirm."""
+        for _, _, task, _ in self._running.values():
+            task.cancel()
+            if self._turn is not None:
+                self._turn["misses"] += 1
+        self._running.clear()
+
+    def finish_turn(self, tools_started: float, tools_finished: float):
+        """Records how long the action node waited for tools and how much of it speculation hid."""
+        self.discard()
+        turn = self._turn
+        if turn is None:
+            return
+        self._turn = None
+        model_finished = turn.get("model_finished", tools_started)
+        timing = {
+            "model_ms": (model_finished - turn["model_started"]) * 1000,
+            "tool_wait_ms": (tools_finished - tools_started) * 1000,
+            "speculated": turn["speculated"],
+            "hits": turn["hits"],
+            "misses": turn["misses"],
+        }
+        self.turn_timings.append(timing)
+        print(
+            f"Tools took {timing['tool_wait_ms']:.0f} ms after a {timing['model_ms']:.0f} ms model run "
+            f"({timing['hits']} speculative hits, {timing['misses']} discarded)."
+        )
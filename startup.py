@@ -0,0 +1,71 @@
+import time
+import asyncio
+
+
+class StartupOrchestrator:
+    """
+    Runs independent start-up phases concurrently and records when each started and finished,
+    relative to the orchestrator's creation. A failed phase is reported instead of aborting start-up;
+    only critical phases are waited for before the assistant starts listening.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._tasks = {}  # name -> (task, critical)
+        self.phases = {}  # name -> (start_s, end_s, status)
+
+    def start(self, name: str, awaitable, critical: bool = False):
+        """Schedules a phase in the background."""
+        task = asyncio.ensure_future(self._timed(name, awaitable))
+        self._tasks[name] = (task, critical)
+        return task
+
+    def run(self, name: str, func, *args):
+        """Runs a synchronous phase right away (e.g. constructing an object) and times it."""
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.record(name, started, f"failed: {e}")
+            raise
+        self.record(name, started, "ok")
+        return result
+
+    async def _timed(self, name: str, awaitable):
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except Exception as e:
+            self.record(name, started, f"failed: {e}")
+            return None
+        # Phases that report a failure by returning False (like the Google auth check) are marked as such.
+        self.record(name, started, "failed" if result is False else "ok")
+        return result
+
+    def record(self, name: str, started: float, status: str = "ok"):
+        """Records a phase that started at `started` (a perf_counter value) and ends now."""
+        self.phases[name] = (started - self.origin, time.perf_counter() - self.origin, status)
+
+    async def wait_critical(self):
+        """Waits for the critical phases; raises if any of them failed."""
+        await asyncio.gather(*(task for task, critical in self._tasks.values() if critical))
+        failed = [
+            name for name, (_, critical) in self._tasks.items()
+            if critical and self.phases.get(name, (0, 0, "failed"))[2] != "ok"
+        ]
+        if failed:
+            raise RuntimeError(f"Critical start-up phase(s) failed: {', '.join(failed)}")
+        return time.perf_counter() - self.origin
+
+    async def wait_all(self):
+        """Waits for every phase (failures included) and prints the timing report."""
+        await asyncio.gather(*(task for task, _ in self._tasks.values()))
+        print(self.report())
+
+    def report(self) -> str:
+        lines = ["Start-up timing (seconds since launch):"]
+        for name, (start, end, status) in sorted(self.phases.items(), key=lambda item: item[1][0]):
+            lines.append(f"  {name:<16} {start:6.2f} -> {end:6.2f}  ({end - start:5.2f}s)  {status}")
+        if self.phases:
+            lines.append(f"  all phases done after {max(end for _, end, _ in self.phases.values()):.2f}s")
+        return "\n".join(lines)
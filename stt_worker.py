@@ -0,0 +1,450 @@
+import os
+import time
+import queue
+import bisect
+import asyncio
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tracing import percentile
+
+# --- STT Worker Settings ---
+# Worker processes, each with its own Whisper model; more workers = more utterances decoded in parallel.
+STT_PROCESSES = int(os.getenv("ALFRED_STT_WORKERS", "1"))
+# Utterances that can be streaming at once across the pool (one shared-memory slot each).
+STT_SLOTS = int(os.getenv("ALFRED_STT_SLOTS", "16"))
+# Utterances decoded together in one batched Whisper call.
+STT_BATCH_SIZE = int(os.getenv("ALFRED_STT_BATCH_SIZE", "8"))
+STT_MODEL = os.getenv("ALFRED_STT_MODEL", "base.en")
+# 16 kHz 16-bit mono, as fed by the microphone, the wake-word gate and server clients.
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Longest utterance a slot holds; Whisper decodes 30-second windows anyway.
+MAX_UTTERANCE_SECONDS = 30
+# A stream gets a new partial transcript once this much new audio has arrived...
+PARTIAL_MIN_SECONDS = 0.5
+# ...checked this often while streams are open.
+PARTIAL_INTERVAL = 0.25
+# Silence placed between utterances decoded in one batch, so no window spans two of them.
+BATCH_GAP_SECONDS = 0.5
+# Samples kept for the latency/RTF report.
+STATS_SIZE = 1000
+
+
+# --- Worker Process ---
+
+def _load_model(model_name: str):
+    """Whisper model plus, when this faster-whisper has it, the batched pipeline."""
+    from faster_whisper import WhisperModel
+    model = WhisperModel(model_name, device="cpu", compute_type="int8")
+    try:
+        from faster_whisper import BatchedInferencePipeline
+        pipeline = BatchedInferencePipeline(model=model)
+    except ImportError:
+        pipeline = None  # faster-whisper < 1.1: utterances are decoded one after another
+    return model, pipeline
+
+
+def transcribe_batch(model, pipeline, audios: list) -> list:
+    """
+    Transcribes several float32 utterances. With the batched pipeline they are laid end to end
+    (separated by silence), each marked as its own clip, and all clips are decoded in one batch.
+    """
+    if pipeline is None or len(audios) == 1:
+        return [
+            "".join(segment.text for segment in model.transcribe(audio, language="en", beam_size=5)[0]).strip()
+            for audio in audios
+        ]
+    gap = np.zeros(int(BATCH_GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+    pieces, clips, offset = [], [], 0
+    for audio in audios:
+        clips.append({"start": offset / SAMPLE_RATE, "end": (offset + len(audio)) / SAMPLE_RATE})
+        pieces += [audio, gap]
+        offset += len(audio) + len(gap)
+    segments, _ = pipeline.transcribe(
+        np.concatenate(pieces), language="en", beam_size=5, vad_filter=False, clip_timestamps=clips,
+        batch_size=len(audios), without_timestamps=True,
+    )
+    starts = [clip["start"] for clip in clips]
+    texts = [[] for _ in audios]
+    for segment in segments:
+        # Segments carry the time of the clip they were decoded from
+        index = max(0, bisect.bisect_right(starts, segment.start + 0.01) - 1)
+        texts[index].append(segment.text)
+    return ["".join(parts).strip() for parts in texts]
+
+
+def _worker_main(worker_id: int, shm_name: str, slots: int, slot_bytes: int, model_name: str, batch_size: int,
+                 commands, results):
+    """
+    Runs in its own process. Audio is read straight out of the shared slots (the producer writes
+    samples first, then the slot's length); commands open, end or cancel streams. Every pass decodes
+    ended streams first, then fills the batch with open streams that have enough new audio for a partial.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    lengths = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf)
+    header = slots * 8
+    try:
+        model, pipeline = _load_model(model_name)
+    except Exception as e:
+        results.put(("failed", worker_id, repr(e)))
+        return
+    results.put(("ready", worker_id))
+    streams = {}  # stream id -> {"slot", "ended", "decoded" (bytes at the last partial)}
+    partial_bytes = int(PARTIAL_MIN_SECONDS * SAMPLE_RATE) * SAMPLE_WIDTH
+    try:
+        while True:
+            # Reset before waiting: a timeout must not leave last pass's commands to run again.
+            pending = []
+            try:
+                pending.append(commands.get(timeout=PARTIAL_INTERVAL if streams else None))
+                while True:
+                    pending.append(commands.get_nowait())
+            except queue.Empty:
+                pass
+            for command in pending:
+                if command[0] == "stop":
+                    return
+                kind, stream_id = command[0], command[1]
+                if kind == "open":
+                    streams[stream_id] = {"slot": command[2], "ended": False, "decoded": 0}
+                elif kind == "end" and stream_id in streams:
+                    streams[stream_id]["ended"] = True
+                elif kind == "cancel":
+                    streams.pop(stream_id, None)
+
+            finals = [stream_id for stream_id, stream in streams.items() if stream["ended"]]
+            partials = [
+                stream_id for stream_id, stream in streams.items()
+                if not stream["ended"] and lengths[stream["slot"]] - stream["decoded"] >= partial_bytes
+            ]
+            batch = (finals + partials)[:batch_size]
+            if not batch:
+                continue
+            audios = []
+            for stream_id in list(batch):
+                stream = streams[stream_id]
+                length = int(lengths[stream["slot"]])
+                if not length:  # ended without any audio
+                    streams.pop(stream_id)
+                    batch.remove(stream_id)
+                    results.put(("final", stream_id, "", {"batch": 1, "compute_s": 0.0, "audio_s": 0.0}))
+                    continue
+                stream["decoded"] = length
+                # Read through a view on the shared block; only the float conversion copies
+                audios.append(np.frombuffer(
+                    shm.buf, dtype=np.int16, count=length // SAMPLE_WIDTH, offset=header + stream["slot"] * slot_bytes
+                ).astype(np.float32) / 32768)
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                texts = transcribe_batch(model, pipeline, audios)
+            except Exception as e:
+                # A failed partial is simply retried on the next pass; a failed final fails the stream
+                for stream_id in batch:
+                    if streams[stream_id]["ended"]:
+                        streams.pop(stream_id)
+                        results.put(("error", stream_id, repr(e)))
+                continue
+            compute = time.perf_counter() - started
+            total = sum(len(audio) for audio in audios)
+            for stream_id, audio, text in zip(batch, audios, texts):
+                # Each utterance is charged its share of the batch's decode time
+                info = {"batch": len(batch), "compute_s": compute * len(audio) / total, "audio_s": len(audio) / SAMPLE_RATE}
+                if streams[stream_id]["ended"]:
+                    streams.pop(stream_id)
+                    results.put(("final", stream_id, text, info))
+                else:
+                    results.put(("partial", stream_id, text, info))
+    finally:
+        del lengths
+        shm.close()
+
+
+# --- Async API ---
+
+class TranscriptionStream:
+    """
+    One utterance being transcribed. `feed` copies audio into the stream's shared-memory slot as it
+    arrives; partial transcripts are passed to `on_partial` (on the event loop) while it streams, and
+    `end` returns the final one.
+    """
+
+    def __init__(self, pool, stream_id: int, slot: int, worker: int):
+        self.pool = pool
+        self.stream_id = stream_id
+        self.slot = slot
+        self.worker = worker
+        self.on_partial = None
+        self.partial = ""
+        self.truncated = False
+        self.ended_at = None
+        self._length = 0
+        self._final = asyncio.get_running_loop().create_future()
+
+    def feed(self, pcm) -> int:
+        """Appends 16 kHz 16-bit mono audio; returns the bytes kept (audio past the slot's capacity is dropped)."""
+        if self._final.done() or self.ended_at is not None:
+            return 0
+        count = min(len(pcm), self.pool.slot_bytes - self._length)
+        count -= count % SAMPLE_WIDTH
+        if count < len(pcm):
+            self.truncated = True
+        if count:
+            start = self.pool.header_bytes + self.slot * self.pool.slot_bytes + self._length
+            self.pool.shm.buf[start:start + count] = memoryview(pcm)[:count]
+            self._length += count
+            # Published after the samples, so the worker never reads past what was written
+            self.pool.lengths[self.slot] = self._length
+        return count
+
+    def audio_seconds(self) -> float:
+        return self._length / SAMPLE_WIDTH / SAMPLE_RATE
+
+    async def end(self) -> str:
+        """Marks the end of speech and waits for the final transcript."""
+        if self.ended_at is None:
+            self.ended_at = time.perf_counter()
+            self.pool._send(self.worker, ("end", self.stream_id))
+        try:
+            return await asyncio.shield(self._final)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        if not self._final.done():
+            self.pool._send(self.worker, ("cancel", self.stream_id))
+            self._final.cancel()
+            self.pool._release(self)
+
+
+class SpeechWorkerPool:
+    """
+    Whisper in worker processes, so decoding never competes with the event loop for the GIL and
+    several utterances are transcribed at once. Audio travels through one shared-memory block of
+    fixed slots (no pickling of samples); only small commands and transcripts go through queues.
+    Each worker batches the utterances that are ready at the same time into one decode.
+    """
+
+    def __init__(self, workers: int = STT_PROCESSES, slots: int = STT_SLOTS, model: str = STT_MODEL,
+                 batch_size: int = STT_BATCH_SIZE, max_seconds: float = MAX_UTTERANCE_SECONDS):
+        self.workers = workers
+        self.slots = slots
+        self.model = model
+        self.batch_size = batch_size
+        self.slot_bytes = int(max_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+        self.header_bytes = slots * 8
+        self.shm = None
+        self.lengths = None
+        self._processes = []
+        self._commands = []
+        self._results = None
+        self._reader = None
+        self._loop = None
+        self._free_slots = list(range(slots))
+        self._slot_available = None
+        self._streams = {}  # stream id -> TranscriptionStream
+        self._load = [0] * workers  # open streams per worker
+        self._ready = None
+        self._next_id = 0
+        self.eos_to_text_ms = []
+        self.finals = []  # (batch size, audio seconds, decode seconds) per final transcript
+        self.partials = 0
+        self.partial_compute_s = 0.0
+
+    async def start(self):
+        """Spawns the workers and waits until each has loaded its model."""
+        self._loop = asyncio.get_running_loop()
+        self._slot_available = asyncio.Semaphore(self.slots)
+        self._ready = self._loop.create_future()
+        self._ready_count = 0
+        self.shm = shared_memory.SharedMemory(create=True, size=self.header_bytes + self.slots * self.slot_bytes)
+        self.lengths = np.ndarray((self.slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.lengths[:] = 0
+        # spawn, not fork: the parent has an event loop, threads and possibly CUDA/ONNX state
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        for worker_id in range(self.workers):
+            commands = context.Queue()
+            process = context.Process(
+                target=_worker_main, name=f"stt-worker-{worker_id}", daemon=True,
+                args=(worker_id, self.shm.name, self.slots, self.slot_bytes, self.model, self.batch_size,
+                      commands, self._results),
+            )
+            process.start()
+            self._commands.append(commands)
+            self._processes.append(process)
+        self._reader = threading.Thread(target=self._read_results, name="stt-results", daemon=True)
+        self._reader.start()
+        await self._ready
+
+    async def open_stream(self) -> TranscriptionStream:
+        """A new utterance on the least busy worker; waits while every slot is in use."""
+        await self._slot_available.acquire()
+        slot = self._free_slots.pop()
+        worker = min(range(self.workers), key=lambda index: self._load[index])
+        self._next_id += 1
+        stream = TranscriptionStream(self, self._next_id, slot, worker)
+        self.lengths[slot] = 0
+        self._streams[stream.stream_id] = stream
+        self._load[worker] += 1
+        self._send(worker, ("open", stream.stream_id, slot))
+        return stream
+
+    async def transcribe(self, pcm) -> str:
+        """Transcribes a complete utterance."""
+        stream = await self.open_stream()
+        stream.feed(pcm)
+        return await stream.end()
+
+    async def close(self):
+        for commands in self._commands:
+            commands.put(("stop",))
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.terminate()
+        for stream in list(self._streams.values()):
+            stream.cancel()
+        if self._results is not None:
+            self._results.put(None)  # stops the reader thread
+        if self.shm is not None:
+            self.lengths = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _send(self, worker: int, command):
+        self._commands[worker].put(command)
+
+    def _release(self, stream: TranscriptionStream):
+        if self._streams.pop(stream.stream_id, None) is None:
+            return
+        self._load[stream.worker] -= 1
+        self._free_slots.append(stream.slot)
+        self._slot_available.release()
+
+    def _read_results(self):
+        while (message := self._results.get()) is not None:
+            self._loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _dispatch(self, message):
+        kind = message[0]
+        if kind == "ready":
+            self._ready_count += 1
+            if self._ready_count == self.workers and not self._ready.done():
+                self._ready.set_result(None)
+            return
+        if kind == "failed":
+            if not self._ready.done():
+                self._ready.set_exception(RuntimeError(f"STT worker {message[1]} failed to start: {message[2]}"))
+            return
+        stream = self._streams.get(message[1])
+        if stream is None:
+            return  # cancelled meanwhile
+        if kind == "partial":
+            self.partials += 1
+            self.partial_compute_s += message[3]["compute_s"]
+            stream.partial = message[2]
+            if stream.on_partial is not None:
+                stream.on_partial(message[2])
+        elif kind == "final":
+            info = message[3]
+            if stream.ended_at is not None:
+                self.eos_to_text_ms.append((time.perf_counter() - stream.ended_at) * 1000)
+            self.finals.append((info["batch"], info["audio_s"], info["compute_s"]))
+            del self.eos_to_text_ms[:-STATS_SIZE], self.finals[:-STATS_SIZE]
+            self._release(stream)
+            stream._final.set_result(message[2])
+        elif kind == "error":
+            self._release(stream)
+            stream._final.set_exception(RuntimeError(f"Transcription failed: {message[2]}"))
+
+    def stats(self) -> dict:
+        """
+        End-of-speech-to-text latency, real-time factor (decode time per second of speech, for the final
+        transcripts alone and including the partials decoded while streaming) and batch size.
+        """
+        latencies = sorted(self.eos_to_text_ms)
+        audio = sum(audio_s for _, audio_s, _ in self.finals)
+        compute = sum(compute_s for _, _, compute_s in self.finals)
+        return {
+            "finals": len(self.finals),
+            "partials": self.partials,
+            "eos_to_text_p50_ms": percentile(latencies, 50),
+            "eos_to_text_p95_ms": percentile(latencies, 95),
+            "real_time_factor": compute / audio if audio else 0.0,
+            "streaming_real_time_factor": (compute + self.partial_compute_s) / audio if audio else 0.0,
+            "mean_batch": sum(size for size, _, _ in self.finals) / len(self.finals) if self.finals else 0.0,
+            "open_streams": len(self._streams),
+        }
+
+
+# --- Harness ---
+
+async def benchmark(paths: list, workers: int = STT_PROCESSES, concurrency: int = 4, batch_size: int = STT_BATCH_SIZE,
+                    realtime: bool = True, model: str = STT_MODEL) -> dict:
+    """
+    Streams WAV recordings through the pool, `concurrency` at a time, in 80 ms frames (paced like a
+    live microphone when `realtime`), and reports real-time factor and end-of-speech-to-text latency.
+    """
+    from wake_word import wav_frames
+    pool = SpeechWorkerPool(workers=workers, slots=max(concurrency, 1), model=model, batch_size=batch_size)
+    loaded = time.perf_counter()
+    await pool.start()
+    loaded = time.perf_counter() - loaded
+    limit = asyncio.Semaphore(concurrency)
+    transcripts = {}
+    frame_seconds = 1280 / SAMPLE_RATE
+
+    async def run(path):
+        async with limit:
+            stream = await pool.open_stream()
+            for frame in wav_frames(path):
+                stream.feed(frame)
+                await asyncio.sleep(frame_seconds if realtime else 0)
+            transcripts[path] = await stream.end()
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run(path) for path in paths))
+    finally:
+        wall = time.perf_counter() - started
+        await pool.close()
+    return dict(pool.stats(), wall_s=wall, model_load_s=loaded, transcripts=transcripts)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Stream WAV files through the STT worker pool and time it.")
+    parser.add_argument("wavs", nargs="+", help="WAV files, or folders of them")
+    parser.add_argument("--workers", type=int, default=STT_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=STT_BATCH_SIZE)
+    parser.add_argument("--model", default=STT_MODEL)
+    parser.add_argument("--fast", action="store_true", help="feed audio as fast as possible instead of in real time")
+    args = parser.parse_args()
+    paths = []
+    for entry in args.wavs:
+        if os.path.isdir(entry):
+            paths += sorted(os.path.join(entry, name) for name in os.listdir(entry) if name.lower().endswith(".wav"))
+        else:
+            paths.append(entry)
+
+    report = asyncio.run(benchmark(paths, args.workers, args.concurrency, args.batch_size, not args.fast, args.model))
+    for path, text in report["transcripts"].items():
+        print(f"{os.path.basename(path)}: {text!r}")
+    print(
+        f"{report['finals']} utterances with {args.workers} worker(s) at concurrency {args.concurrency}: "
+        f"{report['wall_s']:.1f}s (models loaded in {report['model_load_s']:.1f}s)"
+    )
+    print(
+        f"real-time factor {report['real_time_factor']:.3f} ({report['streaming_real_time_factor']:.3f} with partials), mean batch {report['mean_batch']:.1f}, "
+        f"{report['partials']} partials; end of speech to text p50 {report['eos_to_text_p50_ms']:.0f} ms, "
+        f"p95 {report['eos_to_text_p95_ms']:.0f} ms"
+    )
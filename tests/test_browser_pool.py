@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from browser_pool import BrowserPool
+
+
+# --- Fake browser: pool bookkeeping without Chromium ---
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def set_default_navigation_timeout(self, timeout):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, expression, *args):
+        if not self.healthy:
+            raise RuntimeError("Target crashed")
+        return 2
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        page = FakePage()
+        self.browser.pages.append(page)
+        return page
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.pages = []
+        self.fail_next = 0  # new_context() calls that should fail
+
+    async def new_context(self):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError("Browser closed")
+        return FakeContext(self)
+
+
+def test_failed_replacement_does_not_leak_capacity():
+    async def run():
+        browser = FakeBrowser()
+        pool = BrowserPool(browser, size=1)
+        entry = await pool.acquire()
+        await pool.release(entry)
+        entry.page.healthy = False
+        browser.fail_next = 1
+        with pytest.raises(RuntimeError):
+            await pool.acquire()
+        # The slot freed by the failed replacement is usable again instead of blocking forever
+        entry = await asyncio.wait_for(pool.acquire(), 1.0)
+        await pool.release(entry)
+        await pool.close()
+    asyncio.run(run())
+
+
+def test_pages_are_recycled_after_max_uses():
+    async def run():
+        browser = FakeBrowser()
+        pool = BrowserPool(browser, size=1, max_uses=2)
+        first = await pool.acquire()
+        await pool.release(first)
+        again = await pool.acquire()
+        await pool.release(again)
+        recycled = await pool.acquire()
+        await pool.release(recycled)
+        await pool.close()
+        return first, again, recycled, browser
+    first, again, recycled, browser = asyncio.run(run())
+    assert first is again
+    assert recycled is not first
+    assert len(browser.pages) == 2
+
+
+# --- Real Chromium against a local HTTP server ---
+
+def _pages(count: int) -> dict:
+    return {
+        f"/page/{index}": (
+            f"<html><head><title>Page {index}</title></head><body><p>Content of page {index}.</p>"
+            f"<img src='/img/{index}.png'></body></html>"
+        )
+        for index in range(count)
+    }
+
+
+async def _serve(pages: dict, delay: float = 0.2):
+    requests = []
+
+    async def page(request):
+        requests.append(request.path)
+        # Slow enough that concurrent navigations overlap
+        await asyncio.sleep(delay)
+        return web.Response(text=pages[request.path], content_type="text/html")
+
+    async def image(request):
+        requests.append(request.path)
+        return web.Response(body=b"\0", content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/page/{index}", page)
+    app.router.add_get("/img/{name}", image)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", requests
+
+
+async def _launch():
+    playwright_api = pytest.importorskip("playwright.async_api")
+    playwright = await playwright_api.async_playwright().start()
+    try:
+        browser = await playwright.chromium.launch()
+    except Exception as e:
+        await playwright.stop()
+        pytest.skip(f"Chromium is not available: {e}")
+    return playwright, browser
+
+
+def test_parallel_reads_are_isolated_and_concurrent():
+    async def run():
+        pages = _pages(6)
+        runner, base, requests = await _serve(pages)
+        playwright, browser = await _launch()
+        pool = BrowserPool(browser, size=3)
+        try:
+            started = asyncio.get_running_loop().time()
+            results = await asyncio.gather(*(pool.navigate_and_extract(base + path) for path in pages))
+            elapsed = asyncio.get_running_loop().time() - started
+        finally:
+            await pool.close()
+            await browser.close()
+            await playwright.stop()
+            await runner.cleanup()
+        return pages, results, elapsed, requests
+
+    pages, results, elapsed, requests = asyncio.run(run())
+    # Every call got the title and body of the page it navigated to
+    for (path, _), (title, html) in zip(pages.items(), results):
+        index = path.rsplit("/", 1)[1]
+        assert title == f"Page {index}"
+        assert f"Content of page {index}." in html
+    # Six 200 ms pages on three pages run in two waves, not six
+    assert elapsed < 6 * 0.2
+    # Images are blocked by default
+    assert not any(path.startswith("/img/") for path in requests)
+
+
+def test_read_returns_extracted_text_and_recycles_pages():
+    async def run():
+        pages = _pages(3)
+        runner, base, _ = await _serve(pages, delay=0)
+        playwright, browser = await _launch()
+        pool = BrowserPool(browser, size=1, max_uses=2)
+        try:
+            reads = [await pool.navigate_and_read(base + path, 1000) for path in pages]
+            contexts = len(browser.contexts)
+        finally:
+            await pool.close()
+            await browser.close()
+            await playwright.stop()
+            await runner.cleanup()
+        return reads, contexts
+
+    reads, contexts = asyncio.run(run())
+    assert [title for title, _ in reads] == ["Page 0", "Page 1", "Page 2"]
+    assert "Content of page 2." in reads[2][1]
+    # The first context was replaced after its second lease; only the new one is open
+    assert contexts == 1
@@ -0,0 +1,128 @@
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import google_client
+from google_client import CredentialManager
+
+
+def _utcnow():
+    # google-auth keeps expiry as a naive UTC datetime
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FakeCredentials:
+    """The parts of google.oauth2.credentials.Credentials the manager uses."""
+
+    def __init__(self, lifetime: float, refresh_token="refresh-token", refresh_seconds: float = 0.05):
+        self.refresh_token = refresh_token
+        self.lifetime = lifetime
+        self.refresh_seconds = refresh_seconds
+        self.expiry = _utcnow() + timedelta(seconds=lifetime)
+        self.refreshes = 0
+
+    @property
+    def valid(self) -> bool:
+        return self.expiry > _utcnow()
+
+    def refresh(self, request):
+        time.sleep(self.refresh_seconds)
+        self.refreshes += 1
+        self.expiry = _utcnow() + timedelta(seconds=self.lifetime)
+
+
+class TokenStore:
+    """Blocking load/save callables, counting how often the token file would be touched."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.loads = 0
+        self.saves = 0
+
+    def load(self):
+        self.loads += 1
+        time.sleep(0.05)
+        return self.credentials
+
+    def save(self, credentials):
+        self.saves += 1
+
+
+@pytest.fixture(autouse=True)
+def no_google_transport(monkeypatch):
+    monkeypatch.setattr(google_client, "Request", lambda: None)
+
+
+def test_concurrent_callers_share_one_load():
+    store = TokenStore(FakeCredentials(lifetime=3600))
+
+    async def run():
+        manager = CredentialManager(store.load, store.save)
+        results = await asyncio.gather(*(manager.get() for _ in range(20)))
+        again = await manager.get()
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert store.loads == 1
+    assert all(credentials is store.credentials for credentials in results + [again])
+
+
+def test_expired_credentials_are_refreshed_once_for_concurrent_callers():
+    credentials = FakeCredentials(lifetime=3600)
+    store = TokenStore(credentials)
+
+    async def run():
+        manager = CredentialManager(store.load, store.save)
+        await manager.get()
+        credentials.expiry = _utcnow() - timedelta(seconds=1)
+        await asyncio.gather(*(manager.get() for _ in range(10)))
+
+    asyncio.run(run())
+    assert store.loads == 1
+    assert credentials.refreshes == 1
+    assert store.saves == 1
+
+
+def test_credentials_are_refreshed_in_the_background_before_expiry():
+    # Expires in 1.2 s; with a 1 s margin the background refresh is due after ~0.2 s
+    credentials = FakeCredentials(lifetime=1.2)
+    store = TokenStore(credentials)
+
+    async def run():
+        manager = CredentialManager(store.load, store.save, refresh_margin=timedelta(seconds=1))
+        await manager.get()
+        await asyncio.sleep(0.5)
+        refreshed = credentials.refreshes
+        started = time.perf_counter()
+        await manager.get()
+        return refreshed, time.perf_counter() - started
+
+    refreshed, get_seconds = asyncio.run(run())
+    assert refreshed >= 1
+    assert credentials.valid
+    # Callers never waited for that refresh
+    assert get_seconds < 0.01
+
+
+def test_service_objects_are_built_once_per_api(monkeypatch):
+    builds = []
+
+    def fake_build(api, version, credentials=None, cache_discovery=True):
+        builds.append((api, version))
+        return object()
+
+    monkeypatch.setattr(google_client, "build", fake_build)
+    monkeypatch.setattr(google_client, "_services", {})
+    credentials = FakeCredentials(lifetime=3600)
+
+    async def run():
+        gmail = await google_client.get_service("gmail", "v1", credentials)
+        assert await google_client.get_service("gmail", "v1", credentials) is gmail
+        await google_client.get_service("calendar", "v3", credentials)
+        # New credentials (e.g. after re-authorizing) get a new service object
+        assert await google_client.get_service("gmail", "v1", FakeCredentials(lifetime=3600)) is not gmail
+
+    asyncio.run(run())
+    assert builds == [("gmail", "v1"), ("calendar", "v3"), ("gmail", "v1")]
@@ -0,0 +1,156 @@
+import asyncio
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import google_client
+import langchain_tools
+
+
+class FakeRequest:
+    def __init__(self, service, kind, result=None, **kwargs):
+        self.service = service
+        self.kind = kind
+        self.kwargs = kwargs
+        self.result = result
+        self.http = None
+
+    def execute(self, http=None):
+        self.service.executed.append(self.kind)
+        return self.result
+
+
+class FakeBatch:
+    """Stands in for googleapiclient's BatchHttpRequest: one round trip, one callback per added request."""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+        self.http = None
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.service.executed.append("batch")
+        self.service.batch_sizes.append(len(self.requests))
+        # Parts of a multipart response may come back in any order.
+        for request_id, request in reversed(self.requests):
+            message_id = request.kwargs["id"]
+            if message_id in self.service.missing:
+                resp = httplib2.Response({"status": 404, "reason": "Not Found"})
+                self.callback(request_id, None, HttpError(resp, b"Not Found"))
+                continue
+            headers = [
+                {"name": "Subject", "value": f"Subject {message_id}"},
+                {"name": "From", "value": f"sender-{message_id}@example.com"},
+            ]
+            self.callback(request_id, {"id": message_id, "payload": {"headers": headers}}, None)
+
+
+class FakeGmail:
+    def __init__(self, message_ids, page_size=500, missing=()):
+        self.message_ids = message_ids
+        self.page_size = page_size
+        self.missing = set(missing)
+        self.executed = []
+        self.batch_sizes = []
+        self.get_kwargs = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, labelIds, q, maxResults, pageToken=None):
+        start = int(pageToken or 0)
+        end = start + min(maxResults, self.page_size)
+        result = {"messages": [{"id": message_id} for message_id in self.message_ids[start:end]]}
+        if end < len(self.message_ids):
+            result["nextPageToken"] = str(end)
+        return FakeRequest(self, "list", result)
+
+    def get(self, **kwargs):
+        self.get_kwargs.append(kwargs)
+        return FakeRequest(self, "get", **kwargs)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    monkeypatch.setattr(google_client, "_semaphore", None)
+
+    async def no_credentials():
+        return None
+
+    def install(service):
+        async def get_service(api, version, credentials):
+            return service
+
+        monkeypatch.setattr(langchain_tools, "google_authenticate", no_credentials)
+        monkeypatch.setattr(langchain_tools, "get_service", get_service)
+        return service
+
+    return install
+
+
+def _list_unread(max_results):
+    return asyncio.run(langchain_tools.list_unread_messages.ainvoke({"max_results": max_results}))
+
+
+def test_headers_are_fetched_in_batches_of_metadata_requests(gmail):
+    ids = [f"m{i:03d}" for i in range(120)]
+    service = gmail(FakeGmail(ids))
+
+    lines = _list_unread(120)
+
+    assert service.executed == ["list", "batch", "batch", "batch"]
+    assert service.batch_sizes == [50, 50, 20]
+    assert all(kwargs["format"] == "metadata" for kwargs in service.get_kwargs)
+    assert all(kwargs["metadataHeaders"] == ["Subject", "From"] for kwargs in service.get_kwargs)
+    assert len(lines) == 120
+
+
+def test_results_keep_the_inbox_order(gmail):
+    ids = [f"m{i:03d}" for i in range(60)]
+    gmail(FakeGmail(ids))
+
+    lines = _list_unread(60)
+
+    assert lines == [f"From: sender-{i}@example.com - Subject: Subject {i}" for i in ids]
+
+
+def test_list_follows_pages_until_max_results(gmail):
+    ids = [f"m{i:03d}" for i in range(30)]
+    service = gmail(FakeGmail(ids, page_size=10))
+
+    lines = _list_unread(25)
+
+    assert service.executed == ["list", "list", "list", "batch"]
+    assert service.batch_sizes == [25]
+    assert lines[-1] == "From: sender-m024@example.com - Subject: Subject m024"
+
+
+def test_a_failed_message_is_skipped_without_failing_the_batch(gmail):
+    ids = ["m1", "m2", "m3", "m4"]
+    gmail(FakeGmail(ids, missing={"m2"}))
+
+    lines = _list_unread(4)
+
+    assert lines == [
+        "From: sender-m1@example.com - Subject: Subject m1",
+        "From: sender-m3@example.com - Subject: Subject m3",
+        "From: sender-m4@example.com - Subject: Subject m4",
+    ]
+
+
+def test_no_unread_messages(gmail):
+    service = gmail(FakeGmail([]))
+
+    assert _list_unread(5) == ["No unread messages found."]
+    assert service.executed == ["list"]
@@ -0,0 +1,115 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+import google_client
+
+
+class SlowRequest:
+    """Stands in for a googleapiclient HttpRequest whose execute() blocks like a slow API call."""
+
+    def __init__(self, seconds: float, result=None):
+        self.seconds = seconds
+        self.result = result if result is not None else {"messages": []}
+        self.http = None  # no credentials attached: executed without a transport of our own
+        self.threads = []
+
+    def execute(self, http=None):
+        self.threads.append(threading.get_ident())
+        time.sleep(self.seconds)
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphore(monkeypatch):
+    # Each test runs its own event loop; the module-wide semaphore is created on first use.
+    monkeypatch.setattr(google_client, "_semaphore", None)
+
+
+async def _max_tick_lag(until: asyncio.Future, interval: float = 0.01) -> float:
+    """Largest delay of a periodic 10 ms tick while `until` is pending: how long the loop was blocked."""
+    worst = 0.0
+    while not until.done():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+def test_event_loop_stays_responsive_during_slow_call():
+    request = SlowRequest(0.5, {"messages": [{"id": "1"}]})
+
+    async def run():
+        call = asyncio.ensure_future(google_client.execute(request))
+        lag = await _max_tick_lag(call)
+        return await call, lag
+
+    result, lag = asyncio.run(run())
+    assert result == {"messages": [{"id": "1"}]}
+    assert request.threads and request.threads[0] != threading.get_ident()
+    # A blocking execute() on the loop would stall the ticks for the full 500 ms
+    assert lag < 0.1
+
+
+def test_slow_call_times_out():
+    async def run():
+        return await google_client.execute(SlowRequest(0.5), timeout=0.05)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+    # Raised at the timeout; the abandoned worker thread finishes on its own
+    assert time.perf_counter() - started < 1.0
+
+
+def test_timed_out_call_keeps_its_slot_until_the_thread_finishes(monkeypatch):
+    monkeypatch.setattr(google_client, "GOOGLE_MAX_CONCURRENCY", 1)
+    spans = {}
+
+    class TimedRequest(SlowRequest):
+        def __init__(self, name, seconds):
+            super().__init__(seconds)
+            self.name = name
+
+        def execute(self, http=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(http)
+            finally:
+                spans[self.name] = (started, time.perf_counter())
+
+    async def run():
+        with pytest.raises(TimeoutError):
+            await google_client.execute(TimedRequest("slow", 0.3), timeout=0.05)
+        await google_client.execute(TimedRequest("next", 0.01))
+
+    asyncio.run(run())
+    # The abandoned thread still occupied the only slot, so the next call had to wait for it
+    assert spans["next"][0] >= spans["slow"][1]
+
+
+def test_concurrent_calls_are_bounded(monkeypatch):
+    monkeypatch.setattr(google_client, "GOOGLE_MAX_CONCURRENCY", 2)
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class CountingRequest(SlowRequest):
+        def execute(self, http=None):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            try:
+                return super().execute(http)
+            finally:
+                with lock:
+                    running -= 1
+
+    async def run():
+        return await asyncio.gather(*(google_client.execute(CountingRequest(0.05)) for _ in range(6)))
+
+    assert len(asyncio.run(run())) == 6
+    assert peak == 2
@@ -0,0 +1,59 @@
+import pytest
+
+import text_extraction
+from text_extraction import extract_text
+
+ENGINES = ["stream"] + (["lxml"] if text_extraction.lxml_html is not None else [])
+
+STORY = "".join(
+    f"<p>Paragraph {index} of the story: the butler polished the silver before the guests arrived.</p>"
+    for index in range(12)
+)
+BOILERPLATE = (
+    "<div class='cookie-banner'><p>We use cookies to improve your experience.</p></div>"
+    "<div class='share'><a href='#'>Tweet this story</a></div>"
+    "<div id='sidebar'><p>Trending: celebrity gossip.</p></div>"
+)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("wrapper", [
+    '<div id="page" class="site has-sidebar">',
+    '<div class="post share-enabled">',
+    '<div class="modal-open wrapper">',
+    # A real boilerplate token, but wrapping the whole story: not leaf-ish, so kept
+    '<div class="content sidebar">',
+])
+def test_wrappers_without_main_keep_their_content(engine, wrapper):
+    page = f"<html><body>{wrapper}{STORY}{BOILERPLATE}</div></body></html>"
+    text = extract_text(page, engine=engine)
+    assert "Paragraph 0 of the story" in text
+    assert "Paragraph 11 of the story" in text
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_leafish_boilerplate_is_dropped(engine):
+    page = f"<html><body><div class='site has-sidebar'>{STORY}{BOILERPLATE}</div></body></html>"
+    text = extract_text(page, engine=engine)
+    assert "cookies" not in text
+    assert "Tweet this" not in text
+    assert "celebrity gossip" not in text
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_boilerplate_wrapping_main_is_kept(engine):
+    page = (
+        "<html><body><form id='aspnetForm'><nav>Home About Contact</nav>"
+        f"<main>{STORY}</main><footer>Copyright</footer></form></body></html>"
+    )
+    text = extract_text(page, engine=engine)
+    assert "Paragraph 5 of the story" in text
+    assert "Home About" not in text
+    assert "Copyright" not in text
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_budget_is_respected_on_large_pages(engine):
+    page = "<html><body><main>" + STORY * 500 + "</main></body></html>"
+    text = extract_text(page, max_chars=1000, engine=engine)
+    assert 0 < len(text) <= 1000
@@ -0,0 +1,164 @@
+import json
+import base64
+import asyncio
+
+import websockets
+
+import tts_session
+from tts_session import ElevenLabsSession, backoff_delay
+
+PCM_FRAME = bytes(480)  # 5 ms of pcm_24000
+
+
+class FakeStreamInput:
+    """A local stand-in for the ElevenLabs stream-input socket: every flushed text gets one audio frame back."""
+
+    def __init__(self, drop_after_flushes: int = None):
+        self.connections = 0
+        self.messages = []
+        self.drop_after_flushes = drop_after_flushes  # close each socket after this many flushed texts
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def uri(self) -> str:
+        return f"ws://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    async def _handle(self, websocket):
+        self.connections += 1
+        flushes = 0
+        async for message in websocket:
+            data = json.loads(message)
+            self.messages.append(data)
+            if data.get("text") == "":
+                await websocket.close()
+                return
+            if data.get("flush") and data["text"].strip():
+                await asyncio.sleep(0.01)
+                await websocket.send(json.dumps({"audio": base64.b64encode(PCM_FRAME).decode()}))
+                flushes += 1
+                if self.drop_after_flushes is not None and flushes >= self.drop_after_flushes:
+                    await websocket.close()
+                    return
+
+
+async def _drain(queue: asyncio.Queue, count: int, timeout: float = 2.0) -> list:
+    return [await asyncio.wait_for(queue.get(), timeout) for _ in range(count)]
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    for attempt in range(12):
+        delay = backoff_delay(attempt, base=0.25, cap=2.0)
+        assert 0 <= delay <= min(2.0, 0.25 * 2 ** attempt)
+
+
+def test_socket_stays_open_across_turns():
+    async def run():
+        async with FakeStreamInput() as server:
+            audio = asyncio.Queue()
+            session = ElevenLabsSession(server.uri, "key", audio)
+            await session.start()
+            for turn in range(3):
+                await session.send_text("Very good, Sir.", turn_id=turn)
+                await session.end_turn()
+                assert await _drain(audio, 1) == [(turn, PCM_FRAME)]
+            await session.close()
+            return server
+    server = asyncio.run(run())
+    assert server.connections == 1
+    # Turns end with a flush, never with the end-of-stream message
+    assert not any(message.get("text") == "" for message in server.messages)
+    assert server.messages[0]["xi_api_key"] == "key"
+
+
+def test_turn_timings_record_handshake_and_first_byte():
+    async def run():
+        async with FakeStreamInput() as server:
+            audio = asyncio.Queue()
+            session = ElevenLabsSession(server.uri, "key", audio)
+            await session.start()
+            await session.send_text("Cold start.", turn_id=1)
+            await _drain(audio, 1)
+            await session.end_turn()
+            await session.send_text("Warm socket.", turn_id=2)
+            await _drain(audio, 1)
+            await session.close()
+            return list(session.turn_timings)
+    cold, warm = asyncio.run(run())
+    assert cold["first_byte_ms"] is not None and warm["first_byte_ms"] is not None
+    # The second turn finds the socket already open
+    assert warm["handshake_ms"] == 0.0
+
+
+def test_dropped_socket_is_replaced_before_the_next_turn(monkeypatch):
+    monkeypatch.setattr(tts_session, "BACKOFF_BASE", 0.01)
+    async def run():
+        async with FakeStreamInput(drop_after_flushes=1) as server:
+            audio = asyncio.Queue()
+            session = ElevenLabsSession(server.uri, "key", audio)
+            await session.start()
+            await session.send_text("First turn.", turn_id=1)
+            await session.end_turn()
+            await _drain(audio, 1)
+            # The server closed the socket; a replacement is opened in the background
+            await asyncio.sleep(0.2)
+            await session.send_text("Second turn.", turn_id=2)
+            await session.end_turn()
+            received = await _drain(audio, 1)
+            await session.close()
+            return server.connections, received, list(session.turn_timings)
+    connections, received, timings = asyncio.run(run())
+    assert connections == 2
+    assert received == [(2, PCM_FRAME)]
+    assert timings[-1]["handshake_ms"] == 0.0
+
+
+def test_reconnects_with_backoff_until_the_server_is_up(monkeypatch):
+    delays = []
+    monkeypatch.setattr(tts_session, "backoff_delay", lambda attempt: delays.append(attempt) or 0.01)
+    async def run():
+        # Nothing listens on this port yet
+        async with FakeStreamInput() as probe:
+            port = probe._server.sockets[0].getsockname()[1]
+        audio = asyncio.Queue()
+        session = ElevenLabsSession(f"ws://127.0.0.1:{port}", "key", audio)
+        await session.start()
+        await asyncio.sleep(0.1)
+        server = FakeStreamInput()
+        server._server = await websockets.serve(server._handle, "127.0.0.1", port)
+        await session.send_text("Finally.", turn_id=1)
+        received = await _drain(audio, 1)
+        await session.close()
+        await server.__aexit__()
+        return received
+    assert asyncio.run(run()) == [(1, PCM_FRAME)]
+    assert delays[:3] == [0, 1, 2]
+
+
+def test_old_socket_is_rotated_after_its_turn():
+    async def run():
+        async with FakeStreamInput() as server:
+            audio = asyncio.Queue()
+            session = ElevenLabsSession(server.uri, "key", audio, max_socket_age=0.05)
+            await session.start()
+            await session.send_text("Old socket.", turn_id=1)
+            await asyncio.sleep(0.1)
+            await session.end_turn()
+            await _drain(audio, 1)
+            await asyncio.sleep(0.1)
+            await session.send_text("New socket.", turn_id=2)
+            received = await _drain(audio, 1)
+            await session.close()
+            return server, received
+    server, received = asyncio.run(run())
+    assert server.connections == 2
+    assert received == [(2, PCM_FRAME)]
+    # The retired socket was closed with the end-of-stream message
+    assert {"text": ""} in server.messages
@@ -0,0 +1,401 @@
+import os
+import re
+import time
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree as lxml_etree, html as lxml_html
+except ImportError:  # lxml is optional; the streaming engine needs only the standard library
+    lxml_etree = lxml_html = None
+
+# --- Extraction Settings ---
+# Character budget for the text handed to the LLM.
+MAX_CHARS = 8000
+# "auto" picks lxml when installed, otherwise the streaming parser. "bs4" is the original BeautifulSoup path.
+EXTRACTION_ENGINE = os.getenv("ALFRED_HTML_ENGINE", "auto")
+# Main-content text shorter than this is not trusted and the whole page's text is used instead.
+MIN_MAIN_CHARS = 200
+# Both engines feed their parser in chunks of this size and stop once the budget is filled.
+FEED_CHUNK_CHARS = 32_768
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe", "canvas", "object", "title"}
+BOILERPLATE_TAGS = {"nav", "footer", "aside", "form", "button", "select", "dialog"}
+MAIN_TAGS = {"main", "article"}
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article", "main",
+    "blockquote", "pre", "dd", "dt", "table", "ul", "ol", "header", "figcaption", "hr",
+}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+}
+# Whole class/id tokens that mark cookie banners, menus, share bars and similar boilerplate.
+# Tokens are compared exactly, so page wrappers like "has-sidebar" or "share-enabled" never match.
+BOILERPLATE_TOKENS = {
+    "cookie", "cookies", "cookie-banner", "cookie-notice", "cookie-consent", "consent", "consent-banner",
+    "newsletter", "subscribe", "sidebar", "side-bar", "footer", "site-footer", "page-footer", "navbar",
+    "nav", "menu", "main-menu", "main-nav", "breadcrumb", "breadcrumbs", "popup", "modal", "advert",
+    "advertisement", "ad", "ads", "promo", "share", "share-bar", "sharing", "social", "social-share",
+    "related", "related-posts",
+}
+# An element marked only by a class/id token is dropped when it is leaf-ish: at most this many
+# paragraphs. Bigger ones are wrappers of real content, whatever they are called.
+HINT_MAX_PARAGRAPHS = 2
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+# In-browser extraction: strips boilerplate from the (leased, disposable) page and reads the
+# rendered text of the main content, cut to the budget before it crosses the bridge.
+BROWSER_EXTRACT_JS = """
+([maxChars, minMainChars, hintTokens, maxParagraphs]) => {
+    const junk = 'script,style,noscript,template,svg,iframe,nav,footer,aside,form,dialog,[role=navigation],[aria-hidden=true]';
+    const content = 'main,article,[role=main]';
+    // Wrappers around the main content (a page-wide <form>, a "layout-with-sidebar" div) are kept.
+    const removable = element => !element.matches(content + ',body,html') && !element.querySelector(content);
+    document.querySelectorAll(junk).forEach(element => removable(element) && element.remove());
+    const hints = new Set(hintTokens);
+    document.querySelectorAll('[class],[id]').forEach(element => {
+        const tokens = [...element.classList, ...element.id.split(/\\s+/)].map(token => token.toLowerCase());
+        if (element.isConnected && removable(element) && tokens.some(token => hints.has(token))
+                && element.querySelectorAll('p').length <= maxParagraphs) {
+            element.remove();
+        }
+    });
+    const main = document.querySelector('main, article, [role=main]');
+    const mainText = main ? main.innerText : '';
+    const text = mainText.length >= minMainChars ? mainText : (document.body ? document.body.innerText : '');
+    return text.slice(0, maxChars * 2);
+}
+"""
+
+
+def _is_boilerplate(tag: str, attrs) -> bool:
+    """Boilerplate by its tag or role: dropped whatever it holds (unless it wraps the main content)."""
+    if tag in BOILERPLATE_TAGS:
+        return True
+    if tag in MAIN_TAGS or tag == "body":
+        return False
+    for name, value in attrs:
+        if name == "role" and value in ("navigation", "banner", "contentinfo", "complementary"):
+            return True
+        if name == "aria-hidden" and value == "true":
+            return True
+    return False
+
+
+def _has_boilerplate_hint(tag: str, attrs) -> bool:
+    """Boilerplate by a class/id token: only dropped if it turns out to be leaf-ish."""
+    if tag in MAIN_TAGS or tag in ("body", "html"):
+        return False
+    return any(
+        name in ("class", "id") and value and not BOILERPLATE_TOKENS.isdisjoint(value.lower().split())
+        for name, value in attrs
+    )
+
+
+def _is_main(tag: str, attrs) -> bool:
+    return tag in MAIN_TAGS or ("role", "main") in attrs
+
+
+def clean_text(text: str, max_chars: int = MAX_CHARS) -> str:
+    """Collapses whitespace, drops empty lines and applies the character budget."""
+    lines = (_WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)[:max_chars]
+
+
+# --- Streaming Engine ---
+
+class _StreamingTextParser(HTMLParser):
+    """
+    Collects visible text in one pass, skipping boilerplate and remembering main-content text separately.
+    Text inside an element with a boilerplate class/id is held until the element closes, then kept
+    only if it held more than HINT_MAX_PARAGRAPHS paragraphs (or the main content).
+    """
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self._stack = []
+        self._skip = 0
+        self._boilerplate = 0
+        self._main = 0
+        self._seen_main = False
+        self._all = []
+        self._all_chars = 0
+        self._main_parts = []
+        self._main_chars = 0
+        self._held = []  # open hinted elements, innermost last: {"all", "main", "chars", "main_chars", "paragraphs", "keep"}
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._newline()
+        if tag == "p" and self._held:
+            self._held[-1]["paragraphs"] += 1
+        if tag in VOID_TAGS:
+            return
+        skip = tag in SKIP_TAGS
+        boilerplate = not skip and _is_boilerplate(tag, attrs)
+        main = not skip and not boilerplate and _is_main(tag, attrs)
+        if main and self._boilerplate:
+            # The "boilerplate" around it is a wrapper of the main content (a page-wide <form>): keep
+            # what follows. Text already skipped inside it stays skipped.
+            for entry in self._stack:
+                if entry[2]:
+                    entry[2] = False
+                    self._boilerplate -= 1
+        if main:
+            for frame in self._held:
+                frame["keep"] = True
+        held = None
+        if not skip and not boilerplate and not self._skip and not self._boilerplate and _has_boilerplate_hint(tag, attrs):
+            held = {"all": [], "main": [], "chars": 0, "main_chars": 0, "paragraphs": 0, "keep": False}
+            self._held.append(held)
+        self._stack.append([tag, skip, boilerplate, main, held])
+        self._skip += skip
+        self._boilerplate += boilerplate
+        self._main += main
+        self._seen_main = self._seen_main or main
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._newline()
+        # Browsers tolerate unclosed tags; pop back to the matching element if there is one.
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                for _, skip, boilerplate, main, held in reversed(self._stack[index:]):
+                    self._skip -= skip
+                    self._boilerplate -= boilerplate
+                    self._main -= main
+                    if held is not None:
+                        self._release(self._held.pop())
+                del self._stack[index:]
+                break
+
+    def handle_data(self, data):
+        if self.done or self._skip or self._boilerplate:
+            return
+        self._emit(data, len(data), len(data) if self._main else 0)
+
+    def _newline(self):
+        self._emit("\n", 0, 0)
+
+    def _emit(self, text, chars, main_chars):
+        """Appends text to the innermost held element, or to the output if there is none."""
+        if self._held:
+            frame = self._held[-1]
+            frame["all"].append(text)
+            frame["chars"] += chars
+            if self._main:
+                frame["main"].append(text)
+                frame["main_chars"] += main_chars
+            return
+        self._all.append(text)
+        self._all_chars += chars
+        if self._main:
+            self._main_parts.append(text)
+            self._main_chars += main_chars
+        self._check_budget()
+
+    def _release(self, frame):
+        """A hinted element closed: its text goes on outwards if it was a wrapper, and is dropped if leaf-ish."""
+        if not frame["keep"] and frame["paragraphs"] <= HINT_MAX_PARAGRAPHS:
+            return
+        if self._held:
+            outer = self._held[-1]
+            for key in ("all", "main", "chars", "main_chars", "paragraphs"):
+                outer[key] += frame[key]
+            outer["keep"] = outer["keep"] or frame["keep"]
+            return
+        self._all += frame["all"]
+        self._all_chars += frame["chars"]
+        self._main_parts += frame["main"]
+        self._main_chars += frame["main_chars"]
+        self._check_budget()
+
+    def _check_budget(self):
+        # Stop early once the budget is filled: from main content if the page has any,
+        # otherwise from the page text collected so far. Raw text is a bit longer than the
+        # cleaned result, so keep some slack before cutting off.
+        if self._main_chars >= self.max_chars * 1.5 or (not self._seen_main and self._all_chars >= self.max_chars * 1.5):
+            self.done = True
+
+    def result(self) -> str:
+        # Elements still open when parsing stopped are judged on what they held so far
+        while self._held:
+            self._release(self._held.pop())
+        main_text = clean_text("".join(self._main_parts), self.max_chars)
+        if len(main_text) >= MIN_MAIN_CHARS:
+            return main_text
+        return clean_text("".join(self._all), self.max_chars)
+
+
+def extract_streaming(html_content: str, max_chars: int = MAX_CHARS) -> str:
+    parser = _StreamingTextParser(max_chars)
+    for start in range(0, len(html_content), FEED_CHUNK_CHARS):
+        parser.feed(html_content[start:start + FEED_CHUNK_CHARS])
+        if parser.done:
+            break
+    return parser.result()
+
+
+# --- lxml Engine ---
+
+def _parse_lxml(html_content: str, max_chars: int):
+    """
+    Builds the lxml tree chunk by chunk and stops feeding once enough text has arrived (from main
+    content if the page has any, otherwise from the whole page), like the streaming engine.
+    """
+    parser = lxml_etree.HTMLPullParser(events=("start", "end"))
+    parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+    limit = max_chars * 1.5
+    skip = main = 0
+    seen_main = False
+    all_chars = main_chars = 0
+    for start in range(0, len(html_content), FEED_CHUNK_CHARS):
+        parser.feed(html_content[start:start + FEED_CHUNK_CHARS])
+        for event, element in parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+            is_skip = element.tag in SKIP_TAGS
+            is_main = _is_main(element.tag, element.attrib.items())
+            if event == "start":
+                skip += is_skip
+                main += is_main
+                seen_main = seen_main or is_main
+                continue
+            if not skip:
+                # An element's own text plus its children's tails: every text node is counted once
+                chars = len(element.text or "") + sum(len(child.tail or "") for child in element)
+                all_chars += chars
+                if main:
+                    main_chars += chars
+            skip -= is_skip
+            main -= is_main
+        if main_chars >= limit or (not seen_main and all_chars >= limit):
+            break
+    return parser.close()
+
+
+def _contains_main(element) -> bool:
+    return bool(element.xpath(".//main | .//article | .//*[@role='main']"))
+
+
+def extract_lxml(html_content: str, max_chars: int = MAX_CHARS) -> str:
+    if lxml_html is None:
+        raise RuntimeError("lxml is not installed.")
+    if not html_content.strip():
+        return ""
+    document = _parse_lxml(html_content, max_chars)
+    for element in list(document.iter(*SKIP_TAGS)):
+        element.drop_tree()
+    for element in list(document.iter()):
+        if isinstance(element.tag, str) and element.getparent() is not None:
+            attrs = element.attrib.items()
+            if _contains_main(element):
+                # Wrappers of the main content are kept even when they look like boilerplate
+                continue
+            if _is_boilerplate(element.tag, attrs) or (
+                _has_boilerplate_hint(element.tag, attrs) and len(element.findall(".//p")) <= HINT_MAX_PARAGRAPHS
+            ):
+                element.drop_tree()
+    for element in list(document.iter(*BLOCK_TAGS)):
+        element.text = "\n" + (element.text or "")
+        element.tail = "\n" + (element.tail or "")
+    main = document.xpath("//main | //article | //*[@role='main']")
+    if main:
+        main_text = clean_text(main[0].text_content(), max_chars)
+        if len(main_text) >= MIN_MAIN_CHARS:
+            return main_text
+    return clean_text(document.text_content(), max_chars)
+
+
+# --- Original BeautifulSoup Path (kept for comparison) ---
+
+def extract_bs4(html_content: str, max_chars: int = MAX_CHARS) -> str:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_content, "html.parser")
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)[:max_chars]
+
+
+ENGINES = {"stream": extract_streaming, "lxml": extract_lxml, "bs4": extract_bs4}
+
+
+def extract_text(html_content: str, max_chars: int = MAX_CHARS, engine: str = EXTRACTION_ENGINE) -> str:
+    """Returns the readable main text of an HTML document, at most `max_chars` long. CPU-bound; run it in a thread."""
+    if engine == "auto":
+        engine = "lxml" if lxml_html is not None else "stream"
+    return ENGINES[engine](html_content, max_chars)
+
+
+# --- Throughput / Quality Benchmark ---
+
+def _synthetic_corpus(pages: int = 30):
+    """Builds pages with known article text wrapped in typical boilerplate: (html, article_text) pairs."""
+    corpus = []
+    for index in range(pages):
+        paragraphs = [
+            f"Paragraph {n} of story {index}: the butler reviewed the estate accounts and found the "
+            f"figures for quarter {n % 4 + 1} entirely in order, save for one curious entry."
+            for n in range(40 + index * 5)
+        ]
+        article = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        boilerplate = (
+            "<nav class='navbar'>" + "".join(f"<a href='/s{n}'>Section {n}</a>" for n in range(60)) + "</nav>"
+            "<div class='cookie-banner'>We use cookies to improve your experience. Accept all cookies?</div>"
+            "<aside class='sidebar'>" + "Trending now: celebrity gossip. " * 30 + "</aside>"
+        )
+        scripts = "<script>" + "var tracking = {id: 1, events: []};" * 400 + "</script>"
+        footer = "<footer>" + "Copyright, terms of service, privacy policy. " * 20 + "</footer>"
+        html_content = (
+            f"<html><head><title>Story {index}</title><style>body{{margin:0}}</style>{scripts}</head>"
+            f"<body>{boilerplate}<main><article><h1>Story {index}</h1>{article}</article></main>{footer}{scripts}</body></html>"
+        )
+        corpus.append((html_content, " ".join(paragraphs)))
+    return corpus
+
+
+def benchmark(corpus_dir: str = None, max_chars: int = MAX_CHARS):
+    """
+    Compares engines on throughput (MB of HTML per second) and, for the synthetic corpus,
+    on quality: share of the output that is article text, and share of the budget it fills.
+    Pass `corpus_dir` to time a folder of saved .html pages instead (throughput only).
+    """
+    if corpus_dir:
+        corpus = []
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(corpus_dir, name), encoding="utf-8", errors="replace") as page:
+                    corpus.append((page.read(), None))
+    else:
+        corpus = _synthetic_corpus()
+    total_bytes = sum(len(html_content) for html_content, _ in corpus)
+
+    results = {}
+    for name, engine in ENGINES.items():
+        if name == "lxml" and lxml_html is None:
+            continue
+        started = time.perf_counter()
+        outputs = [engine(html_content, max_chars) for html_content, _ in corpus]
+        elapsed = time.perf_counter() - started
+        result = {"mb_per_s": total_bytes / elapsed / 1e6, "ms_per_page": elapsed / len(corpus) * 1000}
+        if not corpus_dir:
+            precision, fill = [], []
+            for output, (_, article) in zip(outputs, corpus):
+                words = output.split()
+                article_words = set(article.split())
+                precision.append(sum(word in article_words for word in words) / max(len(words), 1))
+                fill.append(len(output) / max_chars)
+            result["article_precision"] = sum(precision) / len(precision)
+            result["budget_fill"] = sum(fill) / len(fill)
+        results[name] = result
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    for name, result in benchmark(sys.argv[1] if len(sys.argv) > 1 else None).items():
+        print(f"{name}: " + ", ".join(f"{key} {value:.2f}" for key, value in result.items()))
@@ -0,0 +1,178 @@
+import re
+import time
+import asyncio
+
+# --- Segmenter Defaults ---
+# Segments shorter than this are held back so ElevenLabs is not fed single words.
+DEFAULT_MIN_CHARS = 12
+# Clause boundaries (commas, semicolons, colons, dashes) only split a segment past this size.
+DEFAULT_CLAUSE_CHARS = 80
+# Hard upper bound: a segment without any boundary is split at the last space before this.
+DEFAULT_MAX_CHARS = 220
+
+# Words that end in a period without ending the sentence (compared lower-case, without the dot).
+# Everyday words ("no", "sun", "sat", "mar", "wed", "fig", "apt") are left out: a sentence ending
+# in one of them would otherwise be held back until the next one arrives.
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "ft", "vs", "etc",
+    "e.g", "i.e", "approx", "dept", "est", "inc", "ltd", "co", "corp",
+    "vol", "jan", "feb", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec", "tue", "thu", "fri",
+    "a.m", "p.m", "u.s", "u.k", "u.n", "ph.d",
+}
+
+# Sentence punctuation or a clause mark, optionally followed by closing quotes/brackets,
+# only counted once the following whitespace has arrived. Requiring the whitespace keeps
+# decimals ("61.5"), thousands ("1,000") and the dots inside URLs from ever matching.
+_BOUNDARY_RE = re.compile(r"(?P<sentence>[.!?…]+)[\"'”’)\]]*(?=\s)|(?P<clause>[,;:—])[\"'”’)\]]*(?=\s)|\n")
+_WORD_BEFORE_DOT_RE = re.compile(r"([\w.]+)\.$")
+
+
+class SentenceSegmenter:
+    """
+    Incrementally splits streamed LLM text into speakable segments.
+    Text is pushed as it arrives; complete segments are returned as soon as a
+    sentence (or, for long runs, clause) boundary is seen.
+    """
+
+    def __init__(self, min_chars: int = DEFAULT_MIN_CHARS, max_chars: int = DEFAULT_MAX_CHARS,
+                 clause_chars: int = DEFAULT_CLAUSE_CHARS):
+        if min_chars < 1 or max_chars <= min_chars:
+            raise ValueError("max_chars must be greater than min_chars, and min_chars at least 1.")
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.clause_chars = max(min_chars, min(clause_chars, max_chars))
+        self._buffer = ""
+
+    def reset(self):
+        """Drops any buffered text (e.g. when a model run turns out to be a tool call)."""
+        self._buffer = ""
+
+    def push(self, text: str) -> list[str]:
+        """Adds a streamed chunk and returns the segments that are now complete."""
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> list[str]:
+        """Returns whatever is left in the buffer at the end of a response."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return [segment] if segment else []
+
+    # --- Boundary Detection ---
+
+    def _find_cut(self):
+        """Returns the index to split the buffer at, or None to keep waiting."""
+        buffer = self._buffer
+        for match in _BOUNDARY_RE.finditer(buffer):
+            end = match.end()
+            length = len(buffer[:end].strip())
+            if match.group(0) == "\n":
+                if length >= self.min_chars:
+                    return end
+                continue
+            if match.group("sentence"):
+                if length >= self.min_chars and self._is_sentence_end(buffer, match.start()):
+                    return end
+            elif match.group("clause"):
+                if length >= self.clause_chars:
+                    return end
+            if end > self.max_chars:
+                break
+
+        if len(buffer) > self.max_chars:
+            # No usable boundary: split on the last space so words and URLs stay intact.
+            space = buffer.rfind(" ", self.min_chars, self.max_chars)
+            if space != -1:
+                return space + 1
+        return None
+
+    def _is_sentence_end(self, buffer: str, punct_index: int) -> bool:
+        """Filters out periods that belong to abbreviations, initials or list numbers."""
+        if buffer[punct_index] != ".":
+            return True
+        head = buffer[:punct_index + 1]
+        word_match = _WORD_BEFORE_DOT_RE.search(head)
+        if not word_match:
+            return True
+        word = word_match.group(1)
+        if word.lower() in ABBREVIATIONS:
+            return False
+        # Single initials such as "J. R. R. Tolkien": a lone capital after a space or another
+        # initial's dot. A unit glued to a symbol or number ("72 °F.") still ends the sentence.
+        start = punct_index - len(word)
+        if len(word) == 1 and word.isalpha() and word.isupper() and (start == 0 or buffer[start - 1] in " \n."):
+            return False
+        # List markers such as "1." at the start of a line.
+        if word.isdigit():
+            line_start = head.rfind("\n") + 1
+            if head[line_start:].strip() == word + ".":
+                return False
+        return True
+
+
+# --- First-Audio Latency Benchmark ---
+
+async def _simulate_stream(text: str, tokens_per_second: float):
+    """Yields `text` word by word at a fixed token rate, like a chat model stream."""
+    words = re.findall(r"\S+\s*", text)
+    delay = 1.0 / tokens_per_second
+    for word in words:
+        await asyncio.sleep(delay)
+        yield word
+
+
+async def benchmark_first_audio(text: str, tokens_per_second: float = 60.0, tts_first_byte: float = 0.25,
+                                min_chars: int = DEFAULT_MIN_CHARS, max_chars: int = DEFAULT_MAX_CHARS):
+    """
+    Compares time-to-first-audio for whole-response mode against segmented streaming.
+    `tts_first_byte` models the ElevenLabs delay between receiving text and returning audio.
+    """
+    start = time.perf_counter()
+    full_response = ""
+    async for chunk in _simulate_stream(text, tokens_per_second):
+        full_response += chunk
+    whole_response = time.perf_counter() - start + tts_first_byte
+
+    segmenter = SentenceSegmenter(min_chars=min_chars, max_chars=max_chars)
+    start = time.perf_counter()
+    first_segment = None
+    segment_count = 0
+    async for chunk in _simulate_stream(text, tokens_per_second):
+        segments = segmenter.push(chunk)
+        if segments and first_segment is None:
+            first_segment = time.perf_counter() - start
+        segment_count += len(segments)
+    segment_count += len(segmenter.flush())
+    if first_segment is None:
+        first_segment = time.perf_counter() - start
+    segmented = first_segment + tts_first_byte
+
+    return {
+        "whole_response_first_audio": whole_response,
+        "segmented_first_audio": segmented,
+        "segments": segment_count,
+    }
+
+
+if __name__ == "__main__":
+    sample = (
+        "Certainly, Sir. The weather in London is 61.5°F with light rain, so an umbrella would be wise. "
+        "Mr. Fox from Wayne Enterprises e.g. the applied sciences division wrote at 9 a.m. about the "
+        "prototype; details are at https://example.com/reports/q3.pdf for your review. "
+        "Your next engagement is at 3 p.m. with Dr. Thompson, and I have taken the liberty of "
+        "arranging the car. Shall I prepare anything else?"
+    )
+    results = asyncio.run(benchmark_first_audio(sample))
+    print(f"Whole-response first audio: {results['whole_response_first_audio'] * 1000:.0f} ms")
+    print(f"Segmented first audio:      {results['segmented_first_audio'] * 1000:.0f} ms")
+    print(f"Segments produced:          {results['segments']}")
@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import asyncio
+import unicodedata
+from collections import OrderedDict
+
+# --- Cache Policy ---
+# Seconds a result stays fresh, per tool. Tools not listed here (send_email, create_calendar_event,
+# list_unread_messages, the browsing tools) are never cached.
+TOOL_CACHE_TTLS = {
+    "get_current_location": 300,
+    "get_weather": 600,
+    "get_travel_duration": 120,  # traffic changes quickly
+    "get_travel_matrix": 120,
+    "brave_search": 900,
+    "list_calendar_events": 60,
+}
+# Side-effecting tools and the cached tools whose results they make stale.
+TOOL_INVALIDATES = {
+    "create_calendar_event": ("list_calendar_events",),
+}
+# Most entries kept per tool; the least recently used one is evicted first.
+TOOL_CACHE_SIZE = 64
+# Argument names holding place names, where a trailing default-country qualifier is dropped.
+LOCATION_ARGS = {"location", "origin", "destination", "origins", "destinations"}
+# The home country: "London, UK" and "London" share a cache entry when it is "uk". Only this one
+# country's qualifier is dropped ("Paris, US" and "Paris" stay apart); "" keeps every qualifier.
+DEFAULT_COUNTRY = os.getenv("ALFRED_DEFAULT_COUNTRY", "uk").casefold()
+COUNTRY_ALIASES = {
+    "uk": {"uk", "united kingdom", "gb", "great britain", "england"},
+    "us": {"us", "usa", "united states", "united states of america"},
+}
+COUNTRY_QUALIFIERS = COUNTRY_ALIASES.get(DEFAULT_COUNTRY, {DEFAULT_COUNTRY} if DEFAULT_COUNTRY else set())
+# Tools report failures as strings instead of raising; those results are not cached.
+ERROR_PREFIXES = ("error", "sorry", "could not", "an unexpected error", "an error occurred", "failed")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_value(name: str, value):
+    """Case-folds and collapses whitespace in string arguments so trivially different calls share a key."""
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(name, item) for item in value)
+    if not isinstance(value, str):
+        return value
+    text = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", value)).casefold().strip(" ,;.?!")
+    if name in LOCATION_ARGS and "," in text:
+        head, _, qualifier = text.rpartition(",")
+        if qualifier.replace(".", "").strip() in COUNTRY_QUALIFIERS:
+            text = head.strip(" ,")
+    return text
+
+
+def _is_error(result) -> bool:
+    return isinstance(result, str) and result.lstrip().casefold().startswith(ERROR_PREFIXES)
+
+
+class ToolCache:
+    """
+    Caches results of idempotent tools for a short, per-tool TTL.
+    Identical concurrent calls share one in-flight execution, side-effecting tools invalidate
+    the caches they affect, and hit/miss counters are kept per tool.
+    """
+
+    def __init__(self, ttls: dict = None, invalidates: dict = None, max_entries: int = TOOL_CACHE_SIZE):
+        self.ttls = dict(TOOL_CACHE_TTLS if ttls is None else ttls)
+        self.invalidates = dict(TOOL_INVALIDATES if invalidates is None else invalidates)
+        self.max_entries = max_entries
+        self._entries = {}  # tool name -> OrderedDict(key -> (expires_at, result))
+        self._inflight = {}  # (tool name, key) -> task
+        self._waiters = {}  # in-flight task -> number of callers awaiting it
+        self._generations = {}  # tool name -> bumped on invalidation, so in-flight results from before it are dropped
+        self._stats = {}
+
+    def _key(self, tool, args: dict):
+        # Fill in defaults so list_calendar_events({}) and ({"max_results": 10}) match.
+        merged = {name: spec["default"] for name, spec in tool.args.items() if "default" in spec}
+        merged.update(args or {})
+        return tuple(sorted((name, repr(normalize_value(name, value))) for name, value in merged.items()))
+
+    def _count(self, tool_name: str, outcome: str):
+        counters = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "coalesced": 0})
+        counters[outcome] += 1
+
+    async def ainvoke(self, tool, args: dict):
+        """Drop-in for `tool.ainvoke(args)` that serves fresh cached results when it can."""
+        ttl = self.ttls.get(tool.name)
+        if not ttl:
+            result = await tool.ainvoke(args)
+            if not _is_error(result):
+                for name in self.invalidates.get(tool.name, ()):
+                    self.invalidate(name)
+            return result
+
+        key = self._key(tool, args)
+        entries = self._entries.setdefault(tool.name, OrderedDict())
+        cached = entries.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            entries.move_to_end(key)
+            self._count(tool.name, "hits")
+            print(f"Tool cache hit for '{tool.name}'.")
+            return cached[1]
+
+        task = self._inflight.get((tool.name, key))
+        if task is not None:
+            self._count(tool.name, "coalesced")
+        else:
+            self._count(tool.name, "misses")
+            task = asyncio.create_task(self._run(tool, args, key, ttl))
+            self._inflight[(tool.name, key)] = task
+        # Shielded so one cancelled caller does not abort the call others are waiting on;
+        # the last caller to give up (e.g. an interrupted turn) cancels the call itself.
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def _run(self, tool, args: dict, key, ttl: float):
+        generation = self._generations.get(tool.name, 0)
+        try:
+            result = await tool.ainvoke(args)
+            if not _is_error(result) and self._generations.get(tool.name, 0) == generation:
+                entries = self._entries.setdefault(tool.name, OrderedDict())
+                entries[key] = (time.monotonic() + ttl, result)
+                entries.move_to_end(key)
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+            return result
+        finally:
+            self._inflight.pop((tool.name, key), None)
+
+    def invalidate(self, tool_name: str = None):
+        """Drops cached results for one tool, or for all tools."""
+        names = list(self._entries) if tool_name is None else [tool_name]
+        for name in names:
+            self._entries.pop(name, None)
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        """Per-tool counters: hits, misses (executions) and coalesced (calls that joined one in flight)."""
+        return {name: dict(counters) for name, counters in self._stats.items()}
@@ -0,0 +1,267 @@
+import os
+import json
+import math
+import time
+import uuid
+import contextvars
+from collections import deque
+
+# --- Tracing Settings ---
+# "0" turns tracing off; every call then returns immediately.
+TRACING_ENABLED = os.getenv("ALFRED_TRACING", "1") != "0"
+# One JSON line per finished turn; "" keeps traces in memory only.
+TRACE_PATH = os.getenv("ALFRED_TRACE_FILE", "alfred_traces.jsonl")
+# Samples kept per histogram.
+HISTOGRAM_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+
+# The turn whose work is running; set by the turn's task and inherited by the graph nodes it spawns.
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+# perf_counter is monotonic but has no epoch; exported times are anchored to the wall clock once.
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def _unix_nano(perf_seconds: float) -> int:
+    return _EPOCH_OFFSET_NS + int(perf_seconds * 1e9)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class TurnTrace:
+    """Spans and point events of one turn, timed with perf_counter."""
+
+    def __init__(self, turn_id, origin: float):
+        self.turn_id = turn_id
+        self.trace_id = uuid.uuid4().hex
+        self.origin = origin
+        self.spans = []  # (name, start, end, attributes)
+        self.events = {}  # name -> (time, attributes); the first occurrence wins
+        self.status = None
+
+    def to_record(self) -> dict:
+        """OpenTelemetry-shaped record: trace/span ids, unix-nano times and attributes."""
+        return {
+            "trace_id": self.trace_id,
+            "turn": self.turn_id,
+            "status": self.status,
+            "start_time_unix_nano": _unix_nano(self.origin),
+            "spans": [
+                {
+                    "span_id": uuid.uuid4().hex[:16],
+                    "name": name,
+                    "start_time_unix_nano": _unix_nano(start),
+                    "end_time_unix_nano": _unix_nano(end),
+                    "attributes": attributes,
+                }
+                for name, start, end, attributes in self.spans
+            ],
+            "events": [
+                {"name": name, "time_unix_nano": _unix_nano(at), "attributes": attributes}
+                for name, (at, attributes) in sorted(self.events.items(), key=lambda item: item[1][0])
+            ],
+        }
+
+    def metrics(self) -> dict:
+        """Milliseconds per stage: span durations (summed per name) and event offsets from the turn's start."""
+        values = {}
+        for name, start, end, _ in self.spans:
+            values[f"{name}_ms"] = values.get(f"{name}_ms", 0.0) + (end - start) * 1000
+        for name, (at, _) in self.events.items():
+            values[f"to_{name}_ms"] = (at - self.origin) * 1000
+        return values
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attributes", "start")
+
+    def __init__(self, trace, name, attributes):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.trace.spans.append((self.name, self.start, time.perf_counter(), self.attributes))
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class _NullSpan:
+    """Stands in for a span when tracing is off or the turn is unknown."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Per-turn latency tracing. A turn starts at the end of the user's utterance; stages record spans
+    (`with tracer.span("tool", name=...)`) and first-occurrence events (`tracer.event("first_token")`)
+    against the turn in `current_turn`, or an explicit turn id from threads and other tasks.
+    Finished turns are appended to a JSONL file and feed p50/p95/p99 histograms.
+    """
+
+    def __init__(self, path: str = TRACE_PATH, enabled: bool = TRACING_ENABLED, complete_on: str = None):
+        # complete_on: an event that finishes a turn by itself (e.g. the first sample played).
+        self.enabled = enabled
+        self.path = path
+        self.complete_on = complete_on
+        self._turns = {}  # turn id -> TurnTrace, until exported
+        self._done = set()  # turns whose own work has finished and now only wait for complete_on
+        self._histograms = {}  # metric -> deque of samples
+        self._file = None
+
+    # --- Recording ---
+
+    def begin_turn(self, turn_id, at: float = None):
+        """Opens a turn starting at `at` (a perf_counter value, e.g. when the utterance ended). Earlier turns are exported."""
+        if not self.enabled:
+            return
+        for earlier in [earlier for earlier in self._turns if earlier != turn_id]:
+            # A finished turn keeps its status (it just never reached complete_on); a running one was cut off
+            self.end_turn(earlier, None if earlier in self._done else "superseded")
+        self._turns[turn_id] = TurnTrace(turn_id, time.perf_counter() if at is None else at)
+
+    def span(self, name: str, turn_id=None, **attributes):
+        if not self.enabled:
+            return _NULL_SPAN
+        trace = self._turns.get(current_turn.get() if turn_id is None else turn_id)
+        if trace is None:
+            return _NULL_SPAN
+        return _Span(trace, name, attributes)
+
+    def event(self, name: str, turn_id=None, at: float = None, **attributes):
+        """
+        Records a point in time; only the first occurrence per turn is kept. Call it on the event loop:
+        other threads take the time themselves and pass it as `at` through call_soon_threadsafe.
+        """
+        if not self.enabled:
+            return
+        turn_id = current_turn.get() if turn_id is None else turn_id
+        trace = self._turns.get(turn_id)
+        if trace is None or name in trace.events:
+            return
+        trace.events[name] = (time.perf_counter() if at is None else at, attributes)
+        if name == self.complete_on and turn_id in self._done:
+            self.end_turn(turn_id)
+
+    def finish_turn(self, turn_id, status: str = "ok"):
+        """The turn's own work is done; it is exported now, or once `complete_on` has been seen."""
+        if not self.enabled:
+            return
+        trace = self._turns.get(turn_id)
+        if trace is None:
+            return
+        trace.status = status
+        if self.complete_on is None or self.complete_on in trace.events or status != "ok":
+            self.end_turn(turn_id)
+        else:
+            self._done.add(turn_id)
+
+    def end_turn(self, turn_id, status: str = None):
+        """Exports the turn; `status` overrides the one given to finish_turn (default "ok")."""
+        trace = self._turns.pop(turn_id, None)
+        self._done.discard(turn_id)
+        if trace is None:
+            return
+        trace.status = status or trace.status or "ok"
+        if trace.status == "ok":
+            for metric, value in trace.metrics().items():
+                self._histograms.setdefault(metric, deque(maxlen=HISTOGRAM_SIZE)).append(value)
+        self._export(trace.to_record())
+
+    def close(self):
+        for turn_id in list(self._turns):
+            self.end_turn(turn_id, None if turn_id in self._done else "unfinished")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _export(self, record: dict):
+        if not self.path:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+        except OSError as e:
+            print(f"Could not write trace: {e}")
+
+    # --- Reporting ---
+
+    def samples(self) -> dict:
+        """{metric: [ms, ...]} over completed turns, e.g. to merge several tracers."""
+        return {metric: list(values) for metric, values in self._histograms.items()}
+
+    def histograms(self) -> dict:
+        """{metric: {"count", "p50", "p95", "p99"}} over completed turns."""
+        return summarize(self._histograms)
+
+    def report(self) -> str:
+        return format_report(self.histograms())
+
+
+def summarize(samples: dict) -> dict:
+    summary = {}
+    for metric, values in samples.items():
+        ordered = sorted(values)
+        summary[metric] = {"count": len(ordered), **{f"p{pct}": percentile(ordered, pct) for pct in PERCENTILES}}
+    return summary
+
+
+def format_report(summary: dict) -> str:
+    lines = [f"  {'stage':<34} {'n':>4} " + " ".join(f"{'p' + str(pct):>8}" for pct in PERCENTILES)]
+    for metric, row in sorted(summary.items()):
+        lines.append(
+            f"  {metric:<34} {row['count']:>4} " + " ".join(f"{row['p' + str(pct)]:8.0f}" for pct in PERCENTILES)
+        )
+    return "Turn latency (ms):\n" + "\n".join(lines)
+
+
+def load_histograms(path: str) -> dict:
+    """Rebuilds the histograms from an exported JSONL file (completed turns only)."""
+    samples = {}
+    with open(path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            record = json.loads(line)
+            if record.get("status") != "ok":
+                continue
+            origin = record["start_time_unix_nano"]
+            durations = {}
+            for span in record["spans"]:
+                key = f"{span['name']}_ms"
+                durations[key] = durations.get(key, 0.0) + (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e6
+            for event in record["events"]:
+                durations[f"to_{event['name']}_ms"] = (event["time_unix_nano"] - origin) / 1e6
+            for metric, value in durations.items():
+                samples.setdefault(metric, []).append(value)
+    return summarize(samples)
+
+
+if __name__ == "__main__":
+    import sys
+    print(format_report(load_histograms(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH)))
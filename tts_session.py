@@ -0,0 +1,365 @@
+import json
+import time
+import bisect
+import random
+import asyncio
+import binascii
+from collections import deque
+
+import websockets
+from websockets.protocol import State
+
+try:
+    import orjson
+except ImportError:  # orjson is optional (langsmith normally pulls it in); json works, just slower
+    orjson = None
+
+# --- Session Defaults ---
+# ElevenLabs closes an idle stream-input socket after 20 seconds; ping well before that.
+KEEPALIVE_INTERVAL = 15.0
+# Sockets older than this are retired at the end of a turn and replaced by a fresh, pre-opened one.
+MAX_SOCKET_AGE = 600.0
+# Jittered exponential backoff for reconnection attempts.
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 10.0
+# How many per-turn timing records to keep around.
+TIMING_HISTORY = 100
+# A socket that has had no audio for this long after its last text is treated as done generating.
+GENERATION_IDLE_GRACE = 1.0
+# pcm_24000 output: 24 kHz, 16-bit mono.
+PCM_BYTES_PER_MS = 48
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _is_open(websocket) -> bool:
+    return websocket is not None and websocket.state is State.OPEN
+
+
+def parse_frame(message):
+    """Decodes one frame envelope from the stream-input socket."""
+    return orjson.loads(message) if orjson is not None else json.loads(message)
+
+
+def decode_audio(data: dict):
+    """
+    The frame's PCM audio, or None. binascii decodes straight from the JSON string into a single
+    bytes object (base64.b64decode would first copy the string to bytes); playback then copies it
+    once, into its ring buffer.
+    """
+    audio = data.get("audio")
+    return binascii.a2b_base64(audio) if audio else None
+
+
+class ElevenLabsSession:
+    """
+    Keeps an ElevenLabs stream-input WebSocket warm across turns.
+    Turns end with a flush instead of the end-of-stream message, so the same socket
+    serves the next turn. Dropped sockets are replaced in the background with jittered
+    backoff, and old sockets are rotated out while they drain their last turn.
+    Audio is put on the queue as (turn id, pcm bytes), tagged with the turn whose text produced it;
+    with a bounded queue, a full one pauses reading the socket. Character alignment is kept per
+    turn, so an interrupted turn can tell how much of its text was actually heard.
+    """
+
+    def __init__(self, uri: str, api_key: str, audio_queue: asyncio.Queue, voice_settings: dict = None,
+                 keepalive_interval: float = KEEPALIVE_INTERVAL, max_socket_age: float = MAX_SOCKET_AGE):
+        self.uri = uri
+        self.api_key = api_key
+        self.audio_queue = audio_queue
+        self.voice_settings = voice_settings or {}
+        self.keepalive_interval = keepalive_interval
+        self.max_socket_age = max_socket_age
+        self.turn_timings = deque(maxlen=TIMING_HISTORY)
+
+        self._websocket = None
+        self._opened_at = 0.0
+        self._last_send = 0.0
+        self._connect_task = None
+        self._keepalive_task = None
+        self._listeners = {}  # websocket -> listener task
+        self._socket_turns = {}  # websocket -> id of the last turn that sent text on it
+        self._last_text = 0.0
+        self._closing = set()
+        self._spoken = None  # alignment of the latest turn: {"turn", "audio_ms", "chars", "starts"}
+        self._last_audio = 0.0
+        self._turn = None
+        self._turn_open = False
+        self._closed = False
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        """Opens the first socket in the background and starts the keep-alive loop."""
+        self._closed = False
+        self._ensure_connecting()
+        self._keepalive_task = asyncio.create_task(self._keepalive())
+
+    async def close(self):
+        """Closes every socket owned by the session."""
+        self._closed = True
+        for task in (self._keepalive_task, self._connect_task):
+            if task and not task.done():
+                task.cancel()
+        if _is_open(self._websocket):
+            await self._websocket.close()
+        self._websocket = None
+        for listener in list(self._listeners.values()):
+            listener.cancel()
+
+    # --- Turn API ---
+
+    async def send_text(self, text: str, turn_id=None):
+        """Sends one text segment of the current turn and asks ElevenLabs to generate it immediately."""
+        if not self._turn_open:
+            self._begin_turn()
+        payload = json.dumps({"text": text + " ", "flush": True})
+        for _ in range(2):
+            websocket = await self._acquire()
+            try:
+                self._socket_turns[websocket] = turn_id
+                await websocket.send(payload)
+                self._last_send = self._last_text = time.monotonic()
+                return
+            except websockets.exceptions.ConnectionClosed as e:
+                print(f"ElevenLabs socket closed while sending, retrying on a new one: {e}")
+                self._drop(websocket)
+        print("[WARNING] Could not deliver text segment to ElevenLabs.")
+
+    async def end_turn(self):
+        """Flushes the remaining text of the turn while keeping the socket open for the next one."""
+        if not self._turn_open:
+            return
+        self._turn_open = False
+        websocket = self._websocket
+        if not _is_open(websocket):
+            return
+        try:
+            await websocket.send(json.dumps({"text": " ", "flush": True}))
+            self._last_send = time.monotonic()
+            if time.monotonic() - self._opened_at > self.max_socket_age:
+                # Let the old socket finish speaking, and pre-open its replacement meanwhile.
+                print("Rotating ElevenLabs socket after this turn.")
+                await websocket.send(json.dumps({"text": ""}))
+                self._drop(websocket)
+        except websockets.exceptions.ConnectionClosed as e:
+            print(f"ElevenLabs socket closed at end of turn: {e}")
+            self._drop(websocket)
+
+    def abort_turn(self):
+        """
+        Stops generating the current turn's audio. ElevenLabs has no cancel message, so a socket that
+        may still be generating is detached and closed (its listener stops forwarding audio at once),
+        and a fresh one is opened in the background for the next turn.
+        """
+        self._turn_open = False
+        self._turn = None
+        # Rotated-out sockets still draining an earlier turn are always closed.
+        stale = [websocket for websocket in self._listeners if websocket is not self._websocket]
+        websocket = self._websocket
+        generating = self._last_audio < self._last_text or time.monotonic() - self._last_audio < GENERATION_IDLE_GRACE
+        if _is_open(websocket) and websocket in self._socket_turns and generating:
+            stale.append(websocket)
+            self._drop(websocket)
+        for websocket in stale:
+            listener = self._listeners.pop(websocket, None)
+            if listener is not None:
+                listener.cancel()
+            # The close handshake runs in the background so the new turn is not held up by it.
+            closing = asyncio.create_task(websocket.close())
+            self._closing.add(closing)
+            closing.add_done_callback(self._closing.discard)
+        if stale:
+            print(f"Aborted ElevenLabs generation on {len(stale)} socket(s).")
+
+    # --- Connection Management ---
+
+    async def _open(self):
+        """Performs the TLS/WebSocket handshake and sends the initial configuration message."""
+        started = time.perf_counter()
+        websocket = await websockets.connect(self.uri)
+        await websocket.send(json.dumps({
+            "text": " ",
+            "voice_settings": self.voice_settings,
+            "xi_api_key": self.api_key,
+        }))
+        print(f"ElevenLabs WebSocket connected in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return websocket
+
+    async def _connect_with_backoff(self):
+        """Connects until it succeeds, then makes the new socket the active one."""
+        attempt = 0
+        while not self._closed:
+            try:
+                websocket = await self._open()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                print(f"ElevenLabs connection failed: {e}. Retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._activate(websocket)
+            return
+
+    def _ensure_connecting(self):
+        if self._connect_task is None or self._connect_task.done():
+            self._connect_task = asyncio.create_task(self._connect_with_backoff())
+        return self._connect_task
+
+    async def _acquire(self):
+        """Returns the active socket, waiting for a connection only if none is warm."""
+        if not _is_open(self._websocket):
+            self._websocket = None
+            waited = time.perf_counter()
+            # Shield the connection attempt so a cancelled turn does not abort the reconnect.
+            await asyncio.shield(self._ensure_connecting())
+            if self._turn is not None:
+                self._turn["handshake"] += time.perf_counter() - waited
+        return self._websocket
+
+    def _activate(self, websocket):
+        self._websocket = websocket
+        self._opened_at = time.monotonic()
+        self._last_send = self._opened_at
+        listener = asyncio.create_task(self._listen(websocket))
+        self._listeners[websocket] = listener
+        listener.add_done_callback(lambda _: self._forget(websocket))
+
+    def _forget(self, websocket):
+        self._listeners.pop(websocket, None)
+        self._socket_turns.pop(websocket, None)
+
+    def _drop(self, websocket):
+        """Detaches a socket; it keeps delivering audio until the server closes it."""
+        if websocket is self._websocket:
+            self._websocket = None
+            if not self._closed:
+                self._ensure_connecting()
+
+    async def _listen(self, websocket):
+        """Forwards audio frames from one socket to the audio queue until it closes."""
+        try:
+            async for message in websocket:
+                try:
+                    data = parse_frame(message)
+                    pcm = decode_audio(data)
+                except (ValueError, binascii.Error) as e:
+                    print(f"Could not decode ElevenLabs frame: {e}")
+                    continue
+                if pcm:
+                    self._record_first_byte()
+                    self._last_audio = time.monotonic()
+                    turn_id = self._socket_turns.get(websocket)
+                    self._record_alignment(turn_id, data.get("normalizedAlignment") or data.get("alignment"), len(pcm))
+                    await self.audio_queue.put((turn_id, pcm))
+        except websockets.exceptions.ConnectionClosedError as e:
+            print(f"ElevenLabs connection closed with error: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error in ElevenLabs listener: {e}")
+        finally:
+            # An unexpected close of the active socket: reconnect now so the next turn is warm.
+            self._drop(websocket)
+
+    async def _keepalive(self):
+        """Sends a single space on the idle active socket so ElevenLabs does not time it out."""
+        while True:
+            await asyncio.sleep(self.keepalive_interval / 3)
+            websocket = self._websocket
+            if not _is_open(websocket) or self._turn_open:
+                continue
+            if time.monotonic() - self._last_send >= self.keepalive_interval:
+                try:
+                    await websocket.send(json.dumps({"text": " "}))
+                    self._last_send = time.monotonic()
+                except websockets.exceptions.ConnectionClosed:
+                    self._drop(websocket)
+
+    # --- Alignment ---
+
+    def _record_alignment(self, turn_id, alignment, pcm_bytes: int):
+        """Places the frame's characters on the turn's audio timeline (frame times are relative to the frame)."""
+        if self._spoken is None or self._spoken["turn"] != turn_id:
+            self._spoken = {"turn": turn_id, "audio_ms": 0.0, "chars": [], "starts": []}
+        spoken = self._spoken
+        if alignment:
+            offset = spoken["audio_ms"]
+            spoken["chars"].extend(alignment.get("chars") or [])
+            spoken["starts"].extend(offset + start for start in alignment.get("charStartTimesMs") or [])
+        spoken["audio_ms"] += pcm_bytes / PCM_BYTES_PER_MS
+
+    def heard_text(self, turn_id, played_ms: float) -> str:
+        """The text of `turn_id` whose audio started within its first `played_ms` of playback."""
+        spoken = self._spoken
+        if spoken is None or spoken["turn"] != turn_id:
+            return ""
+        return "".join(spoken["chars"][:bisect.bisect_right(spoken["starts"], played_ms)])
+
+    # --- Timings ---
+
+    def _begin_turn(self):
+        if self._turn is not None:
+            self._finish_turn()
+        self._turn = {"started": time.perf_counter(), "handshake": 0.0, "first_byte": None}
+        self._turn_open = True
+
+    def _record_first_byte(self):
+        if self._turn is not None and self._turn["first_byte"] is None:
+            self._turn["first_byte"] = time.perf_counter() - self._turn["started"]
+            self._finish_turn()
+
+    def _finish_turn(self):
+        turn, self._turn = self._turn, None
+        timing = {
+            "handshake_ms": turn["handshake"] * 1000,
+            "first_byte_ms": turn["first_byte"] * 1000 if turn["first_byte"] is not None else None,
+        }
+        self.turn_timings.append(timing)
+        first_byte = f"{timing['first_byte_ms']:.0f} ms" if timing["first_byte_ms"] is not None else "none"
+        print(f"TTS turn timings: handshake {timing['handshake_ms']:.0f} ms, first byte {first_byte}.")
+
+
+# --- Decode Benchmark ---
+
+def benchmark_decode(frames: int = 2000, audio_ms: int = 250) -> dict:
+    """Times decoding ElevenLabs-sized frames (audio plus alignment): json+base64 against parse_frame+decode_audio."""
+    import base64
+    pcm = random.randbytes(audio_ms * PCM_BYTES_PER_MS)
+    chars = list("Very good, Sir. The car will be ready at eight.")
+    message = json.dumps({
+        "audio": base64.b64encode(pcm).decode(),
+        "isFinal": None,
+        "normalizedAlignment": {
+            "chars": chars,
+            "charStartTimesMs": [i * 20 for i in range(len(chars))],
+            "charDurationsMs": [20] * len(chars),
+        },
+    })
+    started = time.perf_counter()
+    for _ in range(frames):
+        base64.b64decode(json.loads(message)["audio"])
+    baseline = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(frames):
+        decode_audio(parse_frame(message))
+    fast = time.perf_counter() - started
+    return {
+        "frame_kb": len(message) / 1024,
+        "json_base64_us": baseline / frames * 1e6,
+        "fast_path_us": fast / frames * 1e6,
+        "orjson": orjson is not None,
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark_decode()
+    print(
+        f"{result['frame_kb']:.0f} KB frames: json+base64 {result['json_base64_us']:.1f} us, "
+        f"{'orjson' if result['orjson'] else 'json'}+binascii {result['fast_path_us']:.1f} us per frame"
+    )
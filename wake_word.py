@@ -0,0 +1,305 @@
+import os
+import time
+import wave
+import threading
+
+import numpy as np
+
+# --- Wake Word Settings ---
+# "transcript" transcribes everything with Whisper and keeps utterances starting with "alfred";
+# "openwakeword" gates transcription with a small always-on model instead. It is opt-in because no
+# pre-trained model listens for "Alfred": without a custom model the wake word becomes "hey Jarvis".
+WAKE_WORD_ENGINE = os.getenv("ALFRED_WAKE_WORD_ENGINE", "transcript")
+# A pre-trained openWakeWord model name, or the path of a custom .onnx model (e.g. one trained for "Alfred").
+WAKE_WORD_MODEL = os.getenv("ALFRED_WAKE_WORD_MODEL", "hey_jarvis")
+# Sensitivity: a frame counts as a hit when the model's score reaches this threshold (0-1; lower = more sensitive).
+WAKE_WORD_THRESHOLD = float(os.getenv("ALFRED_WAKE_WORD_THRESHOLD", "0.5"))
+# Consecutive hit frames needed to fire; higher values trade missed wake words for fewer false ones.
+WAKE_WORD_PATIENCE = int(os.getenv("ALFRED_WAKE_WORD_PATIENCE", "1"))
+# openWakeWord works on 80 ms frames of 16 kHz, 16-bit mono audio.
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 1280
+# After a detection the detector ignores this many seconds, so one utterance fires once.
+COOLDOWN_SECONDS = 1.5
+# If no speech starts this long after the wake word, the command is abandoned.
+COMMAND_START_TIMEOUT = 5.0
+
+
+class WakeWordDetector:
+    """
+    Scores raw audio frames with an openWakeWord model and fires on the configured threshold/patience.
+    Keeps the CPU time it spends per second of audio, so its always-on cost can be reported.
+    """
+
+    def __init__(self, model: str = WAKE_WORD_MODEL, threshold: float = WAKE_WORD_THRESHOLD,
+                 patience: int = WAKE_WORD_PATIENCE):
+        # Imported here: openwakeword loads onnxruntime, which is only needed once the stage is in use
+        from openwakeword.model import Model
+        self.model = Model(wakeword_models=[model], inference_framework="onnx")
+        self.threshold = threshold
+        self.patience = patience
+        self.frames = 0
+        self.cpu_seconds = 0.0
+        self.detections = 0
+        self.last_score = 0.0
+        self._streak = 0
+        self._cooldown = 0
+
+    def score(self, frame: np.ndarray) -> float:
+        """Highest model score for one frame of int16 samples."""
+        # thread_time counts only this thread, so concurrent Whisper or TTS work does not inflate it.
+        started = time.thread_time()
+        scores = self.model.predict(frame)
+        self.cpu_seconds += time.thread_time() - started
+        self.frames += 1
+        self.last_score = max(scores.values()) if scores else 0.0
+        return self.last_score
+
+    def process(self, frame: np.ndarray) -> bool:
+        """Feeds one frame; returns True when the wake word fires."""
+        score = self.score(frame)
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return False
+        self._streak = self._streak + 1 if score >= self.threshold else 0
+        if self._streak < self.patience:
+            return False
+        self._streak = 0
+        self._cooldown = int(COOLDOWN_SECONDS * SAMPLE_RATE / FRAME_SAMPLES)
+        self.detections += 1
+        return True
+
+    def reset(self):
+        self.model.reset()
+        self._streak = 0
+
+    def audio_seconds(self) -> float:
+        return self.frames * FRAME_SAMPLES / SAMPLE_RATE
+
+    def cpu_percent(self) -> float:
+        """CPU time spent scoring, as a percentage of one core over the audio processed."""
+        return 100.0 * self.cpu_seconds / self.audio_seconds() if self.frames else 0.0
+
+
+class WakeWordGate:
+    """
+    Sits between the microphone and the recorder: frames go to the wake-word detector, and only the
+    audio after a detection is fed to RealtimeSTT (created with use_microphone=False) for transcription.
+    """
+
+    def __init__(self, detector: WakeWordDetector, recorder, command_timeout: float = COMMAND_START_TIMEOUT):
+        self.detector = detector
+        self.recorder = recorder
+        self.command_timeout = command_timeout
+        self.empty_commands = 0  # wakes with no speech after them: likely false accepts
+        self.on_wake = None  # called from the feeding thread on each detection (e.g. to stop playback)
+        self._listening = threading.Event()
+        self._woke = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self, frames=None):
+        """Starts feeding frames from `frames` (an iterable of int16 frame bytes) or, by default, the microphone."""
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._feed_loop, args=(frames if frames is not None else microphone_frames(),), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def _feed_loop(self, frames):
+        for data in frames:
+            if not self._running:
+                break
+            self.feed_frame(data)
+
+    def feed_frame(self, data: bytes):
+        if self._listening.is_set():
+            self.recorder.feed_audio(data)
+        elif self.detector.process(np.frombuffer(data, dtype=np.int16)):
+            self._listening.set()
+            self._woke.set()
+            if self.on_wake is not None:
+                self.on_wake()
+
+    def next_command(self, timeout: float = None):
+        """
+        Blocks until the wake word fires, then returns the transcription of what followed it.
+        Returns None if `timeout` seconds pass without a wake word.
+        """
+        if not self._woke.wait(timeout):
+            return None
+        self._woke.clear()
+        print(f"Wake word detected (score {self.detector.last_score:.2f}).")
+        timer = threading.Timer(self.command_timeout, self._abandon_if_silent)
+        timer.start()
+        try:
+            text = self.recorder.text()
+        finally:
+            timer.cancel()
+            self.detector.reset()
+            self._listening.clear()
+        if not text or not text.strip():
+            self.empty_commands += 1
+        print(self.report())
+        return text or ""
+
+    def _abandon_if_silent(self):
+        if not self.recorder.is_recording:
+            self.recorder.abort()
+
+    def report(self) -> str:
+        return (
+            f"Wake-word stage: {self.detector.detections} wakes ({self.empty_commands} with no command) "
+            f"over {self.detector.audio_seconds() / 60:.1f} min of audio, "
+            f"detector CPU {self.detector.cpu_percent():.2f}% of one core."
+        )
+
+
+# --- Audio Sources ---
+
+def microphone_frames():
+    """Yields 80 ms frames from the default input device."""
+    import pyaudio
+    audio = pyaudio.PyAudio()
+    stream = audio.open(
+        format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True, frames_per_buffer=FRAME_SAMPLES
+    )
+    try:
+        while True:
+            yield stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+
+def read_wav(path: str) -> np.ndarray:
+    """Loads a 16-bit WAV file as 16 kHz mono int16 samples."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported.")
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16)
+
+
+def wav_frames(path: str, realtime: bool = False):
+    """Yields a WAV file as 80 ms frames of int16 bytes, optionally paced like a live microphone."""
+    samples = read_wav(path)
+    for start in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+        if realtime:
+            time.sleep(FRAME_SAMPLES / SAMPLE_RATE)
+        yield samples[start:start + FRAME_SAMPLES].tobytes()
+
+
+# --- Offline Evaluation ---
+
+def _wav_paths(directory: str):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".wav"))
+
+
+def _count_detections(scores, threshold: float, patience: int) -> int:
+    """Replays per-frame scores through the detector's threshold/patience/cooldown logic."""
+    detections = streak = cooldown = 0
+    for score in scores:
+        if cooldown > 0:
+            cooldown -= 1
+            continue
+        streak = streak + 1 if score >= threshold else 0
+        if streak >= patience:
+            detections += 1
+            streak = 0
+            cooldown = int(COOLDOWN_SECONDS * SAMPLE_RATE / FRAME_SAMPLES)
+    return detections
+
+
+def evaluate(positive_dir: str, negative_dir: str, thresholds=None, patience: int = WAKE_WORD_PATIENCE,
+             model: str = WAKE_WORD_MODEL):
+    """
+    Scores every frame of the WAV files once, then reports for each threshold:
+    false reject rate (positive clips with no detection), false accepts per hour of negative audio,
+    and the detector's CPU cost.
+    """
+    detector = WakeWordDetector(model=model, patience=patience)
+    scored = {}
+    for label, directory in (("positive", positive_dir), ("negative", negative_dir)):
+        scored[label] = []
+        for path in _wav_paths(directory) if directory else []:
+            detector.reset()
+            samples = read_wav(path)
+            scores = [
+                detector.score(samples[start:start + FRAME_SAMPLES])
+                for start in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES)
+            ]
+            scored[label].append(scores)
+
+    negative_hours = sum(len(scores) for scores in scored["negative"]) * FRAME_SAMPLES / SAMPLE_RATE / 3600
+    results = []
+    for threshold in thresholds or [WAKE_WORD_THRESHOLD]:
+        missed = sum(_count_detections(scores, threshold, patience) == 0 for scores in scored["positive"])
+        false_accepts = sum(_count_detections(scores, threshold, patience) for scores in scored["negative"])
+        results.append({
+            "threshold": threshold,
+            "false_reject_rate": missed / len(scored["positive"]) if scored["positive"] else 0.0,
+            "false_accepts_per_hour": false_accepts / negative_hours if negative_hours else 0.0,
+            "false_accepts": false_accepts,
+        })
+    return {
+        "positives": len(scored["positive"]),
+        "negative_minutes": negative_hours * 60,
+        "cpu_percent": detector.cpu_percent(),
+        "ms_per_frame": 1000 * detector.cpu_seconds / detector.frames if detector.frames else 0.0,
+        "thresholds": results,
+    }
+
+
+def transcribe_wav(path: str):
+    """Runs the full gate (detector + Whisper) on a WAV file instead of the microphone and prints each command."""
+    from RealtimeSTT import AudioToTextRecorder
+    recorder = AudioToTextRecorder(model="base.en", language="en", spinner=False, use_microphone=False)
+    gate = WakeWordGate(WakeWordDetector(), recorder)
+    gate.start(wav_frames(path, realtime=True))
+    try:
+        while True:
+            command = gate.next_command(timeout=1.0)
+            if command is not None:
+                print(f"Command: {command!r}")
+            elif not gate._thread.is_alive():
+                break
+    finally:
+        gate.stop()
+        recorder.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline wake-word evaluation on WAV files.")
+    parser.add_argument("positives", nargs="?", help="folder of WAV clips that contain the wake word")
+    parser.add_argument("negatives", nargs="?", help="folder of WAV recordings without it (background speech, TV...)")
+    parser.add_argument("--thresholds", default="0.3,0.4,0.5,0.6,0.7,0.8")
+    parser.add_argument("--patience", type=int, default=WAKE_WORD_PATIENCE)
+    parser.add_argument("--model", default=WAKE_WORD_MODEL)
+    parser.add_argument("--transcribe", metavar="WAV", help="run detector + Whisper on one recording instead")
+    args = parser.parse_args()
+    if args.transcribe:
+        transcribe_wav(args.transcribe)
+    else:
+        report = evaluate(
+            args.positives, args.negatives, [float(value) for value in args.thresholds.split(",")],
+            patience=args.patience, model=args.model,
+        )
+        print(f"{report['positives']} positive clips, {report['negative_minutes']:.1f} min of negative audio")
+        print(f"detector CPU: {report['cpu_percent']:.2f}% of one core ({report['ms_per_frame']:.2f} ms per 80 ms frame)")
+        for row in report["thresholds"]:
+            print(
+                f"threshold {row['threshold']:.2f}: false reject rate {row['false_reject_rate']:.1%}, "
+                f"false accepts {row['false_accepts']} ({row['false_accepts_per_hour']:.2f}/hour)"
+            )